@@ -0,0 +1,74 @@
+"""Startup benchmark of pyxldrawer imports
+
+The package is imported in fresh interpreters with `python -X importtime`
+and the cumulative import time of the fastest run is checked against a budget
+(the fastest run is the least affected by noise of the machine).
+Heavy dependencies (pandas, numpy, yaml) must not be imported at startup.
+
+Usage:
+    python benchmarks/import_time.py [--budget MS] [--runs N] [--module NAME ...]
+"""
+
+import argparse, os, subprocess, sys
+
+###############################################################################
+
+HEAVY = ('pandas', 'numpy', 'yaml')
+
+def import_time(modules, runs = 5):
+    """Measure import time of modules in fresh interpreters
+    
+    Args:
+        modules (list): names of modules to import
+        runs (int): number of runs
+    
+    Returns:
+        tuple: list of cumulative import times in ms (one per run) and a set of all imported modules
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ root, env.get('PYTHONPATH', '') ])
+    code = 'import ' + ', '.join(modules)
+    times = []
+    imported = set()
+    for _ in range(runs):
+        proc = subprocess.run([ sys.executable, '-X', 'importtime', '-c', code ],
+                              env = env, stderr = subprocess.PIPE, universal_newlines = True, check = True)
+        total = 0
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            name = name.rstrip()
+            imported.add(name.strip())
+            # Nested imports are indented by two spaces per level
+            if len(name) - len(name.lstrip()) <= 1:
+                total += int(cumulative)
+        times.append(total / 1000.0)
+    return times, imported
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Check pyxldrawer startup time against a budget.')
+    parser.add_argument('--budget', type = float, default = 150.0, help = 'budget of the cumulative import time in ms')
+    parser.add_argument('--runs', type = int, default = 5, help = 'number of runs')
+    parser.add_argument('--module', nargs = '+', default = [ 'pyxldrawer', 'pyxldrawer.elements' ],
+                        help = 'modules to import')
+    args = parser.parse_args(argv)
+    times, imported = import_time(args.module, args.runs)
+    heavy = sorted(set([ name.split('.')[0] for name in imported ]) & set(HEAVY))
+    best = min(times)
+    worst = max(times)
+    print('import %s: best %.1f ms, worst %.1f ms (budget %.1f ms)' % (', '.join(args.module), best, worst, args.budget))
+    failed = False
+    if heavy:
+        print('heavy modules imported at startup: ' + ', '.join(heavy))
+        failed = True
+    if best > args.budget:
+        print('import time is over the budget.')
+        failed = True
+    return 1 if failed else 0
+
+###############################################################################
+
+if __name__ == '__main__':
+    sys.exit(main())
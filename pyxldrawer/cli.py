@@ -0,0 +1,303 @@
+"""Command-line report renderer
+
+Reports are rendered from render specs (see the spec module) and data files (CSV or Parquet).
+Data files are given in the 'data' section of a spec (data name => path relative to the spec file)
+or with the --data option. A data file NAME is available to elements as:
+    NAME: list of lists of row values
+    NAME.header: list of column names
+    NAME.table: list of lists of row values preceded by the column names
+    NAME.records: list of dicts (one per row)
+    NAME.first: dict of the first row (e.g. as a Dictionary context)
+
+Usage:
+    pyxldrawer report.yaml --data sales=sales.csv -o report.xlsx
+    pyxldrawer *.yaml --jobs 4 --cache-dir .cache --output out/ --profile
+"""
+
+import argparse, csv, hashlib, os, pickle, re, sys, time
+
+###############################################################################
+
+_INT = re.compile(r'^[+-]?[0-9]+$')
+_FLOAT = re.compile(r'^[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?$')
+
+def _number(value):
+    """Convert CSV field to a number if it is a numeric literal
+    
+    Fields with leading zeros (e.g. codes like 007) are kept as strings,
+    and so are words Python would parse as floats (e.g. nan, inf or infinity).
+    """
+    if value == '':
+        return None
+    if re.match(r'^[+-]?0[0-9]', value):
+        return value
+    if _INT.match(value):
+        return int(value)
+    if _FLOAT.match(value):
+        return float(value)
+    return value
+
+def read_data(path):
+    """Read data file
+    
+    Args:
+        path (str): path to a .csv or .parquet file
+    
+    Returns:
+        tuple: list of column names and list of lists of row values
+    """
+    if path.endswith('.parquet') or path.endswith('.pq'):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+        columns = [ column.to_pylist() for column in table.columns ]
+        return list(table.column_names), [ list(row) for row in zip(*columns) ]
+    with open(path, 'r', newline = '') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        rows = [ [ _number(x) for x in row ] for row in reader ]
+    return header, rows
+
+def referenced_files(value):
+    """Get paths of existing files referenced by strings in element arguments (e.g. Dictionary structures)
+    
+    Args:
+        value (any): spec or its part
+    
+    Returns:
+        list: sorted list of file paths
+    """
+    paths = set()
+    if isinstance(value, dict):
+        for item in value.values():
+            paths.update(referenced_files(item))
+    elif isinstance(value, list):
+        for item in value:
+            paths.update(referenced_files(item))
+    elif isinstance(value, str) and os.path.isfile(value):
+        paths.add(value)
+    return sorted(paths)
+
+def data_items(name, header, rows):
+    """Get render data entries of a data file
+    
+    Args:
+        name (str): data name
+        header (list): column names
+        rows (list): list of lists of row values
+    
+    Returns:
+        dict: render data entries
+    """
+    records = [ dict(zip(header, row)) for row in rows ]
+    return {
+        name: rows,
+        name + '.header': header,
+        name + '.table': [ list(header) ] + rows,
+        name + '.records': records,
+        name + '.first': records[0] if records else {}
+    }
+
+###############################################################################
+
+class Cache(object):
+    """Persistent cache of parsed specs, data files and rendered outputs
+    
+    Entries are pickles (or .xlsx archives) keyed by hashes of their inputs,
+    so stale entries are never hit and the directory may be shared between runs.
+    
+    Attributes:
+        path (str): cache directory; None turns caching off
+    """
+    
+    def __init__(self, path = None):
+        """Constructor method
+        """
+        self.path = path
+        if path is not None:
+            for sub in ('specs', 'data', 'outputs'):
+                os.makedirs(os.path.join(path, sub), exist_ok = True)
+    
+    def file_key(self, path):
+        """Get key of a file (path, size and modification time)
+        """
+        stat = os.stat(path)
+        text = '%s:%d:%d' % (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+    
+    def entry(self, kind, key, ext = '.pickle'):
+        return os.path.join(self.path, kind, key + ext)
+    
+    def load(self, kind, key, build):
+        """Get cached object or build and cache it
+        
+        Args:
+            kind (str): kind of the entry ('specs' or 'data')
+            key (str): key of the entry
+            build (callable): function building the object
+        
+        Returns:
+            tuple: object and whether it was taken from the cache
+        """
+        if self.path is None:
+            return build(), False
+        entry = self.entry(kind, key)
+        if os.path.exists(entry):
+            with open(entry, 'rb') as f:
+                return pickle.load(f), True
+        obj = build()
+        self._dump(entry, pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+        return obj, False
+    
+    def _dump(self, entry, data):
+        # Entries are written atomically, since parallel jobs may share them
+        tmp = '%s.%d.tmp' % (entry, os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, entry)
+
+###############################################################################
+
+def render_job(job):
+    """Render a single output
+    
+    Args:
+        job (dict): job definition (spec, data, output, cache, options)
+    
+    Returns:
+        dict: output path, whether it was taken from the cache and stage timings in seconds
+    """
+    from pyxldrawer.spec import load_spec, spec_key, RenderSpec
+    timings = []
+    cache = Cache(job['cache'])
+    t0 = time.perf_counter()
+    spec_path = job['spec']
+    if cache.path is None:
+        spec = load_spec(spec_path)
+    else:
+        spec, _ = cache.load('specs', cache.file_key(spec_path), lambda: load_spec(spec_path))
+    timings.append(('spec', time.perf_counter() - t0))
+    
+    t0 = time.perf_counter()
+    base = os.path.dirname(os.path.abspath(spec_path))
+    paths = dict([ (name, os.path.join(base, path)) for name, path in spec.get('data', {}).items() ])
+    paths.update(job['data'])
+    data = {}
+    keys = []
+    for name, path in sorted(paths.items()):
+        key = cache.file_key(path)
+        header, rows = cache.load('data', key, lambda: read_data(path))[0]
+        data.update(data_items(name, header, rows))
+        keys.append(name + ':' + key)
+    timings.append(('data', time.perf_counter() - t0))
+    
+    output = job['output']
+    cached = False
+    t0 = time.perf_counter()
+    if cache.path is not None:
+        # Files read by elements (e.g. Dictionary structures) are keyed by their size and modification time too
+        for sheet in spec['sheets']:
+            for item in sheet['elements']:
+                keys += [ path + ':' + cache.file_key(path) for path in referenced_files(item.get('args', {})) ]
+        text = '|'.join([ spec_key(spec), repr(sorted(job['options'].items())) ] + keys)
+        entry = cache.entry('outputs', hashlib.sha1(text.encode('utf-8')).hexdigest(), '.xlsx')
+        if os.path.exists(entry):
+            with open(entry, 'rb') as src, open(output, 'wb') as dst:
+                dst.write(src.read())
+            cached = True
+        else:
+            RenderSpec(spec).render(data, output, **job['options'])
+            with open(output, 'rb') as f:
+                cache._dump(entry, f.read())
+    else:
+        RenderSpec(spec).render(data, output, **job['options'])
+    timings.append(('render', time.perf_counter() - t0))
+    return { 'output': output, 'cached': cached, 'timings': timings }
+
+def output_path(spec, output, many):
+    """Get output path of a spec
+    
+    Args:
+        spec (str): path to a spec file
+        output (str): --output option; a file for a single spec or a directory
+        many (bool): whether there are many specs
+    
+    Returns:
+        str: output path
+    """
+    name = os.path.splitext(os.path.basename(spec))[0] + '.xlsx'
+    if output is None:
+        return name
+    if many or os.path.isdir(output) or output.endswith(os.sep):
+        os.makedirs(output, exist_ok = True)
+        return os.path.join(output, name)
+    return output
+
+def parse_args(argv = None):
+    parser = argparse.ArgumentParser(prog = 'pyxldrawer', description = 'Render excel reports from render specs.')
+    parser.add_argument('specs', nargs = '+', help = 'render spec files (.yaml or .json)')
+    parser.add_argument('-d', '--data', action = 'append', default = [], metavar = 'NAME=PATH',
+                        help = 'data file (.csv or .parquet); may be given many times')
+    parser.add_argument('-o', '--output', help = 'output file (single spec) or directory')
+    parser.add_argument('-j', '--jobs', type = int, default = 1, help = 'number of parallel processes')
+    parser.add_argument('--cache-dir', help = 'directory of the persistent cache')
+    parser.add_argument('--profile', action = 'store_true', help = 'print stage timings to stderr')
+    parser.add_argument('--fast', action = 'store_true', help = 'use FastWorksheets')
+    parser.add_argument('--storage', choices = [ 'memory', 'tmpfs', 'disk' ], default = 'memory',
+                        help = 'temporary storage of worksheet data')
+    parser.add_argument('--constant-memory', action = 'store_true', help = 'flush rows as they are written')
+    parser.add_argument('--compresslevel', type = int, choices = range(10), metavar = '0-9',
+                        help = 'compression level of the archive')
+    return parser.parse_args(argv)
+
+def main(argv = None):
+    """Console entry point
+    """
+    start = time.perf_counter()
+    args = parse_args(argv)
+    data = {}
+    for item in args.data:
+        name, sep, path = item.partition('=')
+        if not sep or not name or not path:
+            sys.stderr.write('pyxldrawer: invalid --data value: %s (expected NAME=PATH)\n' % item)
+            return 2
+        data[name] = os.path.abspath(path)
+    options = {
+        'fast': args.fast,
+        'storage': args.storage,
+        'constant_memory': args.constant_memory,
+        'compresslevel': args.compresslevel
+    }
+    many = len(args.specs) > 1
+    jobs = [ {
+        'spec': spec,
+        'data': data,
+        'output': output_path(spec, args.output, many),
+        'cache': args.cache_dir,
+        'options': options
+    } for spec in args.specs ]
+    # Specs with the same file name in different directories would overwrite each other's outputs
+    outputs = {}
+    for job in jobs:
+        output = os.path.abspath(job['output'])
+        if output in outputs:
+            sys.stderr.write('pyxldrawer: %s and %s would both be rendered to %s\n' % (outputs[output], job['spec'], job['output']))
+            return 2
+        outputs[output] = job['spec']
+    if args.jobs > 1 and len(jobs) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(min(args.jobs, len(jobs))) as pool:
+            results = list(pool.map(render_job, jobs))
+    else:
+        results = [ render_job(job) for job in jobs ]
+    if args.profile:
+        for result in results:
+            stages = ', '.join([ '%s %.1f ms' % (name, t * 1000) for name, t in result['timings'] ])
+            cached = ' (cached)' if result['cached'] else ''
+            sys.stderr.write('%s%s: %s\n' % (result['output'], cached, stages))
+        sys.stderr.write('total: %.1f ms\n' % ((time.perf_counter() - start) * 1000))
+    return 0
+
+###############################################################################
+
+if __name__ == '__main__':
+    sys.exit(main())
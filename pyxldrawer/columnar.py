@@ -0,0 +1,451 @@
+"""Column-oriented table elements drawn in chunks"""
+
+import numpy as np
+from abc import ABCMeta, abstractmethod
+from pyxldrawer.elements import register_format
+
+###############################################################################
+
+def _to_python(values, mask = None):
+    """Convert a chunk of column values to a list of Python objects
+    
+    Args:
+        values (numpy.ndarray): chunk of column values
+        mask (numpy.ndarray): boolean mask of missing values; may be None
+    
+    Returns:
+        list: list of values with missing values replaced with None
+    """
+    values = np.asarray(values)
+    kind = values.dtype.kind
+    if kind == 'f':
+        nan = np.isnan(values)
+        mask = nan if mask is None else mask | nan
+    elif kind == 'M':
+        nat = np.isnat(values)
+        mask = nat if mask is None else mask | nat
+        values = values.astype('datetime64[us]')
+    elif kind == 'm':
+        values = values.astype('timedelta64[us]')
+    values = values.tolist()
+    if mask is not None:
+        for i in np.flatnonzero(mask):
+            values[i] = None
+    return values
+
+###############################################################################
+
+class ColumnTable(object, metaclass = ABCMeta):
+    """Base class of tables drawn column-wise in chunks
+    
+    Data is paged in chunk by chunk while drawing, so only one chunk
+    of Python objects exists at any time. Subclasses have to implement
+    the iter_chunks method and nrows.
+    
+    Attributes:
+        header (list): column names; None if there is no header row
+        height (int): total height (header and data rows)
+        width (int): total width (number of columns)
+        chunk_size (int): number of rows in a chunk
+        col_style (list): list of style dicts (one per column)
+        header_style (dict): style dict of header cells
+    """
+    
+    # -------------------------------------------------------------------------
+    
+    @property
+    def header(self):
+        return self._header
+    @header.setter
+    def header(self, value):
+        if value is not None:
+            if not isinstance(value, (list, tuple)):
+                raise TypeError('header has to be a list or None.')
+            value = [ str(x) for x in value ]
+        self._header = value
+    
+    @property
+    def chunk_size(self):
+        return self._chunk_size
+    @chunk_size.setter
+    def chunk_size(self, value):
+        if not isinstance(value, int):
+            raise TypeError('chunk_size has to be an int.')
+        elif value < 1:
+            raise ValueError('chunk_size has to be positive.')
+        self._chunk_size = value
+    
+    @property
+    def col_style(self):
+        return self._col_style
+    @col_style.setter
+    def col_style(self, value):
+        if isinstance(value, dict):
+            value = [ value ] * self.ncol
+        elif not isinstance(value, list) or not all([ isinstance(x, dict) for x in value ]):
+            raise TypeError('col_style has to be a dict or a list of dicts.')
+        elif len(value) != self.ncol:
+            raise ValueError('col_style has to have one style dict per column.')
+        self._col_style = value
+    
+    @property
+    def height(self):
+        return self.nrows + (1 if self.header is not None else 0)
+    
+    @property
+    def width(self):
+        return self.ncol
+    
+    # -------------------------------------------------------------------------
+    
+    @abstractmethod
+    def iter_chunks(self):
+        """Iterate over chunks of data
+        
+        Yields:
+            tuple: number of rows, list of column value arrays and list of null masks (or None)
+        """
+    
+    def draw(self, x, y, ws, wb):
+        """Draw table in a worksheet
+        
+        Args:
+            x (int): x-coordinate (rows)
+            y (int): y-coordinate (columns)
+            ws (xlsxwriter.worksheet.Worksheet): worksheet to draw in
+            wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
+        """
+        formats = [ register_format(wb, s) if s else None for s in self.col_style ]
+        if self.header is not None:
+            header_format = register_format(wb, self.header_style) if self.header_style else None
+            for j, name in enumerate(self.header):
+                ws.write_string(x, y + j, name, header_format)
+            x += 1
+        grid = hasattr(ws, 'write_grid')
+        for n, columns, masks in self.iter_chunks():
+            columns = [ _to_python(v, m) for v, m in zip(columns, masks) ]
+            if grid:
+                ws.write_grid(x, y, list(zip(*columns)), [ formats ] * n)
+            else:
+                for j, values in enumerate(columns):
+                    fmt = formats[j]
+                    for i, value in enumerate(values):
+                        if value is None:
+                            if fmt is not None:
+                                ws.write_blank(x + i, y + j, None, fmt)
+                        else:
+                            ws.write(x + i, y + j, value, fmt)
+            x += n
+
+###############################################################################
+
+class MappedTable(ColumnTable):
+    """Table backed by memory-mapped columns
+    
+    Columns are memory-mapped .npy files (or any NumPy arrays) or columns of an Arrow IPC file,
+    so datasets larger than the available memory may be drawn without materializing them.
+    
+    Attributes:
+        columns (list): list of column arrays (numpy arrays, memory maps or pyarrow chunked arrays)
+        nrows (int): number of data rows
+        ncol (int): number of columns
+    """
+    
+    def __init__(self, columns, header = None, chunk_size = 10000,
+                 col_style = {}, header_style = {}):
+        """Constructor method
+        
+        Args:
+            columns (list/str): list of paths to .npy files or arrays, or a path to an Arrow IPC file
+            header (list): column names; defaults to the Arrow schema names or to no header row
+            chunk_size (int): number of rows in a chunk
+            col_style (dict/list): style dict or a list of style dicts (one per column)
+            header_style (dict): style dict of header cells
+        """
+        if isinstance(columns, str):
+            table = self.open_arrow(columns)
+            if header is None:
+                header = table.column_names
+            columns = table.columns
+        elif not isinstance(columns, (list, tuple)) or len(columns) < 1:
+            raise TypeError('columns has to be a path to an Arrow IPC file or a non-empty list.')
+        else:
+            columns = [ np.load(c, mmap_mode = 'r') if isinstance(c, str) else c for c in columns ]
+        lengths = set([ len(c) for c in columns ])
+        if len(lengths) > 1:
+            raise ValueError('all columns have to have the same length.')
+        self.columns = list(columns)
+        self.nrows = lengths.pop()
+        self.ncol = len(self.columns)
+        self.header = header
+        if self.header is not None and len(self.header) != self.ncol:
+            raise ValueError('header has to have one name per column.')
+        self.chunk_size = chunk_size
+        self.col_style = col_style
+        self.header_style = header_style
+    
+    def open_arrow(self, path):
+        """Open memory-mapped Arrow IPC file
+        
+        Args:
+            path (str): path to an Arrow IPC file
+        
+        Returns:
+            pyarrow.Table: table backed by the memory map
+        """
+        import pyarrow as pa
+        source = pa.memory_map(path, 'r')
+        try:
+            return pa.ipc.open_file(source).read_all()
+        except pa.ArrowInvalid:
+            return pa.ipc.open_stream(source).read_all()
+    
+    def iter_chunks(self):
+        """Iterate over chunks of memory-mapped columns
+        
+        Yields:
+            tuple: number of rows, list of column value arrays and list of null masks (or None)
+        """
+        for start in range(0, self.nrows, self.chunk_size):
+            n = min(self.chunk_size, self.nrows - start)
+            values = []
+            masks = []
+            for column in self.columns:
+                if isinstance(column, np.ndarray):
+                    values.append(column[start:start + n])
+                    masks.append(None)
+                else:
+                    chunk = column.slice(start, n)
+                    values.append(chunk.to_numpy())
+                    masks.append(chunk.is_null().to_numpy() if chunk.null_count else None)
+            yield n, values, masks
+
+###############################################################################
+
+class BatchReader(object):
+    """Background reader of Parquet/Arrow record batches
+    
+    Batches are read one at a time by a background thread into a bounded queue,
+    so reading overlaps with drawing and peak memory is bounded by the batch size
+    and the number of prefetched batches.
+    
+    Arrow data may be given in the IPC file format or in the IPC stream format (e.g. a dumped stream);
+    rows of streams are counted by a pass over the memory-mapped batches, as the height has to be known
+    before drawing, so streams have to be stored in files.
+    
+    Attributes:
+        path (str): path to a Parquet file or an Arrow IPC file (file or stream format)
+        batch_size (int): number of rows in a batch (Parquet files only; Arrow files keep their own batches)
+        columns (list): names of columns to read; defaults to all columns
+        prefetch (int): maximum number of batches read ahead
+        schema (pyarrow.Schema): schema of the read columns
+        num_rows (int): total number of rows
+    """
+    
+    def __init__(self, path, batch_size = 65536, columns = None, prefetch = 2):
+        """Constructor method
+        """
+        import pyarrow as pa
+        self.path = path
+        self.batch_size = batch_size
+        self.columns = columns
+        self.prefetch = prefetch
+        if self.is_parquet():
+            import pyarrow.parquet as pq
+            pf = pq.ParquetFile(path)
+            schema = pf.schema_arrow
+            self.num_rows = pf.metadata.num_rows
+        else:
+            schema = self.open_ipc().schema
+            self.num_rows = sum([ batch.num_rows for batch in self.iter_ipc() ])
+        if columns is not None:
+            schema = pa.schema([ schema.field(name) for name in columns ])
+        self.schema = schema
+    
+    def is_parquet(self):
+        """Check whether the file is a Parquet file
+        """
+        with open(self.path, 'rb') as f:
+            return f.read(4) == b'PAR1'
+    
+    def open_ipc(self):
+        """Open memory-mapped Arrow IPC file in the file or in the stream format
+        
+        Returns:
+            pyarrow.ipc.RecordBatchFileReader/RecordBatchStreamReader: reader of the file
+        """
+        import pyarrow as pa
+        try:
+            return pa.ipc.open_file(pa.memory_map(self.path, 'r'))
+        except pa.ArrowInvalid:
+            return pa.ipc.open_stream(pa.memory_map(self.path, 'r'))
+    
+    def iter_ipc(self):
+        """Iterate over record batches of the Arrow IPC file
+        
+        Yields:
+            pyarrow.RecordBatch: record batch
+        """
+        reader = self.open_ipc()
+        if hasattr(reader, 'get_batch'):
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i)
+        else:
+            for batch in reader:
+                yield batch
+    
+    def read_batches(self):
+        """Read record batches in the current thread
+        
+        Yields:
+            pyarrow.RecordBatch: record batch
+        """
+        if self.is_parquet():
+            import pyarrow.parquet as pq
+            pf = pq.ParquetFile(self.path)
+            for batch in pf.iter_batches(batch_size = self.batch_size, columns = self.columns):
+                yield batch
+        else:
+            for batch in self.iter_ipc():
+                if self.columns is not None:
+                    batch = batch.select(self.columns)
+                yield batch
+    
+    def __iter__(self):
+        """Iterate over record batches read by a background thread
+        
+        Yields:
+            pyarrow.RecordBatch: record batch
+        """
+        import threading, queue
+        end = object()
+        batches = queue.Queue(maxsize = self.prefetch)
+        stop = threading.Event()
+        
+        def put(item):
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout = .1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        
+        def produce():
+            try:
+                for batch in self.read_batches():
+                    if not put(batch):
+                        return
+            except Exception as exc:
+                put(exc)
+            put(end)
+        
+        thread = threading.Thread(target = produce, daemon = True)
+        thread.start()
+        try:
+            while True:
+                item = batches.get()
+                if item is end:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+
+###############################################################################
+
+class BatchTable(ColumnTable):
+    """Table drawn from Parquet/Arrow record batches
+    
+    Record batches are read by a background thread (see the BatchReader class)
+    and converted to Python objects one batch at a time.
+    Values and null masks are taken from the Arrow arrays. Date, time and timestamp columns
+    get a number format by their Arrow type (see TYPE_FORMATS) unless their style has one,
+    since Excel shows dates written without a format as plain numbers.
+    
+    Attributes:
+        reader (BatchReader): reader of record batches
+        types (list): Arrow types of columns
+        nrows (int): number of data rows
+        ncol (int): number of columns
+    """
+    
+    TYPE_FORMATS = {
+        'date': 'yyyy-mm-dd',
+        'timestamp': 'yyyy-mm-dd hh:mm:ss',
+        'time': 'hh:mm:ss'
+    }
+    
+    def __init__(self, source, header = None, columns = None, batch_size = 65536,
+                 prefetch = 2, col_style = {}, header_style = {}):
+        """Constructor method
+        
+        Args:
+            source (str/BatchReader): path to a Parquet file or an Arrow IPC file or a BatchReader
+            header (list): column names; defaults to the schema names; False turns the header row off
+            columns (list): names of columns to read; defaults to all columns
+            batch_size (int): number of rows in a batch
+            prefetch (int): maximum number of batches read ahead
+            col_style (dict/list): style dict or a list of style dicts (one per column)
+            header_style (dict): style dict of header cells
+        """
+        if isinstance(source, str):
+            source = BatchReader(source, batch_size = batch_size, columns = columns, prefetch = prefetch)
+        elif not isinstance(source, BatchReader):
+            raise TypeError('source has to be a path or a BatchReader.')
+        self.reader = source
+        self.types = list(source.schema.types)
+        self.nrows = source.num_rows
+        self.ncol = len(source.schema.names)
+        if header is None:
+            header = source.schema.names
+        elif header is False:
+            header = None
+        self.header = header
+        if self.header is not None and len(self.header) != self.ncol:
+            raise ValueError('header has to have one name per column.')
+        self.chunk_size = source.batch_size
+        self.col_style = col_style
+        self.col_style = [ self.type_style(style, t) for style, t in zip(self.col_style, self.types) ]
+        self.header_style = header_style
+    
+    def type_style(self, style, arrow_type):
+        """Add default number format of an Arrow type to a column style
+        
+        Args:
+            style (dict): style dict of the column
+            arrow_type (pyarrow.DataType): type of the column
+        
+        Returns:
+            dict: style dict with a number format
+        """
+        import pyarrow as pa
+        if 'num_format' in style:
+            return style
+        if pa.types.is_date(arrow_type):
+            kind = 'date'
+        elif pa.types.is_timestamp(arrow_type):
+            kind = 'timestamp'
+        elif pa.types.is_time(arrow_type):
+            kind = 'time'
+        else:
+            return style
+        return dict(style, num_format = self.TYPE_FORMATS[kind])
+    
+    def iter_chunks(self):
+        """Iterate over record batches
+        
+        Yields:
+            tuple: number of rows, list of column value arrays and list of null masks (or None)
+        """
+        for batch in self.reader:
+            values = []
+            masks = []
+            for column in batch.columns:
+                values.append(column.to_numpy(zero_copy_only = False))
+                masks.append(column.is_null().to_numpy(zero_copy_only = False) if column.null_count else None)
+            yield batch.num_rows, values, masks
+
+###############################################################################
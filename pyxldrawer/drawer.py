@@ -1,12 +1,15 @@
 """The main drawing controller class"""
 
 import xlsxwriter
-import re
+import re, os, threading, warnings
+import xlsxwriter.workbook
 from collections import OrderedDict
+from zipfile import ZipFile
 from xlsxwriter.utility import xl_rowcol_to_cell
+from pyxldrawer.elements import comment_batch, row_fit
 
 ###############################################################################
-    
+
 class Drawer(object):
     """Elements drawer
     
@@ -29,8 +32,20 @@ class Drawer(object):
         prev_x (list): list of previous x-coordinates
         prev_y (list): list of previous y-coordinates
         checkpoints (OrderedDict): set of checkpoints
+        paging (bool): whether elements crossing the page size are continued on new worksheets
+        page_size (int): maximum number of rows of a worksheet
+        page_header (list): elements repeated at the top of every new worksheet
+        page_name (str): name template of new worksheets; {name} is the name of the first worksheet and {n} is the page number
+        pages (list): list of worksheets the Drawer has drawn on
+        comments (dict): comment batching options (see the set_comments method); None if comments are written directly
+        ranges (OrderedDict): registered ranges of drawn elements (name => DrawnRange)
+        row_fit (dict): row height fitting options (see the set_row_fit method); None if row heights are not fitted
+        governor (MemoryGovernor): memory governor checked after drawn elements (see the set_governor method); None if memory is not governed
     """
     
+    MAX_ROWS = 1048576
+    MAX_COLS = 16384
+    
     # -------------------------------------------------------------------------
     
     @property
@@ -95,6 +110,34 @@ class Drawer(object):
         self.checkpoints = OrderedDict()
         self.prev_x = []
         self.prev_y = []
+        self.paging = False
+        self.page_size = self.MAX_ROWS
+        self.page_header = []
+        self.page_name = '{name} ({n})'
+        self.pages = [ws]
+        self.comments = None
+        self.ranges = OrderedDict()
+        self.row_fit = None
+        self.governor = None
+        self.session = None
+    
+    @classmethod
+    def open(cls, sink, name = None, fast = False, **options):
+        """Open a drawing session writing a new workbook into a file-like sink
+        
+        It is meant to be used as a context manager yielding a Drawer on the first worksheet.
+        See the Session class for the available options.
+        
+        Args:
+            sink (file-like/callable/str): object with a write or sendall method, callable or a file path
+            name (str): name of the first worksheet
+            fast (bool): whether worksheets should be FastWorksheets (see the fastsheet module)
+            **options: keyword arguments passed to the Session constructor
+        
+        Returns:
+            Session: new drawing session
+        """
+        return Session(sink, name = name, fast = fast, **options)
     
     def __str__(self):
         """String representation of a Drawer object
@@ -109,16 +152,322 @@ class Drawer(object):
         text += '\n\tworksheet: ' + str(self.ws)
         return text
     
-    def draw(self, elem, **kwargs):
+    def draw(self, elem, name = None, release = False, **kwargs):
         """Draw an element in a worksheet
         
+        If paging is on and the element crosses the page size,
+        then it is continued on a new worksheet (see the set_paging method).
+        Elements with a bind method (e.g. charts) are bound to the Drawer before drawing,
+        so they may resolve references to registered ranges.
+        If a memory governor is set, it is checked after drawing and under memory pressure
+        elements drawn with release = True are released (see the set_governor method).
+        Releasing is opt-in, since released matrices can not be drawn, viewed nor summarized anymore.
+        
         Args:
             elem (any): any object with a proper .draw() method
+            name (str): name under which the range of the element is registered (see the ref method)
+            release (bool): whether the element may be released under memory pressure
+                (it must not be used after drawing, e.g. by views or summaries; ignored if name is given)
             **kwargs: keyword arguments passed to the invoked draw method
         """
-        elem.draw(self.x, self.y, self.ws, self.wb, **kwargs)
-        self.height = elem.height
-        self.width = elem.width
+        if self.y + elem.width > self.MAX_COLS:
+            raise ValueError('element crosses the column limit of a worksheet.')
+        if hasattr(elem, 'bind'):
+            elem.bind(self)
+        if self.x + elem.height > self.page_size:
+            if not self.paging:
+                raise ValueError('element crosses the row limit of a worksheet.')
+            if name is not None and hasattr(elem, 'row_heights'):
+                raise ValueError('ranges of elements split between pages cannot be registered.')
+            self._draw_paged(elem, **kwargs)
+        else:
+            elem.draw(self.x, self.y, self.ws, self.wb, **kwargs)
+            self.height = elem.height
+            self.width = elem.width
+        if name is not None:
+            self.ranges[name] = DrawnRange(self.ws.get_name(), self.x, self.y, elem)
+        if self.governor is not None:
+            if name is None and release:
+                self.governor.release(elem)
+            self.governor.check(self)
+    
+    def ref(self, name, row = None, col = None, skip = 0):
+        """Get reference to a registered range
+        
+        Args:
+            name (str): name of the range
+            row (int): index of an element row; None means all rows
+            col (int): index of an element column; None means all columns
+            skip (int): number of leading rows (or columns, if row is given) left out
+        
+        Returns:
+            str: absolute reference with the sheet name (e.g. 'Sheet1'!$B$2:$B$10)
+        """
+        try:
+            rng = self.ranges[name]
+        except KeyError:
+            raise KeyError('there is no registered range named %s.' % name)
+        return rng.ref(row = row, col = col, skip = skip)
+    
+    async def draw_async(self, source, factory = None, block_size = None, buffer = 2, **kwargs):
+        """Draw blocks from an asynchronous source one below another
+        
+        Fetching of next blocks overlaps with drawing of the current one.
+        A producer task reads the source into a bounded queue (so it waits when drawing lags behind)
+        and blocks are drawn by a single dedicated thread, since worksheets are not thread-safe.
+        The Drawer is moved vertically after every block.
+        Under memory pressure blocks fetched ahead are kept in a spill file of the memory governor.
+        
+        Args:
+            source (async iterable): blocks (lists of rows or elements) or rows (if block_size is given)
+            factory (callable): function making an element out of a block; defaults to the Matrix constructor
+            block_size (int): number of rows grouped into a block; None means that the source yields blocks
+            buffer (int): maximum number of blocks fetched ahead
+            **kwargs: keyword arguments passed to the invoked draw method
+        
+        Returns:
+            int: number of drawn blocks
+        """
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        from pyxldrawer.governor import SpilledBlock
+        if factory is None:
+            from pyxldrawer.elements import Matrix as factory
+        if not isinstance(buffer, int) or buffer < 1:
+            raise ValueError('buffer has to be a positive int.')
+        end = object()
+        blocks = asyncio.Queue(maxsize = buffer)
+        
+        def hold(block):
+            if self.governor is None or hasattr(block, 'draw'):
+                return block
+            return self.governor.spill(block)
+        
+        async def produce():
+            try:
+                if block_size is None:
+                    async for block in source:
+                        await blocks.put(hold(block))
+                else:
+                    block = []
+                    async for row in source:
+                        block.append(row)
+                        if len(block) >= block_size:
+                            await blocks.put(hold(block))
+                            block = []
+                    if block:
+                        await blocks.put(hold(block))
+            except Exception as exc:
+                await blocks.put(exc)
+            await blocks.put(end)
+        
+        def consume(block):
+            if isinstance(block, SpilledBlock):
+                block = block.load()
+            # Elements made here are not referenced anywhere else, so they may be released
+            if hasattr(block, 'draw'):
+                self.draw(block, **kwargs)
+            else:
+                self.draw(factory(block), release = True, **kwargs)
+            self.move_vertical()
+        
+        loop = asyncio.get_running_loop()
+        producer = loop.create_task(produce())
+        executor = ThreadPoolExecutor(max_workers = 1)
+        n = 0
+        try:
+            while True:
+                block = await blocks.get()
+                if block is end:
+                    break
+                if isinstance(block, Exception):
+                    raise block
+                await loop.run_in_executor(executor, consume, block)
+                n += 1
+        finally:
+            producer.cancel()
+            executor.shutdown(wait = True)
+        return n
+    
+    def set_paging(self, page_size = None, header = None, name = None):
+        """Turn on paging
+        
+        In the paging mode elements that would cross the page size are continued on a new worksheet
+        (of the same workbook, so all formats are shared) with header elements repeated at its top.
+        Matrices (and their views) are split between rows, so they are written in one pass;
+        other elements are moved to a new worksheet as a whole.
+        
+        Args:
+            page_size (int): maximum number of rows of a worksheet; defaults to the Excel limit
+            header (list): elements drawn (one below another) at the top of every new worksheet
+            name (str): name template of new worksheets; {name} is the name of the first worksheet and {n} is the page number
+        """
+        if page_size is None:
+            page_size = self.MAX_ROWS
+        if not isinstance(page_size, int):
+            raise TypeError('page_size has to be an int.')
+        elif page_size < 1 or page_size > self.MAX_ROWS:
+            raise ValueError('page_size has to be between 1 and %d.' % self.MAX_ROWS)
+        if header is None:
+            header = []
+        if not isinstance(header, list):
+            raise TypeError('header has to be a list of elements.')
+        if sum([ x.height for x in header ]) >= page_size:
+            raise ValueError('header has to be lower than page_size.')
+        self.paging = True
+        self.page_size = page_size
+        self.page_header = header
+        if name is not None:
+            self.page_name = name
+    
+    def new_page(self, name = None):
+        """Continue on a new worksheet
+        
+        The Drawer is moved below the header elements drawn at the top of the new worksheet.
+        Its y-coordinate is kept.
+        
+        Args:
+            name (str): name of the new worksheet; defaults to the page name template
+        """
+        if name is None:
+            name = self.page_name.format(name = self.pages[0].get_name(), n = len(self.pages) + 1)
+        if type(self.ws) is xlsxwriter.worksheet.Worksheet:
+            self.ws = self.wb.add_worksheet(name[:31])
+        else:
+            self.ws = self.wb.add_worksheet(name[:31], worksheet_class = type(self.ws))
+        self.pages.append(self.ws)
+        if self.comments is not None:
+            comment_batch(self.ws, create = True, **self.comments)
+        if self.row_fit is not None:
+            row_fit(self.ws, create = True, **self.row_fit)
+        self.prev_x.append(self.x)
+        self.prev_y.append(self.y)
+        self.x = 0
+        for elem in self.page_header:
+            elem.draw(self.x, self.y, self.ws, self.wb)
+            self.x += elem.height
+    
+    def set_comments(self, policy = 'all', max_count = None, notes_name = '{name} notes'):
+        """Turn on comment batching
+        
+        Comments of elements are collected in per-sheet batches with shared params
+        and written by the finalize method (see the CommentBatch class).
+        Outside of sessions it is called when the workbook is closed.
+        
+        Args:
+            policy (str): policy for large volumes of comments; 'all', 'cap', 'first' or 'sheet'
+            max_count (int): maximum number of comments written as notes; None means no limit
+            notes_name (str): name of the notes sheet; {name} is the name of the worksheet
+        """
+        self.comments = { 'policy': policy, 'max_count': max_count, 'notes_name': notes_name }
+        _finalize_on_close(self)
+        for ws in self.pages:
+            batch = comment_batch(ws, create = True, **self.comments)
+            batch.policy = policy
+            batch.max_count = max_count
+            batch.notes_name = notes_name
+    
+    def set_row_fit(self, default_height = 15.0, default_width = 8.43, line_spacing = 1.25):
+        """Turn on fitting of row heights to wrapped text
+        
+        Heights of rows with wrapped cells are estimated and set by the finalize method
+        with a single set_row call per row (see the RowFit class).
+        Outside of sessions it is called when the workbook is closed.
+        
+        Args:
+            default_height (float): default row height in points
+            default_width (float): default column width in characters
+            line_spacing (float): line height as a multiple of the font size
+        """
+        self.row_fit = {
+            'default_height': default_height,
+            'default_width': default_width,
+            'line_spacing': line_spacing
+        }
+        _finalize_on_close(self)
+        for ws in self.pages:
+            fit = row_fit(ws, create = True, **self.row_fit)
+            fit.default_height = default_height
+            fit.default_width = default_width
+            fit.line_spacing = line_spacing
+    
+    def set_governor(self, governor = None, **kwargs):
+        """Turn on memory governing
+        
+        The governor is checked after every drawn element and downgrades drawing strategy
+        under memory pressure (see the MemoryGovernor class). Only elements drawn with release = True
+        (and blocks drawn by the draw_async method) have their cells dropped. Only FastWorksheets may have
+        their finished rows flushed, since standard worksheets can not turn on constant memory mode
+        once they have been written to.
+        
+        Args:
+            governor (MemoryGovernor/int): memory governor or a memory budget in bytes; None turns governing off
+            **kwargs: keyword arguments passed to the MemoryGovernor constructor (if a budget is given)
+        """
+        if isinstance(governor, int):
+            from pyxldrawer.governor import MemoryGovernor
+            governor = MemoryGovernor(governor, **kwargs)
+        self.governor = governor
+    
+    def finalize(self):
+        """Write batched content of the worksheets the Drawer has drawn on
+        
+        It has to be called before the workbook is closed (sessions and workbooks closed
+        with their close method call it, see the set_comments and set_row_fit methods).
+        """
+        for ws in self.pages:
+            batch = comment_batch(ws)
+            if batch is not None:
+                batch.flush(self.wb)
+            fit = row_fit(ws)
+            if fit is not None:
+                fit.flush()
+    
+    def _page_top(self):
+        """Get the first row below the page header
+        """
+        return sum([ x.height for x in self.page_header ])
+    
+    def _draw_paged(self, elem, **kwargs):
+        """Draw an element splitting it between worksheets
+        
+        Args:
+            elem (any): any object with a proper .draw() method
+            **kwargs: keyword arguments passed to the invoked draw method
+        """
+        if not hasattr(elem, 'row_heights'):
+            if self._page_top() + elem.height > self.page_size:
+                raise ValueError('element is higher than a page.')
+            self.new_page()
+            elem.draw(self.x, self.y, self.ws, self.wb, **kwargs)
+            self.height = elem.height
+            self.width = elem.width
+            return
+        # Static rules are evaluated over the whole element, not page by page
+        static = elem.apply_rules() if elem.static_rules else None
+        heights = elem.row_heights()
+        start = 0
+        while True:
+            room = self.page_size - self.x
+            stop = start
+            height = 0
+            while stop < len(heights) and height + heights[stop] <= room:
+                height += heights[stop]
+                stop += 1
+            if stop > start:
+                part = elem.page_part(start, stop, static)
+                part.draw(self.x, self.y, self.ws, self.wb, **kwargs)
+                self.height = height
+                self.width = elem.width
+                start = stop
+            elif self.x <= self._page_top():
+                raise ValueError('row %d of the element is higher than a page.' % start)
+            if start >= len(heights):
+                break
+            self.new_page()
+        # Parts are drawn in their own places, so the element has no single origin
+        elem.origin = None
+        elem.paged = True
     
     def move(self, x = 0, y = 0, back = False):
         """Move drawer
@@ -201,7 +550,7 @@ class Drawer(object):
                 self.x = x
             if y is not None:
                 self.y = y
-        
+    
     def fallback(self, n):
         """Fall back to nth previous step
         
@@ -237,5 +586,298 @@ class Drawer(object):
             x (int): number of rows to shift when determining position
         """
         return re.sub('[^0-9]', '', self.xl_position(x = x))
+
+###############################################################################
+
+class DrawnRange(object):
+    """Range of a drawn element
+    
+    Attributes:
+        sheet (str): worksheet name
+        x (int): x-coordinate of the upper-left corner (rows)
+        y (int): y-coordinate of the upper-left corner (columns)
+        elem (any): drawn element
+    """
+    
+    def __init__(self, sheet, x, y, elem):
+        """Constructor method
+        """
+        self.sheet = sheet
+        self.x = x
+        self.y = y
+        self.elem = elem
+    
+    def __repr__(self):
+        return 'DrawnRange(%s)' % self.ref()
+    
+    def _offsets(self, sizes):
+        """Get offsets of rows/columns from their sizes
+        """
+        offsets = [ 0 ]
+        for size in sizes:
+            offsets.append(offsets[-1] + size)
+        return offsets
+    
+    def ref(self, row = None, col = None, skip = 0):
+        """Get reference to the range or its row/column
+        
+        Rows and columns are rows and columns of elements (e.g. of a Matrix);
+        elements without row_heights/col_widths methods have rows and columns of single cells.
+        
+        Args:
+            row (int): index of an element row; None means all rows
+            col (int): index of an element column; None means all columns
+            skip (int): number of leading rows (or columns, if row is given) left out
+        
+        Returns:
+            str: absolute reference with the sheet name (e.g. 'Sheet1'!$B$2:$B$10)
+        """
+        elem = self.elem
+        heights = elem.row_heights() if hasattr(elem, 'row_heights') else [ 1 ] * elem.height
+        widths = elem.col_widths() if hasattr(elem, 'col_widths') else [ 1 ] * elem.width
+        rows = self._offsets(heights)
+        cols = self._offsets(widths)
+        try:
+            if row is None:
+                r0, r1 = rows[skip if col is not None else 0], rows[-1] - 1
+            else:
+                r0, r1 = rows[row], rows[row + 1] - 1
+            if col is None:
+                c0, c1 = cols[skip if row is not None else 0], cols[-1] - 1
+            else:
+                c0, c1 = cols[col], cols[col + 1] - 1
+        except IndexError:
+            raise IndexError('row or column index out of range.')
+        if r1 < r0 or c1 < c0:
+            raise ValueError('referenced range is empty.')
+        sheet = "'%s'!" % self.sheet.replace("'", "''")
+        first = xl_rowcol_to_cell(self.x + r0, self.y + c0, row_abs = True, col_abs = True)
+        last = xl_rowcol_to_cell(self.x + r1, self.y + c1, row_abs = True, col_abs = True)
+        return sheet + first if first == last else sheet + first + ':' + last
+
+###############################################################################
+
+def _finalize_on_close(drawer):
+    """Make the close method of a workbook finalize a drawer first
+    
+    Only the close method of the given workbook object is wrapped (sessions finalize their drawers themselves).
+    """
+    wb = drawer.wb
+    if isinstance(wb, _SessionWorkbook):
+        return
+    drawers = getattr(wb.close, 'drawers', None)
+    if drawers is None:
+        close = wb.close
+        def close_workbook():
+            for d in close_workbook.drawers:
+                d.finalize()
+            return close()
+        drawers = close_workbook.drawers = []
+        wb.close = close_workbook
+    if drawer not in drawers:
+        drawers.append(drawer)
+
+###############################################################################
+
+class _ChunkedSink(object):
+    """Buffered writer passing data to a sink in chunks
+    
+    It exposes only write and flush, so zipfile treats it as a non-seekable stream
+    and writes the archive straight through it without keeping a full copy.
+    """
+    
+    def __init__(self, sink, chunk_size = 65536):
+        if hasattr(sink, 'sendall'):
+            self.emit = sink.sendall
+        elif hasattr(sink, 'write'):
+            self.emit = sink.write
+        elif callable(sink):
+            self.emit = sink
+        else:
+            raise TypeError('sink has to have a write or sendall method or be callable.')
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+        self.written = 0
+    
+    def write(self, data):
+        self.buffer += data
+        if len(self.buffer) >= self.chunk_size:
+            self.emit(bytes(self.buffer))
+            self.buffer = bytearray()
+        self.written += len(data)
+        return len(data)
+    
+    def flush(self):
+        if self.buffer:
+            self.emit(bytes(self.buffer))
+            self.buffer = bytearray()
+
+###############################################################################
+
+_zip_options = threading.local()
+
+class _LevelZipFile(ZipFile):
+    """ZipFile of xlsxwriter workbooks taking the compression level of the workbook being stored
     
-###############################################################################
\ No newline at end of file
+    The level is set per thread by the _SessionWorkbook class; without it the class behaves as ZipFile.
+    The level is applied also to members written with explicit ZipInfos.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        level = getattr(_zip_options, 'compresslevel', None)
+        if level is not None:
+            kwargs.setdefault('compresslevel', level)
+        ZipFile.__init__(self, *args, **kwargs)
+    
+    def writestr(self, zinfo_or_arcname, data, compress_type = None, compresslevel = None):
+        if compresslevel is None:
+            compresslevel = self.compresslevel
+        return ZipFile.writestr(self, zinfo_or_arcname, data, compress_type, compresslevel)
+
+# xlsxwriter does not expose the compression level, so _LevelZipFile is bound where it looks ZipFile up;
+# if that lookup changes in some version, compression levels are not supported
+_LEVELS = getattr(xlsxwriter.workbook, 'ZipFile', None) is ZipFile
+if _LEVELS:
+    xlsxwriter.workbook.ZipFile = _LevelZipFile
+
+class _SessionWorkbook(xlsxwriter.Workbook):
+    """Workbook with configurable compression level of the archive
+    """
+    
+    compresslevel = None
+    
+    def _store_workbook(self):
+        if self.compresslevel is None:
+            return xlsxwriter.Workbook._store_workbook(self)
+        if not _LEVELS:
+            warnings.warn('compresslevel is not supported with this xlsxwriter version; it is ignored.')
+            return xlsxwriter.Workbook._store_workbook(self)
+        _zip_options.compresslevel = self.compresslevel
+        try:
+            return xlsxwriter.Workbook._store_workbook(self)
+        finally:
+            _zip_options.compresslevel = None
+
+###############################################################################
+
+class Session(object):
+    """Workbook drawing session
+    
+    Session creates a workbook with in-memory, tmpfs-backed or disk-backed temporary storage
+    and writes the final archive into a sink in chunks when it is closed.
+    It is used as a context manager (see the Drawer.open method).
+    
+    Attributes:
+        wb (xlsxwriter.workbook.Workbook): workbook of the session
+        drawers (list): drawers of the session (one per worksheet added with the add_drawer method)
+        sink (_ChunkedSink): buffered sink writer
+        fast (bool): whether worksheets are FastWorksheets
+        comments (dict): comment batching options of drawers; None if comments are written directly
+        row_fit (dict): row height fitting options of drawers; None if row heights are not fitted
+        governor (MemoryGovernor): memory governor shared by drawers; None if memory is not governed
+        closed (bool): whether the session is closed
+    """
+    
+    STORAGE = ('memory', 'tmpfs', 'disk')
+    
+    def __init__(self, sink, name = None, fast = False, storage = 'memory',
+                 constant_memory = False, compresslevel = None, chunk_size = 65536,
+                 comments = None, row_fit = None, governor = None, options = None):
+        """Constructor method
+        
+        Args:
+            sink (file-like/callable/str): object with a write or sendall method, callable or a file path
+            name (str): name of the first worksheet
+            fast (bool): whether worksheets should be FastWorksheets (see the fastsheet module)
+            storage (str): temporary storage of worksheet data; 'memory', 'tmpfs' (/dev/shm if available) or 'disk'
+            constant_memory (bool): whether rows should be flushed as they are written (ignored with memory storage)
+            compresslevel (int): compression level of the archive (0-9); defaults to the zipfile default
+            chunk_size (int): size of chunks written into the sink in bytes
+            comments (dict): comment batching options of drawers (see the Drawer.set_comments method); None turns batching off
+            row_fit (dict): row height fitting options of drawers (see the Drawer.set_row_fit method); None turns fitting off
+            governor (dict): keyword arguments of a MemoryGovernor shared by drawers; None turns governing off
+            options (dict): additional xlsxwriter workbook options
+        """
+        if storage not in self.STORAGE:
+            raise ValueError('storage has to be one of: %s.' % ', '.join(self.STORAGE))
+        options = dict(options or {})
+        options['constant_memory'] = constant_memory
+        if storage == 'memory':
+            options['in_memory'] = True
+        elif storage == 'tmpfs' and os.path.isdir('/dev/shm'):
+            options['tmpdir'] = '/dev/shm'
+        self.path = None
+        if isinstance(sink, str):
+            self.path = sink
+            sink = open(sink, 'wb')
+        self.sink = _ChunkedSink(sink, chunk_size)
+        self.wb = _SessionWorkbook(self.sink, options)
+        self.wb.compresslevel = compresslevel
+        self.fast = fast
+        self.comments = comments
+        self.row_fit = row_fit
+        self.governor = None
+        if governor is not None:
+            from pyxldrawer.governor import MemoryGovernor
+            self.governor = MemoryGovernor(**governor)
+        self.drawers = []
+        self.closed = False
+        self._file = sink if self.path is not None else None
+        self._name = name
+    
+    def __enter__(self):
+        return self.add_drawer(self._name)
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            self._file.close()
+        return False
+    
+    def add_drawer(self, name = None, x = 0, y = 0):
+        """Add a worksheet and a Drawer on it
+        
+        Args:
+            name (str): worksheet name
+            x (int): initial x-coordinate
+            y (int): initial y-coordinate
+        
+        Returns:
+            Drawer: new drawer
+        """
+        if self.fast:
+            from pyxldrawer.fastsheet import add_fast_worksheet
+            ws = add_fast_worksheet(self.wb, name)
+        else:
+            ws = self.wb.add_worksheet(name)
+        drawer = Drawer(ws, self.wb, x, y)
+        drawer.session = self
+        if self.comments is not None:
+            drawer.set_comments(**self.comments)
+        if self.row_fit is not None:
+            drawer.set_row_fit(**self.row_fit)
+        drawer.set_governor(self.governor)
+        self.drawers.append(drawer)
+        return drawer
+    
+    def close(self):
+        """Close the workbook and write it into the sink
+        
+        Returns:
+            int: number of bytes written
+        """
+        if self.closed:
+            return self.sink.written
+        for drawer in self.drawers:
+            drawer.finalize()
+        self.wb.close()
+        if self.governor is not None:
+            self.governor.close()
+        self.sink.flush()
+        if self._file is not None:
+            self._file.close()
+        self.closed = True
+        return self.sink.written
+
+###############################################################################
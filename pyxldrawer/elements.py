@@ -2,9 +2,586 @@
 
 import xlsxwriter
 from xlsxwriter.utility import xl_rowcol_to_cell
-from pandas import isnull
-import sys, yaml, re
+import sys, re, math, copy
 from collections import OrderedDict
+from collections.abc import Mapping
+from weakref import WeakKeyDictionary
+from abc import ABCMeta, abstractmethod
+from bisect import bisect_right
+
+###############################################################################
+
+_formats = WeakKeyDictionary()
+# Maximum number of style dicts looked up by id
+_RECENT_FORMATS = 1024
+
+def register_format(wb, style):
+    """Get a shared format for a style dict
+    
+    Formats are registered once per workbook and reused for all equal style dicts,
+    so the number of formats depends on the number of distinct styles, not on the number of cells.
+    
+    Args:
+        wb (xlsxwriter.workbook.Workbook): workbook to register a format in
+        style (dict/xlsxwriter.format.Format): style dict; formats are returned untouched
+    
+    Returns:
+        xlsxwriter.format.Format: registered format
+    """
+    if not isinstance(style, dict):
+        return style
+    registry = _formats.get(wb)
+    if registry is None:
+        registry = _formats[wb] = ({}, {})
+    formats, recent = registry
+    # The same dict is usually shared by many cells, so it is looked up by id first;
+    # the cached copy detects dicts changed (or ids reused) since they were registered
+    hit = recent.get(id(style))
+    if hit is not None and hit[0] == style:
+        return hit[1]
+    key = tuple(sorted([ (k, repr(v)) for k, v in style.items() ]))
+    fmt = formats.get(key)
+    if fmt is None:
+        fmt = wb.add_format(style)
+        formats[key] = fmt
+    if len(recent) >= _RECENT_FORMATS:
+        recent.clear()
+    recent[id(style)] = (dict(style), fmt)
+    return fmt
+
+def isnull(value):
+    """Check whether a scalar value is missing (None, NaN or NaT)
+    
+    Pandas is used only if it is already imported, since values of pandas types
+    (NA, NaT) may come only from pandas objects.
+    
+    Args:
+        value (any): scalar value
+    
+    Returns:
+        bool: whether the value is missing
+    """
+    if value is None:
+        return True
+    elif isinstance(value, float):
+        return value != value
+    pd = sys.modules.get('pandas')
+    if pd is not None:
+        try:
+            return bool(pd.isnull(value))
+        except (TypeError, ValueError):
+            return False
+    np = sys.modules.get('numpy')
+    if np is not None and isinstance(value, np.generic):
+        return bool(value != value)
+    return False
+
+def _null_mask(values):
+    """Find missing values
+    
+    Args:
+        values (list): list of values
+    
+    Returns:
+        numpy.ndarray: boolean mask of None and NaN values
+    """
+    import numpy as np
+    arr = np.empty(len(values), dtype = object)
+    arr[:] = values
+    # NaN is the only value not equal to itself
+    return np.equal(arr, None) | np.not_equal(arr, arr)
+
+###############################################################################
+
+_comment_batches = WeakKeyDictionary()
+
+class CommentBatch(object):
+    """Per-sheet batch of comments
+    
+    Comments are collected at draw time and written when the batch is flushed
+    (see the Drawer.finalize method). Equal comment params dicts are deduplicated
+    into shared definitions, so many comments cost one params dict.
+    Large volumes of comments are handled by a policy:
+        all: write all comments
+        cap: write only the first max_count comments (in row-major order)
+        first: write only the first comment with a given text and params per drawn range
+            (e.g. one note per Matrix with a single comment for all cells)
+        sheet: write the first max_count comments and move the rest to a notes sheet
+            with links back to the commented cells
+    
+    Batches are created with the comment_batch function.
+    
+    Attributes:
+        ws (xlsxwriter.worksheet.Worksheet): worksheet of the batch
+        policy (str): policy for large volumes of comments
+        max_count (int): maximum number of comments written as notes; None means no limit
+        notes_name (str): name of the notes sheet; {name} is the name of the worksheet
+        comments (dict): collected comments ((row, col) => (text, params index, range))
+        params (list): shared comment params dicts
+        range (tuple): key of the currently drawn range; None means a range of a single cell
+    """
+    
+    POLICIES = ('all', 'cap', 'first', 'sheet')
+    
+    # -------------------------------------------------------------------------
+    
+    @property
+    def policy(self):
+        return self._policy
+    @policy.setter
+    def policy(self, value):
+        if value not in self.POLICIES:
+            raise ValueError('policy has to be one of: %s.' % ', '.join(self.POLICIES))
+        self._policy = value
+    
+    @property
+    def max_count(self):
+        return self._max_count
+    @max_count.setter
+    def max_count(self, value):
+        if value is not None and not isinstance(value, int):
+            raise TypeError('max_count has to be an int or None.')
+        elif value is not None and value < 0:
+            raise ValueError('max_count has to be non-negative.')
+        self._max_count = value
+    
+    # -------------------------------------------------------------------------
+    
+    def __init__(self, ws, policy = 'all', max_count = None, notes_name = '{name} notes'):
+        """Constructor method
+        """
+        self.ws = ws
+        self.policy = policy
+        self.max_count = max_count
+        self.notes_name = notes_name
+        self.comments = {}
+        self.params = []
+        self.range = None
+        self._params_index = {}
+    
+    def add(self, row, col, text, params = {}):
+        """Add a comment
+        
+        Args:
+            row (int): row of the commented cell
+            col (int): column of the commented cell
+            text (str): comment text
+            params (dict): comment params (see xlsxwriters docs)
+        """
+        # The same dict is usually shared by many cells, so it is looked up by id first
+        index = self._params_index.get(id(params))
+        if index is None or self.params[index] != params:
+            key = tuple(sorted([ (k, repr(v)) for k, v in params.items() ]))
+            index = self._params_index.get(key)
+            if index is None:
+                index = len(self.params)
+                self.params.append(dict(params))
+                self._params_index[key] = index
+            self._params_index[id(params)] = index
+        self.comments[(row, col)] = (text, index, self.range or (row, col))
+    
+    def select(self):
+        """Select comments written as notes and comments moved to the notes sheet
+        
+        Returns:
+            tuple: lists of (row, col, text, params index) tuples with notes and moved comments
+        """
+        notes = []
+        moved = []
+        seen = set()
+        for (row, col) in sorted(self.comments):
+            text, index, rng = self.comments[(row, col)]
+            item = (row, col, text, index)
+            if self.policy == 'first':
+                if (rng, text, index) in seen:
+                    continue
+                seen.add((rng, text, index))
+            if self.policy != 'all' and self.max_count is not None and len(notes) >= self.max_count:
+                if self.policy == 'sheet':
+                    moved.append(item)
+                continue
+            notes.append(item)
+        return notes, moved
+    
+    def flush(self, wb):
+        """Write collected comments
+        
+        Args:
+            wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
+        
+        Returns:
+            int: number of written comments (notes and rows of the notes sheet)
+        """
+        notes, moved = self.select()
+        for row, col, text, index in notes:
+            self.ws.write_comment(row, col, text, self.params[index])
+        if moved:
+            name = self.ws.get_name()
+            notes_ws = wb.add_worksheet(self.notes_name.format(name = name)[:31])
+            sheet = "'%s'!" % name.replace("'", "''")
+            notes_ws.write_row(0, 0, [ 'Cell', 'Note' ])
+            for i, (row, col, text, index) in enumerate(moved):
+                cell = xl_rowcol_to_cell(row, col)
+                notes_ws.write_url(i + 1, 0, 'internal:' + sheet + cell, string = cell)
+                notes_ws.write_string(i + 1, 1, text)
+        self.comments = {}
+        return len(notes) + len(moved)
+
+def comment_batch(ws, create = False, **kwargs):
+    """Get comment batch of a worksheet
+    
+    Args:
+        ws (xlsxwriter.worksheet.Worksheet): worksheet
+        create (bool): whether a batch should be created if the worksheet has none
+        **kwargs: keyword arguments passed to the CommentBatch constructor (new batches only)
+    
+    Returns:
+        CommentBatch: batch of the worksheet; None if comments of the worksheet are not batched
+    """
+    batch = _comment_batches.get(ws)
+    if batch is None and create:
+        batch = _comment_batches[ws] = CommentBatch(ws, **kwargs)
+    return batch
+
+def _set_comment_range(ws, key):
+    """Set key of the currently drawn range of a comment batch
+    """
+    batch = _comment_batches.get(ws)
+    if batch is not None:
+        batch.range = key
+
+###############################################################################
+
+_lookups = WeakKeyDictionary()
+
+def lookup_list(wb, values, sheet_name = 'Lookups'):
+    """Get a named range with a list of values on the shared lookup sheet
+    
+    Every distinct list is written once per workbook to a column of a hidden lookup sheet
+    and gets a defined name, so data validations of any size refer to it with a constant cost.
+    Options given as a dict (value => label) are listed by their labels (which are shown in dropdowns)
+    and their values are written to the next column named as the list with a '_values' suffix,
+    so chosen labels can be mapped back to values (e.g. with INDEX and MATCH).
+    
+    Args:
+        wb (xlsxwriter.workbook.Workbook): workbook
+        values (list/dict): list of allowed values or a dict of options (value => label)
+        sheet_name (str): name of the lookup sheet; a number is appended if a sheet of that name exists
+    
+    Returns:
+        str: defined name of the list
+    """
+    if not isinstance(values, (list, tuple, dict)) or len(values) < 1:
+        raise ValueError('values has to be a non-empty list or dict.')
+    registry = _lookups.get(wb)
+    if registry is None:
+        name, k = sheet_name, 1
+        while wb.get_worksheet_by_name(name) is not None:
+            name = '%s%d' % (sheet_name[:31 - len(str(k))], k)
+            k += 1
+        ws = wb.add_worksheet(name)
+        ws.hide()
+        registry = _lookups[wb] = [ws, {}, 0]
+    ws, lists, col = registry
+    if isinstance(values, dict):
+        key = ('dict',) + tuple([ (repr(k), repr(v)) for k, v in values.items() ])
+    else:
+        key = tuple([ repr(v) for v in values ])
+    name = lists.get(key)
+    if name is None:
+        name = '_lookup_%d' % (len(lists) + 1)
+        sheet = "'%s'!" % ws.get_name().replace("'", "''")
+        columns = [ (name, list(values.values()) if isinstance(values, dict) else list(values)) ]
+        if isinstance(values, dict):
+            columns.append((name + '_values', list(values.keys())))
+        for defined, column in columns:
+            ws.write_column(0, col, column)
+            first = xl_rowcol_to_cell(0, col, row_abs = True, col_abs = True)
+            last = xl_rowcol_to_cell(len(column) - 1, col, row_abs = True, col_abs = True)
+            wb.define_name(defined, '=' + sheet + first + ':' + last)
+            col += 1
+        registry[2] = col
+        lists[key] = name
+    return name
+
+def _validation_options(spec):
+    """Get data validation options of a list validation spec
+    
+    Args:
+        spec (list/dict): list of allowed values, a dict of options (value => label)
+            or a dict with a 'source' (list or dict of options) and other data validation options
+    
+    Returns:
+        tuple: allowed values (list or dict) and a dict of other options
+    """
+    if isinstance(spec, (list, tuple)):
+        return spec, {}
+    elif isinstance(spec, dict) and 'source' in spec:
+        options = dict(spec)
+        source = options.pop('source')
+        if not isinstance(source, (list, tuple, dict)):
+            raise TypeError('source has to be a list of values or a dict of options.')
+        return source, options
+    elif isinstance(spec, dict):
+        return spec, {}
+    raise TypeError('validation has to be a list of values, a dict of options or a dict with a source.')
+
+###############################################################################
+
+_row_fits = WeakKeyDictionary()
+
+class RowFit(object):
+    """Per-sheet accumulator of row heights
+    
+    Heights of rows with wrapped text are estimated from text length, column widths and font size.
+    Wrapped cells are collected at draw time and heights are computed when the accumulator
+    is flushed (see the Drawer.finalize method), so column widths set after drawing are taken into account,
+    results of all cells in a row are combined and every row gets a single set_row call.
+    Column widths set by elements are cached per sheet (see the set_column function).
+    
+    Accumulators are created with the row_fit function.
+    
+    Attributes:
+        ws (xlsxwriter.worksheet.Worksheet): worksheet of the accumulator
+        default_height (float): default row height in points
+        default_width (float): default column width in characters
+        line_spacing (float): line height as a multiple of the font size
+        widths (dict): cached column widths (column => width in characters)
+        cells (list): collected wrapped cells (row, column, height, width, line lengths, font size)
+    """
+    
+    def __init__(self, ws, default_height = 15.0, default_width = 8.43, line_spacing = 1.25):
+        """Constructor method
+        """
+        self.ws = ws
+        self.default_height = default_height
+        self.default_width = default_width
+        self.line_spacing = line_spacing
+        self.widths = {}
+        self.cells = []
+    
+    def add(self, row, col, text, font_size = 11, height = 1, width = 1):
+        """Add a wrapped cell
+        
+        Args:
+            row (int): first row of the cell
+            col (int): first column of the cell
+            text (str): cell text
+            font_size (float): font size in points
+            height (int): number of rows of the cell
+            width (int): number of columns of the cell
+        """
+        lines = tuple([ len(line) for line in text.split('\n') ])
+        self.cells.append((row, col, height, width, lines, font_size))
+    
+    def estimate(self, col, width, lines, font_size):
+        """Estimate height of a cell
+        
+        Args:
+            col (int): first column of the cell
+            width (int): number of columns of the cell
+            lines (tuple): lengths of text lines
+            font_size (float): font size in points
+        
+        Returns:
+            float: height in points
+        """
+        chars = sum([ self.widths.get(c, self.default_width) for c in range(col, col + width) ])
+        # Column widths are given in characters of the default 11 pt font
+        chars = max(chars * 11.0 / font_size, 1.0)
+        count = sum([ max(1, int(math.ceil(n / chars))) for n in lines ])
+        return count * font_size * self.line_spacing
+    
+    def flush(self):
+        """Set heights of rows with wrapped cells
+        
+        Returns:
+            dict: row heights set (row => height in points)
+        """
+        heights = {}
+        cache = {}
+        for row, col, height, width, lines, font_size in self.cells:
+            key = (col, width, lines, font_size)
+            h = cache.get(key)
+            if h is None:
+                h = cache[key] = self.estimate(col, width, lines, font_size)
+            h = h / height
+            for r in range(row, row + height):
+                if h > heights.get(r, self.default_height):
+                    heights[r] = h
+        for r in sorted(heights):
+            self.ws.set_row(r, round(heights[r], 2))
+        self.cells = []
+        return heights
+
+def row_fit(ws, create = False, **kwargs):
+    """Get row height accumulator of a worksheet
+    
+    Args:
+        ws (xlsxwriter.worksheet.Worksheet): worksheet
+        create (bool): whether an accumulator should be created if the worksheet has none
+        **kwargs: keyword arguments passed to the RowFit constructor (new accumulators only)
+    
+    Returns:
+        RowFit: accumulator of the worksheet; None if row heights of the worksheet are not fitted
+    """
+    fit = _row_fits.get(ws)
+    if fit is None and create:
+        fit = _row_fits[ws] = RowFit(ws, **kwargs)
+    return fit
+
+def set_column(ws, first, last, width):
+    """Set width of columns and cache it for row height estimation
+    
+    Args:
+        ws (xlsxwriter.worksheet.Worksheet): worksheet
+        first (int): first column
+        last (int): last column
+        width (float): width in characters
+    """
+    ws.set_column(first, last, width)
+    fit = _row_fits.get(ws)
+    if fit is not None:
+        for col in range(first, last + 1):
+            fit.widths[col] = width
+
+###############################################################################
+
+class RichText(object):
+    """Rich text value written with a markup
+    
+    Markup consists of text with (possibly nested) tags: <b>, <i>, <u> and <color=...>
+    (a color name or #RRGGBB) and of {field} placeholders filled with field values,
+    e.g. '<b>Total:</b> <color=#FF0000>{value}</color>'.
+    Markups are compiled once into run templates shared by all values with the same markup,
+    so a column of rich cells parses its markup once and only substitutes fields while drawing.
+    Run formats are registered in a shared per-workbook registry (see the register_format function).
+    
+    Attributes:
+        markup (str): markup text
+        fields (dict): field values
+        runs (tuple): compiled template; tuple of (style dict or None, text, whether text has fields) tuples
+    """
+    
+    TAGS = {
+        'b': ('bold', True),
+        'i': ('italic', True),
+        'u': ('underline', 1),
+        'color': ('font_color', None)
+    }
+    _pattern = re.compile(r'<(/?)(b|i|u|color)(?:=([^>]+))?>')
+    _templates = {}
+    
+    def __init__(self, markup, **fields):
+        """Constructor method
+        
+        Args:
+            markup (str): markup text
+            **fields: field values
+        """
+        if not isinstance(markup, str):
+            raise TypeError('markup has to be a str.')
+        self.markup = markup
+        self.fields = fields
+        self.runs = self.compile(markup)
+    
+    def __str__(self):
+        return ''.join([ text for _, text in self.fragments() ])
+    
+    def __repr__(self):
+        return 'RichText(%r)' % self.markup
+    
+    @classmethod
+    def compile(cls, markup):
+        """Compile markup into a run template
+        
+        Args:
+            markup (str): markup text
+        
+        Returns:
+            tuple: tuple of (style dict or None, text, whether text has fields) tuples
+        """
+        runs = cls._templates.get(markup)
+        if runs is not None:
+            return runs
+        runs = []
+        stack = []
+        pos = 0
+        matches = list(cls._pattern.finditer(markup)) + [ None ]
+        for match in matches:
+            text = markup[pos:match.start() if match else len(markup)]
+            if text:
+                style = {}
+                for tag, value in stack:
+                    key, default = cls.TAGS[tag]
+                    style[key] = default if default is not None else value
+                runs.append((style or None, text, '{' in text or '}' in text))
+            if match is None:
+                break
+            pos = match.end()
+            closing, tag, value = match.groups()
+            if closing:
+                for k in range(len(stack) - 1, -1, -1):
+                    if stack[k][0] == tag:
+                        del stack[k]
+                        break
+                else:
+                    raise ValueError('unmatched closing tag </%s> in rich text markup.' % tag)
+            elif tag == 'color' and not value:
+                raise ValueError('color tag requires a color (e.g. <color=#FF0000>).')
+            else:
+                stack.append((tag, value))
+        runs = tuple(runs)
+        cls._templates[markup] = runs
+        return runs
+    
+    def fragments(self):
+        """Get text fragments with fields substituted
+        
+        Returns:
+            list: list of (style dict or None, text) tuples; empty fragments are dropped
+        """
+        fragments = []
+        for style, text, fields in self.runs:
+            if fields:
+                text = text.format(**self.fields)
+            if text:
+                fragments.append((style, text))
+        return fragments
+    
+    def draw(self, x, y, ws, wb, cell_format = None, cell_style = None):
+        """Write rich text in a cell
+        
+        Text without styled runs is written as a plain string,
+        so it costs no more than a string value.
+        
+        Args:
+            x (int): row
+            y (int): column
+            ws (xlsxwriter.worksheet.Worksheet): worksheet to write in
+            wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
+            cell_format (xlsxwriter.format.Format): format of the cell
+            cell_style (dict): style dict of the cell (if known); used for single character runs
+        """
+        fragments = self.fragments()
+        if not fragments:
+            return ws.write_blank(x, y, None, cell_format)
+        if len(fragments) == 1 and fragments[0][0] is None:
+            return ws.write_string(x, y, fragments[0][1], cell_format)
+        args = []
+        for style, text in fragments:
+            if style is not None:
+                args.append(register_format(wb, style))
+            args.append(text)
+        if cell_format is not None:
+            args.append(cell_format)
+        if len(fragments) == 1:
+            style, text = fragments[0]
+            if len(text) == 1:
+                return ws.write_string(x, y, text, register_format(wb, dict(cell_style or {}, **style)))
+            # xlsxwriter requires at least two fragments, so a single run is split in two
+            args[1:2] = [ text[0], args[0], text[1:] ]
+        return ws.write_rich_string(x, y, *args)
 
 ###############################################################################
 
@@ -12,7 +589,7 @@ class Element(object):
     """Implementation of an atomic report element
     
     Attributes:
-        value (any): cell value; may be of any atomic type
+        value (any): cell value; may be of any atomic type or a RichText
         height (int): height as a number of cells (rows); non-negative
         width (int): width as a number of cells (columns); non-negative
         style (xlsxwriter.format.Format): Element's style
@@ -101,14 +678,38 @@ class Element(object):
         self.comment = comment
         self.comment_params = comment_params
     
+    @classmethod
+    def trusted(cls, value, height = 1, width = 1, style = {}, comment = None, comment_params = {}):
+        """Create Element without going through the property setters
+        
+        Arguments have to be validated beforehand (see the Matrix.validate_cells method)
+        and missing values have to be already replaced with ''.
+        
+        Returns:
+            Element: new element
+        """
+        elem = cls.__new__(cls)
+        elem._value = value
+        elem._height = height
+        elem._width = width
+        elem._style = style
+        elem._comment = comment
+        elem._comment_params = comment_params
+        return elem
+    
     def make_style(self, wb):
         """Prepare Element's style for drawing
         
+        Style dicts are kept untouched (formats are looked up in the registry of the workbook),
+        so the Element may be drawn many times and in other workbooks.
+        
         Args:
             wb (xlsxwriter.workbook.Workbook): workbook to register a style in
+        
+        Returns:
+            xlsxwriter.format.Format: format of the Element
         """
-        if isinstance(self.style, dict):
-            self.style = wb.add_format(self.style)
+        return register_format(wb, self.style)
     
     def xl_upleft(self, x, y):
         """Get upper-left corner coordinates of the Element in the standard excel notation
@@ -146,20 +747,33 @@ class Element(object):
             ws (xlsxwriter.worksheet.Worksheet): worksheet to write the Element in
             wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
         """
-        self.make_style(wb)
-        if isinstance(self.value, (list, tuple)):
+        style = self.style if isinstance(self.style, dict) else None
+        fmt = self.make_style(wb)
+        fit = _row_fits.get(ws)
+        if fit is not None and getattr(fmt, 'text_wrap', 0) and \
+            isinstance(self.value, (str, RichText)):
+            fit.add(x, y, str(self.value), fmt.font_size, self.height, self.width)
+        if isinstance(self.value, RichText):
+            if self.height > 1 or self.width > 1:
+                ws.merge_range(self.xl_range(x, y), '', fmt)
+            self.value.draw(x, y, ws, wb, fmt, style)
+        elif isinstance(self.value, (list, tuple)):
             if self.height > 1 or self.width > 1:
-                ws.merge_range(self.xl_range(x, y), '', self.style)
-            ws.write_rich_string(self.xl_upleft(x, y), *self.value, self.style)
+                ws.merge_range(self.xl_range(x, y), '', fmt)
+            ws.write_rich_string(self.xl_upleft(x, y), *self.value, fmt)
         else:
             if self.width == 1 and self.height == 1:
-                ws.write(x, y, self.value, self.style)
+                ws.write(x, y, self.value, fmt)
             else:
                 rng = self.xl_range(x, y)
-                ws.merge_range(rng, self.value, self.style)
+                ws.merge_range(rng, self.value, fmt)
             if self.comment is not None:
-                addr = self.xl_upleft(x, y)
-                ws.write_comment(addr, self.comment, self.comment_params)
+                batch = _comment_batches.get(ws)
+                if batch is not None:
+                    batch.add(x, y, self.comment, self.comment_params)
+                else:
+                    addr = self.xl_upleft(x, y)
+                    ws.write_comment(addr, self.comment, self.comment_params)
 
 ###############################################################################
 
@@ -217,6 +831,21 @@ class HeaderElement(Element):
         self.col_width = col_width
         self.padding = padding
     
+    @classmethod
+    def trusted(cls, value, height = 1, width = 1, style = {}, comment = None, comment_params = {},
+                col_width = 'auto', padding = 1.0):
+        """Create HeaderElement without going through the property setters
+        
+        Arguments have to be validated beforehand (see the Matrix.validate_cells method).
+        
+        Returns:
+            HeaderElement: new element
+        """
+        elem = Element.trusted.__func__(cls, value, height, width, style, comment, comment_params)
+        elem._col_width = col_width
+        elem._padding = padding
+        return elem
+    
     def _value_len(self):
         """Computes length of the element's value
         """
@@ -240,7 +869,7 @@ class HeaderElement(Element):
             return
         else:
             raise ValueError('incorrect value of col_width.')
-        ws.set_column(y, y + self.width - 1, col_width)
+        set_column(ws, y, y + self.width - 1, col_width)
 
 ###############################################################################
 
@@ -256,8 +885,21 @@ class Matrix(object):
         ncol (int): number of columns
         height (int): height
         width (int): width
+        rules (list): conditional formatting rules (see worksheet.conditional_format in xlsxwriter docs)
+        static_rules (bool): whether rules should be evaluated while drawing and turned into static cell formats
+        origin (tuple): worksheet name and coordinates of the upper-left corner of the last drawing; None if not drawn or paged
+        paged (bool): whether the last drawing was split between worksheets (see the Drawer.draw method)
+        released (bool): whether elements were dropped (see the release method)
+        validation (dict): dropdown lists of columns (column index => list of values or dict; see the draw_validation method)
+        static_styles (dict): static styles of cells evaluated in advance (e.g. for parts of a paged Matrix); None if rules are applied while drawing
     """
     
+    origin = None
+    paged = False
+    released = False
+    validation = None
+    static_styles = None
+    
     # -------------------------------------------------------------------------
     
     @property
@@ -314,12 +956,40 @@ class Matrix(object):
             raise ValueError('width has to be positive.')
         self._width = value
     
+    @property
+    def rules(self):
+        return self._rules
+    @rules.setter
+    def rules(self, value):
+        if value is None:
+            value = []
+        if not isinstance(value, list) or not all([ isinstance(x, dict) for x in value ]):
+            raise TypeError('rules has to be a list of dicts.')
+        self._rules = value
+    
+    @property
+    def static_rules(self):
+        return self._static_rules
+    @static_rules.setter
+    def static_rules(self, value):
+        if not isinstance(value, bool):
+            raise TypeError('static_rules has to be a bool.')
+        self._static_rules = value
+    
     # -------------------------------------------------------------------------
+    
+    CRITERIA = {
+        '>': 'greater than', '<': 'less than', '>=': 'greater than or equal to',
+        '<=': 'less than or equal to', '==': 'equal to', '!=': 'not equal to'
+    }
+    COLOR_STEPS = 10
         
     def __init__(self, values, height = 1, width = 1, style = {}, 
                             comment = None, comment_params = {},
                             col_width = None, padding = 1.0,
-                            top = {}, right ={}, bottom = {}, left = {}):
+                            top = {}, right ={}, bottom = {}, left = {},
+                            rules = None, static_rules = False, trusted = False,
+                            validation = None):
         """Constructor method
         
         Args:
@@ -335,7 +1005,14 @@ class Matrix(object):
             right (dict): additional styling for right border
             bottom (dict): additional styling for bottom border
             left (dict): additional styling for right border
+            rules (list): conditional formatting rules (see worksheet.conditional_format in xlsxwriter docs)
+            static_rules (bool): whether rules should be turned into static cell formats while drawing
+            trusted (bool): whether cells should be validated in bulk and elements created without property setters
+            validation (dict): dropdown lists of columns (column index => list of values or dict of options)
         """
+        self.rules = rules
+        self.static_rules = static_rules
+        self.validation = validation
         if isinstance(values, list):
             values = self.lists_to_matrix(values)
         if isinstance(height, list):
@@ -348,7 +1025,7 @@ class Matrix(object):
             comment = self.lists_to_matrix(comment)
         if isinstance(comment_params, list):
             comment_params = self.lists_to_matrix(comment_params)
-        self.make_element_matrix(values, height, width, style, comment, comment_params, col_width, padding)
+        self.make_element_matrix(values, height, width, style, comment, comment_params, col_width, padding, trusted)
         self._nrow = self._count_rows()
         self._ncol = self._count_cols()
         self.height = self.nrow * height
@@ -413,7 +1090,7 @@ class Matrix(object):
         Args:
             value (Element): object inheriting from the Element class
         """
-        if not issubclass(value, Element):
+        if not isinstance(value, Element):
             raise TypeError('value has to inherit from the Element class.')
         if not isinstance(x, int) or not isinstance(y, int):
             raise TypeError('indices must be integers.')
@@ -475,6 +1152,104 @@ class Matrix(object):
         else:
             raise ValueError("which has to be either 1/'topright', 2/'bottomright', 3/'bottomleft' or 4/'topleft'")
         
+    def __getitem__(self, key):
+        """Get element or a view of the Matrix
+        
+        Indexing follows NumPy conventions, but a view is always two-dimensional,
+        so m[0] is a one-row view and m[:, 0] is a one-column view.
+        Two integer indices return an element.
+        
+        Args:
+            key (int/slice/tuple): row index or a pair of row and column indices
+        
+        Returns:
+            Element/SliceView: element or a view over the Matrix storage
+        """
+        self.check_released()
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        if len(key) != 2:
+            raise IndexError('Matrix has only two dimensions.')
+        r, c = key
+        rows = range(self.nrow)
+        cols = range(self.ncol)
+        if isinstance(r, int) and isinstance(c, int):
+            return self.get(rows[r], cols[c])
+        rows = rows[r] if isinstance(r, slice) else range(rows[r], rows[r] + 1)
+        cols = cols[c] if isinstance(c, slice) else range(cols[c], cols[c] + 1)
+        if len(rows) == 0 or len(cols) == 0:
+            raise IndexError('view has to have at least one row and one column.')
+        return SliceView(self, rows, cols)
+    
+    def page_part(self, start, stop, static = None):
+        """Get a view of rows drawn on one page with all draw-time attributes of the Matrix
+        
+        Rules, static rules and validations are carried over (leading rows of validations skipped
+        on the part are adjusted), so parts are drawn the same way the whole Matrix would be.
+        
+        Args:
+            start (int): first row
+            stop (int): row after the last one
+            static (dict): static styles of the whole Matrix (see the apply_rules method)
+        
+        Returns:
+            SliceView: view of the rows
+        """
+        part = self[start:stop]
+        part.rules = self.rules
+        part.static_rules = self.static_rules
+        if static is not None:
+            part.static_styles = dict([ ((i - start, j), style) for (i, j), style in static.items()
+                                        if start <= i < stop ])
+        if self.validation:
+            validation = {}
+            for j, spec in self.validation.items():
+                if isinstance(spec, dict) and 'source' in spec and spec.get('skip', 0):
+                    spec = dict(spec)
+                    spec['skip'] = max(0, spec['skip'] - start)
+                validation[j] = spec
+            part.validation = validation
+        return part
+    
+    @property
+    def T(self):
+        """Transposed view of the Matrix
+        """
+        return SliceView(self, range(self.nrow), range(self.ncol), transposed = True)
+    
+    def row_heights(self):
+        """Get heights of rows
+        
+        Returns:
+            list: heights of the highest elements in rows
+        """
+        return [ max([ self.get(i, j).height for j in range(self.ncol) ]) for i in range(self.nrow) ]
+    
+    def col_widths(self):
+        """Get widths of columns
+        
+        Returns:
+            list: widths of elements in the first row
+        """
+        return [ self.get(0, j).width for j in range(self.ncol) ]
+    
+    def release(self):
+        """Drop elements of a drawn Matrix to free memory
+        
+        Height and width are kept, so a Drawer may still move by them,
+        but the Matrix can not be drawn again, summarized nor viewed (see the governor module).
+        """
+        self._matrix = {}
+        self._nrow = 0
+        self._ncol = 0
+        self.released = True
+    
+    def check_released(self):
+        """Raise ValueError if elements of the Matrix were released
+        """
+        if self.released:
+            raise ValueError('matrix was released (see the release method) and can not be used anymore.')
+    
     def lists_to_matrix(self, L):
         """Converts a list of lists to a matrix
         
@@ -498,9 +1273,64 @@ class Matrix(object):
                 matrix[(i, j)] = L[i][j]
         return matrix
     
+    def _per_cell(self, value):
+        """Check whether a parameter is given as a dict of keys
+        """
+        return isinstance(value, dict) and len(value) > 0 and \
+            all([ isinstance(k, tuple) for k in value.keys() ])
+    
+    def validate_cells(self, keys, height, width, style, comment_params):
+        """Validate cell parameters in bulk
+        
+        Heights and widths are checked with vectorized operations
+        and errors point to the offending cell.
+        
+        Args:
+            keys (list): list of cell indices
+            height (int/dict): height of cells or height matrix
+            width (int/dict): width of cells or width matrix
+            style (dict): style dict or style matrix
+            comment_params (dict): comment params dict or matrix of comment params
+        """
+        import numpy as np
+        def where(k):
+            return ' (row %d, column %d)' % keys[k] if len(keys) > k else ''
+        for name, param in (('height', height), ('width', width)):
+            if isinstance(param, dict):
+                missing = [ k for k in keys if k not in param ]
+                if missing:
+                    raise ValueError('%s matrix is missing cell (%d, %d).' % ((name,) + missing[0]))
+                cells = [ param[k] for k in keys ]
+            else:
+                cells = [ param ]
+            try:
+                arr = np.array(cells)
+            except (ValueError, OverflowError):
+                arr = None
+            # Bools are ints to numpy, and ints too big for int64 give object arrays, so such cells are scanned one by one
+            if arr is None or arr.dtype.kind not in 'iu' or bool in set(map(type, cells)):
+                for k, v in enumerate(cells):
+                    if not isinstance(v, int) or isinstance(v, bool):
+                        raise TypeError('%s has to be a positive int%s.' % (name, where(k) if len(cells) > 1 else ''))
+                    if v < 1:
+                        raise ValueError('%s has to be > 0%s.' % (name, where(k) if len(cells) > 1 else ''))
+                continue
+            bad = np.flatnonzero(arr < 1)
+            if len(bad) > 0:
+                raise ValueError('%s has to be > 0%s.' % (name, where(bad[0]) if len(cells) > 1 else ''))
+        for name, param, types in (('style', style, (dict, xlsxwriter.format.Format)),
+                                   ('comment_params', comment_params, dict)):
+            if not self._per_cell(param):
+                if not isinstance(param, types):
+                    raise TypeError('%s has the wrong type.' % name)
+                continue
+            for k, key in enumerate(keys):
+                if not isinstance(param.get(key), types):
+                    raise TypeError('%s has the wrong type%s.' % (name, where(k)))
+    
     def make_element_matrix(self, values, height = 1, width = 1, style = {}, 
                             comment = None, comment_params = {},
-                            col_width = None, padding = 3.0):
+                            col_width = None, padding = 3.0, trusted = False):
         """Make element matrix from matrices of values, height etc.
         
         Args:
@@ -512,85 +1342,1433 @@ class Matrix(object):
             comment_params (dict): comment params dict or matrix of comment params (dict of dicts)
             col_width (float): col_width to set; defaults to None which makes no adjustment
             padding (float): padding to ad if col_width = 'auto'
+            trusted (bool): whether cells should be validated in bulk and elements created without property setters
         """
         matrix = {}
         n = self._count_rows(values)
         m = self._count_cols(values)
+        # Per-cell params are told apart the same way as by the validate_cells method
+        styles = self._per_cell(style)
+        comments = comment is not None and len(comment) > 0 and isinstance(comment, dict)
+        params = self._per_cell(comment_params)
+        if trusted:
+            keys = [ (i, j) for i in range(n) for j in range(m) ]
+            self.validate_cells(keys, height, width, style, comment_params)
+            proto = HeaderElement('', col_width = col_width, padding = padding)
+            cells = [ values[k] for k in keys ]
+            for k in _null_mask(cells).nonzero()[0]:
+                cells[k] = ''
+            heights = isinstance(height, dict)
+            widths = isinstance(width, dict)
+            new = HeaderElement.__new__
+            for k, key in enumerate(keys):
+                elem = new(HeaderElement)
+                elem._value = cells[k]
+                elem._height = height[key] if heights else height
+                elem._width = width[key] if widths else width
+                elem._style = style[key] if styles else style
+                elem._comment = comment[key] if comments else comment
+                elem._comment_params = comment_params[key] if params else comment_params
+                elem._col_width = proto.col_width
+                elem._padding = proto.padding
+                matrix[key] = elem
+            self.matrix = matrix
+            return
         for i in range(n):
             for j in range(m):
                 elem = HeaderElement(
                     value = values[(i, j)],
                     height = height[(i, j)] if isinstance(height, dict) else height,
                     width = width[(i, j)] if isinstance(width, dict) else width,
-                    style = style[(i, j)] if len(style) > 0 and all([ isinstance(x, dict) for x in style.values() ]) else style,
-                    comment = comment[(i, j)] if comment is not None and len(comment) > 0 and isinstance(comment, dict) else comment,
-                    comment_params = comment_params[(i, j)] if len(comment_params) > 0 and all([ isinstance(x, dict) for x in comment_params.values() ]) else comment_params,
+                    style = style[(i, j)] if styles else style,
+                    comment = comment[(i, j)] if comments else comment,
+                    comment_params = comment_params[(i, j)] if params else comment_params,
                     col_width = col_width,
                     padding = padding
                 )
                 matrix[(i, j)] = elem
         self.matrix = matrix
         
-    def draw(self, x, y, ws, wb):
-        """Draw Matrix object in a worksheet
+    def add_rule(self, rule):
+        """Add conditional formatting rule
+        
+        Rules are drawn as a single conditional format spanning the whole Matrix,
+        so styling cost depends on the number of rules, not on the number of cells.
         
         Args:
-            x (int): x-coordinate (rows)
-            y (int): y-coordinate (columns)
-            ws (xlsxwriter.worksheet.Worksheet): worksheet to draw in
-            wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
+            rule (dict): options dict (see worksheet.conditional_format in xlsxwriter docs);
+                'format' may be given as a style dict
         """
-        y0 = y
-        for i in range(self.nrow):
-            height = 1
-            for j in range(self.ncol):
-                elem = self.get(i, j)
-                elem.draw(x, y, ws, wb)
-                y += elem.width
-                if elem.height > height:
-                    height = elem.height
-            y = y0
-            x += height
-            
-###############################################################################
-
-class TreeElement(object):
-    """Element with a row of sub elements
+        if not isinstance(rule, dict):
+            raise TypeError('rule has to be a dict.')
+        self.rules.append(rule)
     
-    Attributes:
-        height (int): total height of the element
-        width (int): total width of the element
-        parent (Element): object inheriting from the Element class
-        children (LineElement): object inheriting from the LineElement class
-    """
+    def add_threshold(self, criteria, value, style, maximum = None):
+        """Add threshold rule
+        
+        Args:
+            criteria (str): one of >, <, >=, <=, ==, != (or xlsxwriter criteria names), 'between' or 'not between'
+            value (float): threshold value; minimum for 'between' and 'not between'
+            style (dict): style dict of matching cells
+            maximum (float): maximum for 'between' and 'not between'
+        """
+        criteria = self.CRITERIA.get(criteria, criteria)
+        rule = { 'type': 'cell', 'criteria': criteria, 'format': style }
+        if criteria in ('between', 'not between'):
+            if maximum is None:
+                raise ValueError("maximum has to be given for 'between' and 'not between' criteria.")
+            rule['minimum'] = value
+            rule['maximum'] = maximum
+        else:
+            rule['value'] = value
+        self.add_rule(rule)
     
-    # -------------------------------------------------------------------------
+    def add_color_scale(self, min_color = '#F8696B', max_color = '#63BE7B', mid_color = None):
+        """Add color scale rule
+        
+        Args:
+            min_color (str): color of the minimum value
+            max_color (str): color of the maximum value
+            mid_color (str): color of the midpoint; 3-color scale is used if it is given
+        """
+        if mid_color is None:
+            rule = { 'type': '2_color_scale', 'min_color': min_color, 'max_color': max_color }
+        else:
+            rule = { 'type': '3_color_scale', 'min_color': min_color,
+                     'mid_color': mid_color, 'max_color': max_color }
+        self.add_rule(rule)
     
-    @property
-    def width(self):
-        return self._width
-    @width.setter
-    def width(self, value):
-        if not isinstance(value, int):
-            raise TypeError('width has to be an int.')
-        elif value < 1:
-            raise ValueError('width has to be positive.')
-        self._width = value
+    def add_data_bar(self, color = '#638EC6'):
+        """Add data bar rule
+        
+        Data bars can not be turned into static formats.
+        
+        Args:
+            color (str): color of the bars
+        """
+        self.add_rule({ 'type': 'data_bar', 'bar_color': color })
     
-    @property
-    def height(self):
-        return self._height
-    @height.setter
-    def height(self, value):
-        if not isinstance(value, int):
-            raise TypeError('height has to be an int.')
-        elif value < 1:
-            raise ValueError('height has to be positive.')
-        self._height = value
+    def add_formula_rule(self, formula, style):
+        """Add formula rule
+        
+        Formula rules can not be turned into static formats.
+        
+        Args:
+            formula (str): Excel formula relative to the upper-left cell of the Matrix;
+                '{cell}' is replaced with the address of the upper-left cell
+            style (dict): style dict of matching cells
+        """
+        self.add_rule({ 'type': 'formula', 'criteria': formula, 'format': style })
     
-    @property
-    def parent(self):
-        return self._parent
+    def _numeric_values(self, keys):
+        """Get numeric values of elements
+        
+        Args:
+            keys (list): list of element indices
+        
+        Returns:
+            numpy.ndarray: array of floats; non-numeric values are NaN
+        """
+        import numpy as np
+        values = [ self.matrix[k].value for k in keys ]
+        return np.array([ v if isinstance(v, (int, float)) and not isinstance(v, bool) else np.nan
+                          for v in values ], dtype = float)
+    
+    def _rule_codes(self, rule, values):
+        """Evaluate a rule against an array of values
+        
+        Args:
+            rule (dict): rule options
+            values (numpy.ndarray): numeric values
+        
+        Returns:
+            numpy.ndarray: array of ints; 0 where the rule does not apply,
+                otherwise a code of the style to use (bucket number + 1 for color scales)
+        """
+        import numpy as np
+        kind = rule.get('type')
+        if kind == 'cell':
+            criteria = self.CRITERIA.get(rule['criteria'], rule['criteria'])
+            with np.errstate(invalid = 'ignore'):
+                if criteria in ('between', 'not between'):
+                    mask = (values >= rule['minimum']) & (values <= rule['maximum'])
+                    if criteria == 'not between':
+                        mask = ~mask & ~np.isnan(values)
+                else:
+                    ops = {
+                        'greater than': np.greater, 'less than': np.less,
+                        'greater than or equal to': np.greater_equal,
+                        'less than or equal to': np.less_equal,
+                        'equal to': np.equal, 'not equal to': np.not_equal
+                    }
+                    if criteria not in ops:
+                        raise ValueError("unknown criteria '%s'." % criteria)
+                    mask = ops[criteria](values, rule['value']) & ~np.isnan(values)
+            return mask.astype(int)
+        elif kind in ('2_color_scale', '3_color_scale'):
+            codes = np.zeros(len(values), dtype = int)
+            ok = ~np.isnan(values)
+            if not ok.any():
+                return codes
+            vmin = values[ok].min()
+            vmax = values[ok].max()
+            scale = (values[ok] - vmin) / (vmax - vmin) if vmax > vmin else np.zeros(ok.sum())
+            codes[ok] = np.minimum((scale * self.COLOR_STEPS).astype(int), self.COLOR_STEPS - 1) + 1
+            return codes
+        raise ValueError("rules of type '%s' can not be turned into static formats." % kind)
+    
+    def _rule_style(self, rule, code):
+        """Get style dict of an evaluated rule
+        
+        Args:
+            rule (dict): rule options
+            code (int): code returned by the _rule_codes method
+        
+        Returns:
+            dict: style dict
+        """
+        if rule['type'] == 'cell':
+            return rule['format']
+        def rgb(color):
+            color = color.lstrip('#')
+            return [ int(color[i:i+2], 16) for i in (0, 2, 4) ]
+        t = (code - .5) / self.COLOR_STEPS
+        if rule['type'] == '2_color_scale':
+            c0, c1 = rgb(rule['min_color']), rgb(rule['max_color'])
+        elif t < .5:
+            c0, c1, t = rgb(rule['min_color']), rgb(rule['mid_color']), t * 2
+        else:
+            c0, c1, t = rgb(rule['mid_color']), rgb(rule['max_color']), t * 2 - 1
+        color = [ int(round(a + (b - a) * t)) for a, b in zip(c0, c1) ]
+        return { 'bg_color': '#%02X%02X%02X' % tuple(color) }
+    
+    def apply_rules(self):
+        """Turn rules into static cell styles
+        
+        Rules are evaluated in vectorized form and cells are grouped by the combination
+        of rules they match, so every combination is resolved to one style only once.
+        The first rule takes precedence when several rules set the same style property.
+        Only threshold and color scale rules can be evaluated statically.
+        Cell styles are left untouched, so the Matrix may be drawn again.
+        
+        Returns:
+            dict: static styles of cells (cell indices => style dict merged into the cell style)
+        """
+        if not self.rules:
+            return {}
+        import numpy as np
+        keys = list(self.matrix.keys())
+        values = self._numeric_values(keys)
+        codes = np.column_stack([ self._rule_codes(rule, values) for rule in self.rules ])
+        combos, inverse = np.unique(codes, axis = 0, return_inverse = True)
+        inverse = inverse.reshape(-1)
+        styles = []
+        for combo in combos:
+            style = {}
+            for rule, code in reversed(list(zip(self.rules, combo))):
+                if code > 0:
+                    style = self._merge_styles(style, self._rule_style(rule, code))
+            styles.append(style)
+        static = {}
+        for k, i in zip(keys, inverse):
+            if not styles[i]:
+                continue
+            elem = self.matrix[k]
+            if not isinstance(elem.style, dict):
+                raise TypeError('static rules require cell styles to be given as dicts.')
+            static[k] = self._merge_styles(elem.style, styles[i])
+        return static
+    
+    def prepare_rules(self, x, y, ws, wb):
+        """Apply rules before drawing
+        
+        Static styles given by a Drawer (see the static_styles attribute) take precedence.
+        Otherwise rules are evaluated (static rules) or drawn as conditional formats.
+        
+        Returns:
+            dict: static styles of cells (cell indices => style dict); empty if there are none
+        """
+        if self.static_styles is not None:
+            return self.static_styles
+        if self.static_rules:
+            return self.apply_rules()
+        self.draw_rules(x, y, ws, wb)
+        return {}
+    
+    def _styled(self, elem, key, static):
+        """Get element with its static style (a shallow copy, so the element itself is not changed)
+        """
+        style = static.get(key) if static else None
+        if style is None or elem is None:
+            return elem
+        elem = copy.copy(elem)
+        elem._style = style
+        return elem
+    
+    def draw_rules(self, x, y, ws, wb):
+        """Draw rules as conditional formats spanning the whole Matrix
+        
+        Args:
+            x (int): x-coordinate (rows)
+            y (int): y-coordinate (columns)
+            ws (xlsxwriter.worksheet.Worksheet): worksheet to draw in
+            wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
+        """
+        for rule in self.rules:
+            options = rule.copy()
+            if 'format' in options:
+                options['format'] = register_format(wb, options['format'])
+            if options.get('type') == 'formula':
+                options['criteria'] = options['criteria'].replace('{cell}', xl_rowcol_to_cell(x, y))
+            ws.conditional_format(x, y, x + self.height - 1, y + self.width - 1, options)
+    
+    def draw_validation(self, x, y, ws, wb):
+        """Apply dropdown lists to columns
+        
+        Every list is written once to the shared lookup sheet (see the lookup_list function)
+        and every column gets a single data validation spanning all its rows.
+        Validations are given as a dict (column index => spec), where spec is a list of allowed values,
+        a dict of options (value => label; labels are listed, see the lookup_list function)
+        or a dict with a 'source' (list or dict of options), an optional 'skip' (number of leading rows left out,
+        e.g. headers) and other data validation options (see worksheet.data_validation in xlsxwriter docs).
+        
+        Args:
+            x (int): x-coordinate (rows)
+            y (int): y-coordinate (columns)
+            ws (xlsxwriter.worksheet.Worksheet): worksheet to draw in
+            wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
+        """
+        if not self.validation:
+            return
+        heights = self.row_heights()
+        widths = self.col_widths()
+        for j, spec in self.validation.items():
+            source, options = _validation_options(spec)
+            skip = options.pop('skip', 0)
+            if j < 0 or j >= self.ncol:
+                raise IndexError('validation column index out of range.')
+            first = x + sum(heights[:skip])
+            last = x + sum(heights) - 1
+            if last < first:
+                continue
+            col = y + sum(widths[:j])
+            options['validate'] = 'list'
+            options['source'] = '=' + lookup_list(wb, source)
+            ws.data_validation(first, col, last, col + widths[j] - 1, options)
+    
+    def is_plain(self):
+        """Check whether the Matrix is a plain grid of cells
+        
+        Plain grids consist of single cells without comments, rich values and column width adjustments,
+        so they may be written in bulk (see the fastsheet module).
+        
+        Returns:
+            bool: whether the Matrix is plain
+        """
+        for elem in self.matrix.values():
+            if elem.height != 1 or elem.width != 1 or elem.comment is not None or \
+                isinstance(elem.value, (list, tuple, RichText)) or getattr(elem, 'col_width', None) is not None:
+                return False
+        return True
+    
+    def draw_grid(self, x, y, ws, wb, static = None):
+        """Draw plain Matrix in bulk with the write_grid method of a worksheet
+        
+        Args:
+            x (int): x-coordinate (rows)
+            y (int): y-coordinate (columns)
+            ws (pyxldrawer.fastsheet.FastWorksheet): worksheet to draw in
+            wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
+            static (dict): static styles of cells (see the apply_rules method)
+        """
+        cells = self.matrix if isinstance(self.matrix, dict) else None
+        fit = _row_fits.get(ws)
+        values = []
+        formats = []
+        for i in range(self.nrow):
+            row_values = []
+            row_formats = []
+            for j in range(self.ncol):
+                elem = cells.get((i, j)) if cells is not None else self.get(i, j)
+                if elem is None:
+                    row_values.append(None)
+                    row_formats.append(None)
+                    continue
+                fmt = register_format(wb, static.get((i, j), elem.style) if static else elem.style)
+                if fit is not None and getattr(fmt, 'text_wrap', 0) and isinstance(elem.value, str):
+                    fit.add(x + i, y + j, elem.value, fmt.font_size)
+                row_values.append(elem.value)
+                row_formats.append(fmt)
+            values.append(row_values)
+            formats.append(row_formats)
+        ws.write_grid(x, y, values, formats)
+    
+    def draw(self, x, y, ws, wb):
+        """Draw Matrix object in a worksheet
+        
+        Args:
+            x (int): x-coordinate (rows)
+            y (int): y-coordinate (columns)
+            ws (xlsxwriter.worksheet.Worksheet): worksheet to draw in
+            wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
+        """
+        self.check_released()
+        self.origin = (ws.get_name(), x, y)
+        self.paged = False
+        static = self.prepare_rules(x, y, ws, wb)
+        self.draw_validation(x, y, ws, wb)
+        if hasattr(ws, 'write_grid') and self.is_plain():
+            self.draw_grid(x, y, ws, wb, static)
+            return
+        _set_comment_range(ws, (x, y))
+        y0 = y
+        for i in range(self.nrow):
+            height = 1
+            for j in range(self.ncol):
+                elem = self._styled(self.get(i, j), (i, j), static)
+                elem.draw(x, y, ws, wb)
+                y += elem.width
+                if elem.height > height:
+                    height = elem.height
+            y = y0
+            x += height
+        _set_comment_range(ws, None)
+            
+###############################################################################
+
+class SparseMatrix(Matrix):
+    """Sparse matrix of elements
+    
+    This is a variant of the Matrix class in which only non-empty cells are stored (dict of keys).
+    Missing cells cost neither memory nor write calls.
+    Number of rows and columns is given by the declared shape
+    and all cells have the same height and width, so positions are computed directly from indices.
+    Border styles are applied only to stored cells.
+    
+    Attributes:
+        shape (tuple): number of rows and columns
+        cell_height (int): height of cells
+        cell_width (int): width of cells
+    """
+    
+    # -------------------------------------------------------------------------
+    
+    @property
+    def shape(self):
+        return self._shape
+    @shape.setter
+    def shape(self, value):
+        if not isinstance(value, tuple) or len(value) != 2 or \
+            not all([ isinstance(x, int) for x in value ]):
+            raise TypeError('shape has to be a tuple of two ints.')
+        if value[0] < 1 or value[1] < 1:
+            raise ValueError('shape has to be positive.')
+        self._shape = value
+    
+    # -------------------------------------------------------------------------
+    
+    def __init__(self, values, shape = None, height = 1, width = 1, style = {},
+                 comment = None, comment_params = {},
+                 col_width = None, padding = 1.0,
+                 top = {}, right = {}, bottom = {}, left = {},
+                 rules = None, static_rules = False, validation = None):
+        """Constructor method
+        
+        Args:
+            values (dict/list): dict of keys ((i, j) => value) or list of lists of row values;
+                lists may be ragged and None values are treated as missing cells
+            shape (tuple): number of rows and columns; required if values is a dict
+            height (int): height of cells
+            width (int): width of cells
+            style (dict): style dict or dict of keys with style dicts
+            comment (str/dict): comment text or dict of keys with comment texts
+            comment_params (dict): comment params dict or dict of keys with comment params
+            col_width (float): col_width to set; defaults to None which makes no adjustment
+            padding (float): padding to add if col_width = 'auto'
+            top (dict): additional styling for top border
+            right (dict): additional styling for right border
+            bottom (dict): additional styling for bottom border
+            left (dict): additional styling for left border
+            rules (list): conditional formatting rules (see the Matrix class)
+            static_rules (bool): whether rules should be turned into static cell formats while drawing
+            validation (dict): dropdown lists of columns (see the Matrix class)
+        """
+        if not isinstance(height, int) or not isinstance(width, int):
+            raise TypeError('height and width of cells have to be ints.')
+        if isinstance(values, list):
+            if shape is None:
+                shape = (len(values), max([ len(x) for x in values ]))
+            values = { (i, j): v for i, row in enumerate(values)
+                       for j, v in enumerate(row) if v is not None }
+        elif not isinstance(values, dict):
+            raise TypeError('values has to be a dict or a list of lists.')
+        elif shape is None:
+            raise ValueError('shape has to be given if values is a dict.')
+        self.shape = shape
+        self.rules = rules
+        self.static_rules = static_rules
+        self.validation = validation
+        self.cell_height = height
+        self.cell_width = width
+        self.make_element_matrix(values, height, width, style, comment, comment_params, col_width, padding)
+        self.height = self.nrow * height
+        self.width = self.ncol * width
+        
+        # Add border styles ---
+        for which, style in (('t', top), ('r', right), ('b', bottom), ('l', left)):
+            if style:
+                for elem in self.border(which = which):
+                    elem.style = self._merge_styles(elem.style, style)
+    
+    def _count_rows(self, matrix = None):
+        return self.shape[0]
+    
+    def _count_cols(self, matrix = None):
+        return self.shape[1]
+    
+    def row_heights(self):
+        """Get heights of rows
+        
+        Returns:
+            list: heights of rows
+        """
+        return [ self.cell_height ] * self.nrow
+    
+    def col_widths(self):
+        """Get widths of columns
+        
+        Returns:
+            list: widths of columns
+        """
+        return [ self.cell_width ] * self.ncol
+    
+    def get(self, x, y):
+        """Get matrix element by index
+        
+        Args:
+            x (int): row index
+            y (int): column index
+        
+        Returns:
+            Element: element or None if the cell is empty
+        """
+        if not isinstance(x, int) or not isinstance(y, int):
+            raise TypeError('indices must be integers.')
+        if x < 0 or x > self.nrow - 1:
+            raise IndexError('x index out of range.')
+        if y < 0 or y > self.ncol - 1:
+            raise IndexError('y index out of range.')
+        return self.matrix.get((x, y))
+    
+    def set(self, x, y, value):
+        """Set matrix element by index
+        
+        Args:
+            value (Element/None): object inheriting from the Element class; None empties the cell
+        """
+        if value is None:
+            self.get(x, y)
+            self.matrix.pop((x, y), None)
+        else:
+            Matrix.set(self, x, y, value)
+    
+    def border(self, which, corner1 = True, corner2 = True):
+        """Get border of the matrix
+        
+        Args:
+            which (str): t, r, b or l (top, right, bottom, left)
+            corner1 (bool): whether to include top/left corner element
+            corner2 (bool): whether to include bottom/right element
+        
+        Returns:
+            list: list of non-empty border elements in the proper order
+        """
+        return [ x for x in Matrix.border(self, which, corner1, corner2) if x is not None ]
+    
+    def corner(self, which):
+        """Get corner element of a matrix
+        
+        Returns:
+            Element: corner element or None if the cell is empty
+        """
+        try:
+            return Matrix.corner(self, which)
+        except KeyError:
+            return None
+    
+    def make_element_matrix(self, values, height = 1, width = 1, style = {},
+                            comment = None, comment_params = {},
+                            col_width = None, padding = 1.0):
+        """Make element matrix from a dict of keys of values
+        
+        Args:
+            values (dict): dict of keys with values
+            height (int): height of cells
+            width (int): width of cells
+            style (dict): style dict or dict of keys with style dicts
+            comment (str/dict): comment text or dict of keys with comment texts
+            comment_params (dict): comment params dict or dict of keys with comment params
+            col_width (float): col_width to set; defaults to None which makes no adjustment
+            padding (float): padding to add if col_width = 'auto'
+        """
+        nrow, ncol = self.shape
+        styles = self._per_cell(style)
+        comments = isinstance(comment, dict)
+        params = self._per_cell(comment_params)
+        matrix = {}
+        for (i, j), value in values.items():
+            if i < 0 or i >= nrow or j < 0 or j >= ncol:
+                raise IndexError('cell (%d, %d) is out of shape.' % (i, j))
+            matrix[(i, j)] = HeaderElement(
+                value = value,
+                height = height,
+                width = width,
+                style = style.get((i, j), {}) if styles else style,
+                comment = comment.get((i, j)) if comments else comment,
+                comment_params = comment_params.get((i, j), {}) if params else comment_params,
+                col_width = col_width,
+                padding = padding
+            )
+        self.matrix = matrix
+    
+    def draw(self, x, y, ws, wb):
+        """Draw SparseMatrix object in a worksheet
+        
+        Only non-empty cells are written.
+        
+        Args:
+            x (int): x-coordinate (rows)
+            y (int): y-coordinate (columns)
+            ws (xlsxwriter.worksheet.Worksheet): worksheet to draw in
+            wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
+        """
+        self.check_released()
+        self.origin = (ws.get_name(), x, y)
+        self.paged = False
+        static = self.prepare_rules(x, y, ws, wb)
+        self.draw_validation(x, y, ws, wb)
+        _set_comment_range(ws, (x, y))
+        for (i, j), elem in self.matrix.items():
+            elem = self._styled(elem, (i, j), static)
+            elem.draw(x + i * self.cell_height, y + j * self.cell_width, ws, wb)
+        _set_comment_range(ws, None)
+
+###############################################################################
+
+class _ViewMapping(Mapping):
+    """Read-only mapping of view indices to elements of the underlying storage
+    """
+    
+    def __init__(self, view):
+        self.view = view
+    
+    def __getitem__(self, key):
+        try:
+            elem = self.view.get(*key)
+        except (TypeError, IndexError):
+            raise KeyError(key)
+        if elem is None:
+            raise KeyError(key)
+        return elem
+    
+    def __iter__(self):
+        for i in range(self.view.nrow):
+            for j in range(self.view.ncol):
+                if self.view.get(i, j) is not None:
+                    yield (i, j)
+    
+    def __len__(self):
+        return sum([ 1 for x in self ])
+
+###############################################################################
+
+class MatrixView(Matrix, metaclass = ABCMeta):
+    """Base class of lightweight views over Matrix objects
+    
+    Views do not copy values nor styles. They map their indices
+    to elements of the underlying matrices, so changes are visible both ways.
+    Views may be drawn, sliced, transposed and stacked like any other Matrix.
+    Subclasses have to implement the _locate method, nrow/ncol and sources.
+    Sizes of rows and columns are measured once and cached, since the underlying
+    matrices are not resized while a view exists; setting elements through the view resets the cache.
+    
+    Attributes:
+        matrix (Mapping): read-only mapping of indices to elements
+        height (int): height computed from the underlying elements
+        width (int): width computed from the underlying elements
+        sources (list): underlying matrices
+        released (bool): whether any of the underlying matrices was released
+    """
+    
+    # -------------------------------------------------------------------------
+    
+    @property
+    def matrix(self):
+        return _ViewMapping(self)
+    @matrix.setter
+    def matrix(self, value):
+        raise AttributeError('matrix of a view can not be set.')
+    
+    @property
+    def height(self):
+        return self._measure()[0]
+    @height.setter
+    def height(self, value):
+        raise AttributeError('height of a view can not be set.')
+    
+    @property
+    def width(self):
+        return self._measure()[1]
+    @width.setter
+    def width(self, value):
+        raise AttributeError('width of a view can not be set.')
+    
+    @property
+    @abstractmethod
+    def nrow(self):
+        """Number of rows of the view
+        """
+    
+    @property
+    @abstractmethod
+    def ncol(self):
+        """Number of columns of the view
+        """
+    
+    @property
+    @abstractmethod
+    def sources(self):
+        """Underlying matrices
+        """
+    
+    @property
+    def released(self):
+        return any([ src.released for src in self.sources ])
+    
+    # -------------------------------------------------------------------------
+    
+    def release(self):
+        """Views own no elements, so there is nothing to release
+        """
+        pass
+    
+    @abstractmethod
+    def _locate(self, x, y):
+        """Map view indices to a source matrix and its indices
+        
+        Returns:
+            tuple: source matrix, row index and column index
+        """
+    
+    def _measure(self):
+        """Measure the view in a single pass over its cells; the result is cached
+        
+        Returns:
+            tuple: height, width, heights of rows and widths of columns
+        """
+        self.check_released()
+        measures = getattr(self, '_measures', None)
+        if measures is None:
+            heights, widths, cols = [], [], []
+            for i in range(self.nrow):
+                sizes = [ self._size(i, j) for j in range(self.ncol) ]
+                heights.append(max([ h for h, w in sizes ]))
+                widths.append(sum([ w for h, w in sizes ]))
+                if i == 0:
+                    cols = [ w for h, w in sizes ]
+            measures = (sum(heights), max(widths), heights, cols)
+            self._measures = measures
+        return measures
+    
+    def _size(self, x, y):
+        """Get height and width of a cell; sizes of empty cells are taken from their source
+        
+        Returns:
+            tuple: height and width
+        """
+        src, i, j = self._locate(x, y)
+        elem = src.get(i, j)
+        if elem is not None:
+            return (elem.height, elem.width)
+        if isinstance(src, MatrixView):
+            return src._size(i, j)
+        return (getattr(src, 'cell_height', 1), getattr(src, 'cell_width', 1))
+    
+    def get(self, x, y):
+        """Get element by index
+        
+        Args:
+            x (int): row index
+            y (int): column index
+        
+        Returns:
+            Element: element or None if the underlying cell is empty
+        """
+        if not isinstance(x, int) or not isinstance(y, int):
+            raise TypeError('indices must be integers.')
+        if x < 0 or x > self.nrow - 1:
+            raise IndexError('x index out of range.')
+        if y < 0 or y > self.ncol - 1:
+            raise IndexError('y index out of range.')
+        src, i, j = self._locate(x, y)
+        return src.get(i, j)
+    
+    def set(self, x, y, value):
+        """Set element by index in the underlying storage
+        
+        Args:
+            value (Element): object inheriting from the Element class
+        """
+        self.get(x, y)
+        src, i, j = self._locate(x, y)
+        src.set(i, j, value)
+        self._measures = None
+    
+    def corner(self, which):
+        """Get corner element of a view
+        
+        Returns:
+            Element: corner element or None if the underlying cell is empty
+        """
+        try:
+            return Matrix.corner(self, which)
+        except KeyError:
+            return None
+    
+    def border(self, which, corner1 = True, corner2 = True):
+        """Get border of the view
+        
+        Returns:
+            list: list of non-empty border elements in the proper order
+        """
+        return [ x for x in Matrix.border(self, which, corner1, corner2) if x is not None ]
+    
+    def row_heights(self):
+        """Get heights of rows
+        
+        Returns:
+            list: heights of the highest cells in rows
+        """
+        return list(self._measure()[2])
+    
+    def col_widths(self):
+        """Get widths of columns
+        
+        Returns:
+            list: widths of cells in the first row
+        """
+        return list(self._measure()[3])
+    
+    def draw(self, x, y, ws, wb):
+        """Draw view in a worksheet
+        
+        Args:
+            x (int): x-coordinate (rows)
+            y (int): y-coordinate (columns)
+            ws (xlsxwriter.worksheet.Worksheet): worksheet to draw in
+            wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
+        """
+        self.check_released()
+        self.origin = (ws.get_name(), x, y)
+        self.paged = False
+        static = self.prepare_rules(x, y, ws, wb)
+        self.draw_validation(x, y, ws, wb)
+        if hasattr(ws, 'write_grid') and self.is_plain():
+            self.draw_grid(x, y, ws, wb, static)
+            return
+        _set_comment_range(ws, (x, y))
+        y0 = y
+        for i in range(self.nrow):
+            height = 1
+            for j in range(self.ncol):
+                elem = self._styled(self.get(i, j), (i, j), static)
+                if elem is None:
+                    h, w = self._size(i, j)
+                else:
+                    elem.draw(x, y, ws, wb)
+                    h, w = elem.height, elem.width
+                y += w
+                if h > height:
+                    height = h
+            y = y0
+            x += height
+        _set_comment_range(ws, None)
+
+###############################################################################
+
+def _compose(outer, inner):
+    """Compose two ranges of indices
+    
+    Args:
+        outer (range): range of indices
+        inner (range): range of indices into the outer range
+    
+    Returns:
+        range: range of indices selected from the outer range
+    """
+    start = outer[inner.start]
+    step = outer.step * inner.step
+    return range(start, start + step * len(inner), step)
+
+class SliceView(MatrixView):
+    """View of a rectangular slice of a matrix, possibly transposed
+    
+    Attributes:
+        parent (Matrix): underlying matrix
+        rows (range): row indices in the parent
+        cols (range): column indices in the parent
+        transposed (bool): whether the view is transposed
+    """
+    
+    def __init__(self, parent, rows, cols, transposed = False, rules = None, static_rules = False):
+        """Constructor method
+        
+        Args:
+            parent (Matrix): underlying matrix
+            rows (range): row indices in the parent
+            cols (range): column indices in the parent
+            transposed (bool): whether the view is transposed
+            rules (list): conditional formatting rules of the view
+            static_rules (bool): whether rules should be turned into static cell formats while drawing
+        """
+        if not isinstance(parent, Matrix):
+            raise TypeError('parent has to be a Matrix.')
+        if not isinstance(rows, range) or not isinstance(cols, range):
+            raise TypeError('rows and cols have to be ranges.')
+        parent.check_released()
+        self.parent = parent
+        self.rows = rows
+        self.cols = cols
+        self.transposed = transposed
+        self.rules = rules
+        self.static_rules = static_rules
+    
+    @property
+    def nrow(self):
+        return len(self.cols) if self.transposed else len(self.rows)
+    
+    @property
+    def ncol(self):
+        return len(self.rows) if self.transposed else len(self.cols)
+    
+    @property
+    def sources(self):
+        return [ self.parent ]
+    
+    def _locate(self, x, y):
+        if self.transposed:
+            x, y = y, x
+        return (self.parent, self.rows[x], self.cols[y])
+    
+    def __getitem__(self, key):
+        """Get element or a view; slices of slices are composed, so they always refer to the parent
+        """
+        view = Matrix.__getitem__(self, key)
+        if not isinstance(view, SliceView):
+            return view
+        if self.transposed:
+            return SliceView(self.parent, _compose(self.rows, view.cols),
+                             _compose(self.cols, view.rows), transposed = True)
+        return SliceView(self.parent, _compose(self.rows, view.rows), _compose(self.cols, view.cols))
+    
+    @property
+    def T(self):
+        return SliceView(self.parent, self.rows, self.cols, transposed = not self.transposed)
+
+###############################################################################
+
+class StackView(MatrixView):
+    """View of matrices stacked vertically or horizontally
+    
+    Attributes:
+        blocks (list): stacked matrices
+        axis (int): 0 for vertical stacking, 1 for horizontal stacking
+    """
+    
+    def __init__(self, blocks, axis = 0, rules = None, static_rules = False):
+        """Constructor method
+        
+        Args:
+            blocks (list): list of matrices; they have to have the same number of columns (axis 0) or rows (axis 1)
+            axis (int): 0 for vertical stacking, 1 for horizontal stacking
+            rules (list): conditional formatting rules of the view
+            static_rules (bool): whether rules should be turned into static cell formats while drawing
+        """
+        if not isinstance(blocks, (list, tuple)) or len(blocks) < 1:
+            raise TypeError('blocks has to be a non-empty list.')
+        if not all([ isinstance(x, Matrix) for x in blocks ]):
+            raise TypeError('blocks have to be matrices.')
+        if axis not in (0, 1):
+            raise ValueError('axis has to be either 0 or 1.')
+        for block in blocks:
+            block.check_released()
+        other = 'ncol' if axis == 0 else 'nrow'
+        if len(set([ getattr(x, other) for x in blocks ])) > 1:
+            raise ValueError('all blocks have to have the same %s.' % other)
+        self.blocks = list(blocks)
+        self.axis = axis
+        self.rules = rules
+        self.static_rules = static_rules
+        self._offsets = [0]
+        for block in self.blocks:
+            self._offsets.append(self._offsets[-1] + (block.nrow if axis == 0 else block.ncol))
+    
+    @property
+    def nrow(self):
+        return self._offsets[-1] if self.axis == 0 else self.blocks[0].nrow
+    
+    @property
+    def ncol(self):
+        return self.blocks[0].ncol if self.axis == 0 else self._offsets[-1]
+    
+    @property
+    def sources(self):
+        return self.blocks
+    
+    def _locate(self, x, y):
+        n = x if self.axis == 0 else y
+        k = bisect_right(self._offsets, n) - 1
+        if self.axis == 0:
+            return (self.blocks[k], x - self._offsets[k], y)
+        return (self.blocks[k], x, y - self._offsets[k])
+
+def vstack(blocks):
+    """Stack matrices vertically without copying them
+    
+    Args:
+        blocks (list): list of matrices with the same number of columns
+    
+    Returns:
+        StackView: stacked view
+    """
+    return StackView(blocks, axis = 0)
+
+def hstack(blocks):
+    """Stack matrices horizontally without copying them
+    
+    Args:
+        blocks (list): list of matrices with the same number of rows
+    
+    Returns:
+        StackView: stacked view
+    """
+    return StackView(blocks, axis = 1)
+
+###############################################################################
+
+class Summary(object):
+    """Summary row or column of a Matrix
+    
+    Summary writes live formulas (SUM, AVERAGE etc.) over the exact range
+    the Matrix was drawn in, so the Matrix has to be drawn first (and not split between worksheets).
+    Results are computed in vectorized form from the Matrix values and stored
+    as cached formula values (#DIV/0! for averages of no values).
+    Excel recalculates all formulas on load by default anyway (xlsxwriter sets fullCalcOnLoad);
+    with calc_on_load = False the workbook is set to open with cached values instead,
+    which then applies to all formulas in the workbook (formulas written without values show 0).
+    
+    Attributes:
+        matrix (Matrix): summarized matrix (or its view)
+        axis (int): 0 for a summary row below the columns, 1 for a summary column next to the rows
+        func (str): aggregate function; SUM, AVERAGE, MIN, MAX or COUNT
+        skip (int): number of leading rows (axis = 0) or columns (axis = 1) left out (e.g. headers)
+        label (str): label written in the first cell instead of the aggregate of the first column/row
+        style (dict): style dict of aggregate cells
+        label_style (dict): style dict of the label cell
+        calc_on_load (bool): whether Excel should recalculate formulas of the workbook on load
+        height (int): height
+        width (int): width
+    """
+    
+    FUNCTIONS = ('SUM', 'AVERAGE', 'MIN', 'MAX', 'COUNT')
+    
+    # -------------------------------------------------------------------------
+    
+    @property
+    def axis(self):
+        return self._axis
+    @axis.setter
+    def axis(self, value):
+        if value not in (0, 1):
+            raise ValueError('axis has to be 0 or 1.')
+        self._axis = value
+    
+    @property
+    def func(self):
+        return self._func
+    @func.setter
+    def func(self, value):
+        if not isinstance(value, str):
+            raise TypeError('func has to be a str.')
+        value = value.upper()
+        if value not in self.FUNCTIONS:
+            raise ValueError('func has to be one of: %s.' % ', '.join(self.FUNCTIONS))
+        self._func = value
+    
+    @property
+    def skip(self):
+        return self._skip
+    @skip.setter
+    def skip(self, value):
+        if not isinstance(value, int):
+            raise TypeError('skip has to be an int.')
+        elif value < 0:
+            raise ValueError('skip has to be non-negative.')
+        self._skip = value
+    
+    # -------------------------------------------------------------------------
+    
+    def __init__(self, matrix, axis = 0, func = 'SUM', skip = 0, label = None,
+                 style = {}, label_style = {}, calc_on_load = True):
+        """Constructor method
+        
+        Args:
+            matrix (Matrix): summarized matrix (or its view)
+            axis (int): 0 for a summary row below the columns, 1 for a summary column next to the rows
+            func (str): aggregate function; SUM, AVERAGE, MIN, MAX or COUNT
+            skip (int): number of leading rows (axis = 0) or columns (axis = 1) left out (e.g. headers)
+            label (str): label written in the first cell instead of the aggregate of the first column/row
+            style (dict): style dict of aggregate cells
+            label_style (dict): style dict of the label cell
+            calc_on_load (bool): whether Excel should recalculate formulas of the workbook on load
+        """
+        if not isinstance(matrix, Matrix):
+            raise TypeError('matrix has to be a Matrix.')
+        matrix.check_released()
+        self.matrix = matrix
+        self.axis = axis
+        self.func = func
+        self.skip = skip
+        self.label = label
+        self.style = style
+        self.label_style = label_style
+        self.calc_on_load = calc_on_load
+        if axis == 0:
+            self.height = 1
+            self.width = matrix.width
+        else:
+            self.height = matrix.height
+            self.width = 1
+    
+    def values(self):
+        """Compute aggregates of columns (axis = 0) or rows (axis = 1)
+        
+        Returns:
+            numpy.ndarray: array of aggregates; 0 where there are no numeric values (NaN for AVERAGE)
+        """
+        import numpy as np
+        keys = list(self.matrix.matrix.keys())
+        values = np.full((self.matrix.nrow, self.matrix.ncol), np.nan)
+        if keys:
+            rows, cols = zip(*keys)
+            values[rows, cols] = self.matrix._numeric_values(keys)
+        if self.axis == 0:
+            values = values[self.skip:].T
+        else:
+            values = values[:, self.skip:]
+        ok = ~np.isnan(values)
+        count = ok.sum(axis = 1)
+        if self.func == 'COUNT':
+            return count.astype(float)
+        filled = np.where(ok, values, 0.0)
+        if self.func == 'SUM':
+            result = filled.sum(axis = 1)
+        elif self.func == 'AVERAGE':
+            result = filled.sum(axis = 1) / np.maximum(count, 1)
+        elif self.func == 'MIN':
+            result = np.where(ok, values, np.inf).min(axis = 1)
+        else:
+            result = np.where(ok, values, -np.inf).max(axis = 1)
+        return np.where(count > 0, result, np.nan if self.func == 'AVERAGE' else 0.0)
+    
+    def draw(self, x, y, ws, wb):
+        """Draw summary in a worksheet
+        
+        Args:
+            x (int): x-coordinate (rows)
+            y (int): y-coordinate (columns)
+            ws (xlsxwriter.worksheet.Worksheet): worksheet to draw in
+            wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
+        """
+        self.matrix.check_released()
+        if self.matrix.paged:
+            raise ValueError('summaries of matrices split between worksheets are not supported.')
+        if self.matrix.origin is None:
+            raise ValueError('matrix has to be drawn before its summary.')
+        if not self.calc_on_load:
+            wb.calc_on_load = False
+        name, x0, y0 = self.matrix.origin
+        sheet = '' if name == ws.get_name() else "'%s'!" % name.replace("'", "''")
+        heights = self.matrix.row_heights()
+        widths = self.matrix.col_widths()
+        rows = [ x0 + sum(heights[:i]) for i in range(len(heights) + 1) ]
+        cols = [ y0 + sum(widths[:j]) for j in range(len(widths) + 1) ]
+        fmt = register_format(wb, self.style) if self.style else None
+        label_fmt = register_format(wb, self.label_style) if self.label_style else fmt
+        results = self.values()
+        if self.axis == 0:
+            offsets = [ c - y0 for c in cols[:-1] ]
+            first, last = rows[self.skip], rows[-1] - 1
+        else:
+            offsets = [ r - x0 for r in rows[:-1] ]
+            first, last = cols[self.skip], cols[-1] - 1
+        for k, offset in enumerate(offsets):
+            r, c = (x, y + offset) if self.axis == 0 else (x + offset, y)
+            if k == 0 and self.label is not None:
+                ws.write(r, c, self.label, label_fmt)
+                continue
+            if last < first:
+                ws.write_blank(r, c, None, fmt)
+                continue
+            if self.axis == 0:
+                rng = xl_rowcol_to_cell(first, cols[k]) + ':' + xl_rowcol_to_cell(last, cols[k])
+            else:
+                rng = xl_rowcol_to_cell(rows[k], first) + ':' + xl_rowcol_to_cell(rows[k], last)
+            value = float(results[k])
+            if math.isnan(value):
+                value = '#DIV/0!'
+            elif value.is_integer():
+                value = int(value)
+            ws.write_formula(r, c, '=%s(%s%s)' % (self.func, sheet, rng), fmt, value)
+
+###############################################################################
+
+class ChartElement(object):
+    """Chart bound to ranges of drawn elements
+    
+    Series values, categories and names may be given as references (strings)
+    or as dicts referring to ranges registered by a Drawer (see the Drawer.draw and Drawer.ref methods):
+    {'range': name, 'row': i, 'col': j, 'skip': k}. Charts reference data drawn elsewhere,
+    so the data is not duplicated. The chart is scaled to cover its height and width in cells
+    of the default size.
+    
+    Attributes:
+        chart_type (str): chart type (see workbook.add_chart in xlsxwriter docs)
+        subtype (str): chart subtype
+        series (list): list of series option dicts (see chart.add_series in xlsxwriter docs)
+        title (str): chart title
+        options (dict): additional chart options; keys are names of chart methods (e.g. 'x_axis', 'legend')
+        height (int): height in cells
+        width (int): width in cells
+    """
+    
+    REFERENCES = ('values', 'categories', 'name')
+    ROW_PX = 20
+    COL_PX = 64
+    CHART_PX = (480, 288)
+    
+    # -------------------------------------------------------------------------
+    
+    @property
+    def series(self):
+        return self._series
+    @series.setter
+    def series(self, value):
+        if not isinstance(value, list) or not all([ isinstance(x, dict) for x in value ]):
+            raise TypeError('series has to be a list of dicts.')
+        self._series = value
+    
+    @property
+    def height(self):
+        return self._height
+    @height.setter
+    def height(self, value):
+        if not isinstance(value, int):
+            raise TypeError('height has to be a positive int.')
+        elif value < 1:
+            raise ValueError('height has to be a positive int.')
+        self._height = value
+    
+    @property
+    def width(self):
+        return self._width
+    @width.setter
+    def width(self, value):
+        if not isinstance(value, int):
+            raise TypeError('width has to be a positive int.')
+        elif value < 1:
+            raise ValueError('width has to be a positive int.')
+        self._width = value
+    
+    # -------------------------------------------------------------------------
+    
+    def __init__(self, series, chart_type = 'line', subtype = None, title = None,
+                 height = 15, width = 8, options = {}):
+        """Constructor method
+        
+        Args:
+            series (list): list of series option dicts
+            chart_type (str): chart type
+            subtype (str): chart subtype
+            title (str): chart title
+            height (int): height in cells
+            width (int): width in cells
+            options (dict): additional chart options; keys are names of chart methods (e.g. 'x_axis', 'legend')
+        """
+        self.series = series
+        self.chart_type = chart_type
+        self.subtype = subtype
+        self.title = title
+        self.height = height
+        self.width = width
+        self.options = options
+        self._bound = None
+    
+    def bind(self, drawer):
+        """Resolve references to registered ranges
+        
+        Args:
+            drawer (pyxldrawer.drawer.Drawer): drawer with registered ranges
+        """
+        bound = []
+        for series in self.series:
+            series = dict(series)
+            for key in self.REFERENCES:
+                ref = series.get(key)
+                if isinstance(ref, dict) and 'range' in ref:
+                    kwargs = dict(ref)
+                    series[key] = '=' + drawer.ref(kwargs.pop('range'), **kwargs)
+            bound.append(series)
+        self._bound = bound
+    
+    def draw(self, x, y, ws, wb):
+        """Insert chart in a worksheet
+        
+        Args:
+            x (int): x-coordinate (rows)
+            y (int): y-coordinate (columns)
+            ws (xlsxwriter.worksheet.Worksheet): worksheet to draw in
+            wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
+        """
+        series = self._bound if self._bound is not None else self.series
+        for s in series:
+            for key in self.REFERENCES:
+                if isinstance(s.get(key), dict) and 'range' in s[key]:
+                    raise ValueError('references to registered ranges require drawing with a Drawer.')
+        params = { 'type': self.chart_type }
+        if self.subtype is not None:
+            params['subtype'] = self.subtype
+        chart = wb.add_chart(params)
+        for s in series:
+            chart.add_series(s)
+        if self.title is not None:
+            chart.set_title({ 'name': self.title })
+        for method, value in self.options.items():
+            getattr(chart, 'set_' + method)(value)
+        ws.insert_chart(x, y, chart, {
+            'x_scale': self.width * self.COL_PX / float(self.CHART_PX[0]),
+            'y_scale': self.height * self.ROW_PX / float(self.CHART_PX[1])
+        })
+
+###############################################################################
+
+class ValidationColumn(object):
+    """Column range with a dropdown list
+    
+    It writes no values, only a single data validation over the whole range
+    referring to a list on the shared lookup sheet (see the lookup_list function),
+    so input templates with dropdowns on many rows cost the same as on a few rows.
+    
+    Attributes:
+        source (list/dict): list of allowed values or a dict of options (value => label; labels are listed)
+        height (int): number of rows
+        width (int): number of columns
+        options (dict): other data validation options (see worksheet.data_validation in xlsxwriter docs)
+    """
+    
+    # -------------------------------------------------------------------------
+    
+    @property
+    def height(self):
+        return self._height
+    @height.setter
+    def height(self, value):
+        if not isinstance(value, int):
+            raise TypeError('height has to be a positive int.')
+        elif value < 1:
+            raise ValueError('height has to be a positive int.')
+        self._height = value
+    
+    @property
+    def width(self):
+        return self._width
+    @width.setter
+    def width(self, value):
+        if not isinstance(value, int):
+            raise TypeError('width has to be a positive int.')
+        elif value < 1:
+            raise ValueError('width has to be a positive int.')
+        self._width = value
+    
+    # -------------------------------------------------------------------------
+    
+    def __init__(self, source, height, width = 1, options = {}):
+        """Constructor method
+        
+        Args:
+            source (list/dict): list of allowed values or a dict of options (value => label; labels are listed)
+            height (int): number of rows
+            width (int): number of columns
+            options (dict): other data validation options
+        """
+        self.source, _ = _validation_options(source)
+        self.height = height
+        self.width = width
+        self.options = options
+    
+    def draw(self, x, y, ws, wb):
+        """Apply dropdown list in a worksheet
+        
+        Args:
+            x (int): x-coordinate (rows)
+            y (int): y-coordinate (columns)
+            ws (xlsxwriter.worksheet.Worksheet): worksheet to draw in
+            wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
+        """
+        options = dict(self.options)
+        options['validate'] = 'list'
+        options['source'] = '=' + lookup_list(wb, self.source)
+        ws.data_validation(x, y, x + self.height - 1, y + self.width - 1, options)
+
+###############################################################################
+
+class TreeElement(object):
+    """Element with a row of sub elements
+    
+    Attributes:
+        height (int): total height of the element
+        width (int): total width of the element
+        parent (Element): object inheriting from the Element class
+        children (LineElement): object inheriting from the LineElement class
+    """
+    
+    # -------------------------------------------------------------------------
+    
+    @property
+    def width(self):
+        return self._width
+    @width.setter
+    def width(self, value):
+        if not isinstance(value, int):
+            raise TypeError('width has to be an int.')
+        elif value < 1:
+            raise ValueError('width has to be positive.')
+        self._width = value
+    
+    @property
+    def height(self):
+        return self._height
+    @height.setter
+    def height(self, value):
+        if not isinstance(value, int):
+            raise TypeError('height has to be an int.')
+        elif value < 1:
+            raise ValueError('height has to be positive.')
+        self._height = value
+    
+    @property
+    def parent(self):
+        return self._parent
     @parent.setter
     def parent(self, value):
         if not issubclass(type(value), Element):
@@ -598,39 +2776,272 @@ class TreeElement(object):
         self._parent = value
     
     @property
-    def children(self):
-        return self._children
-    @children.setter
-    def children(self, value):
-        self._children = value
+    def children(self):
+        return self._children
+    @children.setter
+    def children(self, value):
+        self._children = value
+    
+    # -------------------------------------------------------------------------
+    
+    def __init__(self, parent, children):
+        """Constructor method
+        
+        Args:
+            parent (Element): object inheriting from Element class
+            children (Matrix): object inheriting from Matrix class; has to have only 1 row
+        """
+        if parent.width != children.width:
+            raise ValueError('parent and children widths are not the same.')
+        self.parent = parent
+        self.children = children
+        self.height = parent.height + children.height
+        self.width = parent.width
+    
+    def draw(self, x, y, ws, wb):
+        """Drawing method
+        
+        Args:
+            x (int): x-coordinate
+            y (int): y-coordinate
+            ws (xlsxwriter.worksheet.Worksheet): worksheet to draw in
+            wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
+        """
+        self.parent.draw(x, y, ws, wb)
+        self.children.draw(x + self.parent.height, y, ws, wb)
+
+###############################################################################
+
+class MultiHeader(object):
+    """Hierarchical multi-level header
+    
+    This is a generalization of the TreeElement class for any number of levels.
+    Labels are given as a list of tuples (one per leaf, e.g. pandas MultiIndex)
+    and spans of all levels are computed in a single pass over the leaves,
+    so leaves have to be grouped by their levels (e.g. sorted).
+    Labels with trailing empty levels ('' or None) are merged down to the last level.
+    Merged ranges are written directly without creating an element per cell.
+    
+    Attributes:
+        labels (list): list of tuples with labels of leaves
+        vertical (bool): whether it is a row header (levels are columns) or a column header (levels are rows)
+        nlevels (int): number of levels
+        height (int): total height
+        width (int): total width
+        style (dict): style dict of all header cells
+        level_styles (list): list of style dicts (one per level) merged into the style
+        col_width (float/str/None): column width; 'auto' adjusts widths to the labels
+        padding (float): padding added to both sides in auto-resizing
+    """
+    
+    # -------------------------------------------------------------------------
+    
+    @property
+    def labels(self):
+        return self._labels
+    @labels.setter
+    def labels(self, value):
+        if hasattr(value, 'tolist'):
+            value = value.tolist()
+        if not isinstance(value, (list, tuple)) or len(value) < 1:
+            raise TypeError('labels has to be a non-empty list of tuples.')
+        value = [ x if isinstance(x, tuple) else (x,) for x in value ]
+        nlevels = max([ len(x) for x in value ])
+        self._labels = [ x + ('',) * (nlevels - len(x)) for x in value ]
+        self._nlevels = nlevels
+    
+    @property
+    def nlevels(self):
+        return self._nlevels
+    
+    @property
+    def vertical(self):
+        return self._vertical
+    @vertical.setter
+    def vertical(self, value):
+        if not isinstance(value, bool):
+            raise TypeError('vertical has to be a bool.')
+        self._vertical = value
+    
+    @property
+    def level_styles(self):
+        return self._level_styles
+    @level_styles.setter
+    def level_styles(self, value):
+        if value is None:
+            value = [ {} ] * self.nlevels
+        if not isinstance(value, list) or not all([ isinstance(x, dict) for x in value ]):
+            raise TypeError('level_styles has to be a list of dicts.')
+        if len(value) != self.nlevels:
+            raise ValueError('level_styles has to have one style dict per level.')
+        self._level_styles = value
+    
+    @property
+    def col_width(self):
+        return self._col_width
+    @col_width.setter
+    def col_width(self, value):
+        if isinstance(value, str):
+            if value != 'auto':
+                raise ValueError("col_width has to be float, None or 'auto'.")
+        elif value is None:
+            pass
+        else:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise TypeError("col_width has to be float, None or 'auto'.")
+        self._col_width = value
+    
+    @property
+    def height(self):
+        return len(self.labels) if self.vertical else self.nlevels
+    
+    @property
+    def width(self):
+        return self.nlevels if self.vertical else len(self.labels)
     
     # -------------------------------------------------------------------------
     
-    def __init__(self, parent, children):
+    def __init__(self, labels, vertical = False, style = {}, level_styles = None,
+                 col_width = None, padding = 1.0):
         """Constructor method
         
         Args:
-            parent (Element): object inheriting from Element class
-            children (Matrix): object inheriting from Matrix class; has to have only 1 row
+            labels (list/pandas.MultiIndex): list of tuples with labels of leaves
+            vertical (bool): whether it is a row header
+            style (dict): style dict of all header cells
+            level_styles (list): list of style dicts (one per level)
+            col_width (float/str/None): column width; defaults to None which makes no adjustment
+            padding (float): padding to add if col_width = 'auto'
         """
-        if parent.width != children.width:
-            raise ValueError('parent and children widths are not the same.')
-        self.parent = parent
-        self.children = children
-        self.height = parent.height + children.height
-        self.width = parent.width
+        self.labels = labels
+        self.vertical = vertical
+        self.style = style
+        self.level_styles = level_styles
+        self.col_width = col_width
+        self.padding = float(padding)
+    
+    def _is_empty(self, value):
+        return value is None or value == '' or (isinstance(value, float) and math.isnan(value))
+    
+    def _same(self, a, b):
+        """Check whether labels of a level continue a span; all empty labels are the same
+        """
+        return a == b or (self._is_empty(a) and self._is_empty(b))
+    
+    def make_spans(self):
+        """Compute spans of all levels in a single pass over the leaves
+        
+        A label is merged down to the last level only if all deeper levels are empty
+        for all leaves it spans.
+        
+        Returns:
+            list: list of tuples (level, first leaf, last leaf, last level, label)
+        """
+        spans = []
+        L = self.nlevels
+        starts = [0] * L
+        # Whether all leaves of an open span are empty on all deeper levels
+        empty = [True] * L
+        prev = None
+        for k, label in enumerate(self.labels + [None]):
+            d = 0
+            if prev is not None and label is not None:
+                while d < L and self._same(label[d], prev[d]):
+                    d += 1
+            if prev is not None and d < L:
+                covered = False
+                for lvl in range(d, L):
+                    if covered:
+                        continue
+                    if lvl < L - 1 and empty[lvl] and not self._is_empty(prev[lvl]):
+                        spans.append((lvl, starts[lvl], k - 1, L - 1, prev[lvl]))
+                        covered = True
+                    else:
+                        spans.append((lvl, starts[lvl], k - 1, lvl, prev[lvl]))
+            if label is None:
+                break
+            for lvl in range(d, L):
+                starts[lvl] = k
+                empty[lvl] = True
+            # Levels from the deepest non-empty label down are followed by empty levels only
+            deepest = max([ lvl for lvl in range(L) if not self._is_empty(label[lvl]) ] + [ 0 ])
+            for lvl in range(deepest):
+                empty[lvl] = False
+            prev = label
+        self.check_spans(spans)
+        return spans
+    
+    def check_spans(self, spans):
+        """Check that spans do not overlap
+        
+        Args:
+            spans (list): list of tuples (level, first leaf, last leaf, last level, label)
+        """
+        taken = {}
+        for span in spans:
+            lvl, first, last, last_lvl, value = span
+            for level in range(lvl, last_lvl + 1):
+                for leaf in range(first, last + 1):
+                    if (level, leaf) in taken:
+                        raise ValueError('header spans %r and %r overlap.' % (taken[(level, leaf)], span))
+                    taken[(level, leaf)] = span
+    
+    def _col_widths(self, spans):
+        """Compute column widths
+        
+        Args:
+            spans (list): list of spans
+        
+        Returns:
+            list: list of widths of header columns
+        """
+        widths = [0.0] * self.width
+        if isinstance(self.col_width, float):
+            return [ self.col_width ] * self.width
+        for lvl, first, last, last_lvl, value in spans:
+            n = len(str(value)) if not self._is_empty(value) else 0
+            if self.vertical:
+                w = (n + self.padding * 2) / (last_lvl - lvl + 1)
+                cols = range(lvl, last_lvl + 1)
+            else:
+                w = (n + self.padding * 2) / (last - first + 1)
+                cols = range(first, last + 1)
+            for j in cols:
+                if w > widths[j]:
+                    widths[j] = w
+        return widths
     
     def draw(self, x, y, ws, wb):
-        """Drawing method
+        """Draw MultiHeader in a worksheet
         
         Args:
-            x (int): x-coordinate
-            y (int): y-coordinate
+            x (int): x-coordinate (rows)
+            y (int): y-coordinate (columns)
             ws (xlsxwriter.worksheet.Worksheet): worksheet to draw in
             wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
         """
-        self.parent.draw(x, y, ws, wb)
-        self.children.draw(x + self.parent.height, y, ws, wb)
+        formats = []
+        for level_style in self.level_styles:
+            style = self.style.copy()
+            style.update(level_style)
+            formats.append(register_format(wb, style))
+        spans = self.make_spans()
+        for lvl, first, last, last_lvl, value in spans:
+            if value is None:
+                value = ''
+            if self.vertical:
+                r0, c0, r1, c1 = x + first, y + lvl, x + last, y + last_lvl
+            else:
+                r0, c0, r1, c1 = x + lvl, y + first, x + last_lvl, y + last
+            if r0 == r1 and c0 == c1:
+                ws.write(r0, c0, value, formats[lvl])
+            else:
+                ws.merge_range(r0, c0, r1, c1, value, formats[lvl])
+        if self.col_width is not None:
+            for j, col_width in enumerate(self._col_widths(spans)):
+                set_column(ws, y + j, y + j, col_width)
 
 ###############################################################################
 
@@ -716,6 +3127,23 @@ class LineElement(object):
 
 ###############################################################################
 
+def _code_names(code):
+    """Get names used by a compiled expression (including nested code, e.g. lambdas)
+    
+    Args:
+        code (code): compiled expression
+    
+    Returns:
+        set: set of names
+    """
+    names = set(code.co_names) | set(code.co_varnames) | set(code.co_freevars)
+    for const in code.co_consts:
+        if hasattr(const, 'co_names'):
+            names |= _code_names(const)
+    return names
+
+###############################################################################
+
 class Dictionary(object):
     """Visual/tabular representaion of a key => value set
     
@@ -732,6 +3160,10 @@ class Dictionary(object):
         field_params (dict): default set of params passed to the HeaderElement constructor (field column) as **kwargs
         content_params (dict): default set of params passed to the HeaderElement constructor (content column) as **kwargs
         context (dict): additional context for evaluation of field and content values
+    
+    Many instances of a Dictionary (one per context) may be drawn at once with the draw_batch method
+    (or with the DictionaryBatch element). Layout of fields is computed once (see the compile method)
+    and @eval@ expressions may be evaluated column-wise for all contexts (see the evaluate method).
     """
     
     # -------------------------------------------------------------------------
@@ -747,6 +3179,7 @@ class Dictionary(object):
             self._structure = self.load_config(value)
         else:
             self._structure = value
+        self._layout = None
     
     @property
     def hspace(self):
@@ -756,6 +3189,7 @@ class Dictionary(object):
         if not isinstance(value, int):
             raise TypeError('hspace has to be an int.')
         self._hspace = value
+        self._layout = None
     
     @property
     def vspace(self):
@@ -765,6 +3199,7 @@ class Dictionary(object):
         if not isinstance(value, int):
             raise TypeError('vspace has to be an int.')
         self._vspace = value
+        self._layout = None
     
     @property
     def field_params(self):
@@ -774,6 +3209,7 @@ class Dictionary(object):
         if not isinstance(value, dict):
             raise TypeError('field_params has to be a dict.')
         self._field_params = value
+        self._layout = None
     
     @property
     def content_params(self):
@@ -783,6 +3219,7 @@ class Dictionary(object):
         if not isinstance(value, dict):
             raise TypeError('content_params has to be a dict.')
         self._content_params = value
+        self._layout = None
     
     @property
     def context(self):
@@ -860,6 +3297,7 @@ class Dictionary(object):
         Returns:
             OrderedDict: config parsed to a dictionary
         """        
+        import yaml
         if path is None:
             path = self.config_path
     
@@ -906,6 +3344,192 @@ class Dictionary(object):
             return eval(x, None, self.context)
         else:
             return x
+    
+    def compile(self):
+        """Compute layout of fields once
+        
+        Params of fields and contents are merged and @eval@ expressions are compiled once,
+        so drawing many instances creates no HeaderElement objects.
+        
+        Returns:
+            list: list of cell dicts (row and column offsets, value, compiled expression and HeaderElement params)
+        """
+        if self._layout is not None:
+            return self._layout
+        layout = []
+        x = 0
+        for field, data in self.structure.items():
+            field_params = self._merge_styles(self.field_params, data.get('field_params', {}))
+            content_params = self._merge_styles(self.content_params, data.get('content_params', {}))
+            vspace = data.get('vspace', self.vspace)
+            Field = self._layout_cell(x, 0, field, field_params)
+            layout.append(Field)
+            content = data['content']
+            if not isinstance(content, list):
+                content = [content]
+            for value in content:
+                Content = self._layout_cell(x, Field['width'] + self.hspace, value, content_params)
+                layout.append(Content)
+                x += Content['height']
+            x += vspace
+        self._layout = layout
+        return layout
+    
+    def _layout_cell(self, x, y, value, params):
+        """Make cell dict of a layout
+        
+        Params are validated by the HeaderElement constructor.
+        """
+        elem = HeaderElement('', **params)
+        code = None
+        if isinstance(value, str) and re.match('^@eval@', value):
+            # Leading spaces are stripped as they are by eval
+            code = compile(re.sub('^@eval@', '', value).lstrip(' \t'), '<dictionary>', 'eval')
+        return {
+            'x': x,
+            'y': y,
+            'value': value,
+            'code': code,
+            'height': elem.height,
+            'width': elem.width,
+            'style': elem.style,
+            'comment': elem.comment,
+            'comment_params': elem.comment_params,
+            'col_width': elem.col_width,
+            'padding': elem.padding
+        }
+    
+    def extent(self):
+        """Get number of rows and columns covered by an instance
+        
+        Returns:
+            tuple: height and width
+        """
+        layout = self.compile()
+        height = max([ cell['x'] + cell['height'] for cell in layout ] + [ self.height ])
+        width = max([ cell['y'] + cell['width'] for cell in layout ] + [ self.width ])
+        return height, width
+    
+    def evaluate(self, contexts, vectorize = False):
+        """Evaluate @eval@ expressions for many contexts
+        
+        Expressions are evaluated row by row, as they are by the draw method.
+        Expressions not referring to any column are evaluated once for all contexts.
+        With vectorize = True expressions are evaluated once with context columns (pandas Series)
+        in place of values first; if an expression fails or does not give a column of the same length,
+        then it is evaluated row by row. It is faster, but it is opt-in, since many expressions
+        give other results for columns than for single values (e.g. comparisons with None,
+        division by zero or slicing of strings).
+        
+        Args:
+            contexts (pandas.DataFrame/list): contexts (one per row) or a list of context dicts
+            vectorize (bool): whether expressions should be evaluated column-wise first
+        
+        Returns:
+            tuple: number of contexts and a dict of values (index of a layout cell => list of values)
+        """
+        import pandas as pd
+        records = None
+        if not isinstance(contexts, pd.DataFrame):
+            # Context dicts are kept for row by row evaluation, as a DataFrame turns None into NaN
+            records = list(contexts)
+            contexts = pd.DataFrame(records)
+        n = len(contexts)
+        columns = dict([ (str(k), contexts[k]) for k in contexts.columns ])
+        results = {}
+        cache = {}
+        for k, cell in enumerate(self.compile()):
+            code = cell['code']
+            if code is None:
+                continue
+            if code in cache:
+                results[k] = cache[code]
+                continue
+            values = None
+            names = _code_names(code) & set(columns)
+            if not names:
+                values = [ eval(code, None, self.context) ] * n
+            elif vectorize:
+                context = dict(self.context)
+                context.update(columns)
+                try:
+                    value = eval(code, None, context)
+                except Exception:
+                    value = None
+                if isinstance(value, pd.Series) and value.index.equals(contexts.index):
+                    values = value.tolist()
+            if values is None:
+                if records is None:
+                    records = contexts.to_dict('records')
+                values = []
+                for record in records:
+                    context = dict(self.context)
+                    context.update(record)
+                    values.append(eval(code, None, context))
+            results[k] = cache[code] = values
+        return n, results
+    
+    def draw_batch(self, x, y, ws, wb, contexts, space = 1, new_sheet = None, vectorize = False):
+        """Draw many instances of the Dictionary (one per context) in a single pass
+        
+        Instances are stacked one below another or, if new_sheet is given, drawn on separate worksheets.
+        Formats are registered once and column widths are set once per worksheet
+        (as they would be after drawing the instances one by one).
+        
+        Args:
+            x (int): x-coordinate (rows)
+            y (int): y-coordinate (columns)
+            ws (xlsxwriter.worksheet.Worksheet): worksheet to draw in
+            wb (xlsxwriter.workbook.Workbook): workbook to draw in
+            contexts (pandas.DataFrame/list): contexts (one per row) or a list of context dicts
+            space (int): number of rows between stacked instances
+            new_sheet (callable): function called with the index of an instance (from 1 on)
+                returning a worksheet and an x-coordinate it is drawn at
+            vectorize (bool): whether expressions should be evaluated column-wise first (see the evaluate method)
+        """
+        layout = self.compile()
+        n, results = self.evaluate(contexts, vectorize)
+        step = self.extent()[0] + space
+        formats = [ register_format(wb, cell['style']) for cell in layout ]
+        widths = OrderedDict()
+        for i in range(n):
+            if i > 0:
+                if new_sheet is None:
+                    x += step
+                else:
+                    self._set_widths(ws, widths)
+                    ws, x = new_sheet(i)
+            fit = _row_fits.get(ws)
+            for k, cell in enumerate(layout):
+                values = results.get(k)
+                value = cell['value'] if values is None else values[i]
+                if isnull(value):
+                    value = ''
+                fmt = formats[k]
+                r, c = x + cell['x'], y + cell['y']
+                h, w = cell['height'], cell['width']
+                if cell['comment'] is not None or isinstance(value, (RichText, list, tuple)) or \
+                    (fit is not None and getattr(fmt, 'text_wrap', 0) and isinstance(value, str)):
+                    Element.trusted(value, h, w, fmt, cell['comment'], cell['comment_params']).draw(r, c, ws, wb)
+                elif h == 1 and w == 1:
+                    ws.write(r, c, value, fmt)
+                else:
+                    ws.merge_range(r, c, r + h - 1, c + w - 1, value, fmt)
+                col_width = cell['col_width']
+                if col_width == 'auto':
+                    col_width = (len(str(value)) + cell['padding'] * 2) / w
+                if col_width is not None:
+                    key = (c, c + w - 1)
+                    widths.pop(key, None)
+                    widths[key] = col_width
+        self._set_widths(ws, widths)
+    
+    def _set_widths(self, ws, widths):
+        """Set collected column widths in order and clear them
+        """
+        for (first, last), width in widths.items():
+            set_column(ws, first, last, width)
+        widths.clear()
 
     def draw(self, x, y, ws, wb):
         """Draw Dictionary in a worksheet
@@ -937,4 +3561,404 @@ class Dictionary(object):
             y = y0
             x += vspace
 
-###############################################################################
\ No newline at end of file
+###############################################################################
+
+class DictionaryBatch(object):
+    """Many instances of a Dictionary drawn at once (one per context)
+    
+    Instances are stacked one below another or drawn on separate worksheets
+    (see the Dictionary.draw_batch method). In the latter case the element has to be drawn
+    with a Drawer, which adds the worksheets (see the Drawer.new_page method).
+    
+    Attributes:
+        dictionary (Dictionary): drawn Dictionary
+        contexts (pandas.DataFrame/list): contexts (one per row) or a list of context dicts
+        space (int): number of rows between stacked instances
+        sheets (bool): whether instances are drawn on separate worksheets
+        sheet_name (str): name template of added worksheets; {n} is the instance number and {field} are context values
+        vectorize (bool): whether expressions are evaluated column-wise first
+        height (int): height (of one instance if drawn on separate worksheets)
+        width (int): width
+    """
+    
+    # -------------------------------------------------------------------------
+    
+    @property
+    def dictionary(self):
+        return self._dictionary
+    @dictionary.setter
+    def dictionary(self, value):
+        if isinstance(value, dict) and not isinstance(value, Dictionary):
+            value = dict(value)
+            if isinstance(value.get('structure'), dict):
+                value['structure'] = OrderedDict(value['structure'])
+            value = Dictionary(**value)
+        if not isinstance(value, Dictionary):
+            raise TypeError('dictionary has to be a Dictionary or a dict of its arguments.')
+        self._dictionary = value
+    
+    @property
+    def space(self):
+        return self._space
+    @space.setter
+    def space(self, value):
+        if not isinstance(value, int):
+            raise TypeError('space has to be an int.')
+        elif value < 0:
+            raise ValueError('space has to be non-negative.')
+        self._space = value
+    
+    @property
+    def height(self):
+        height = self.dictionary.extent()[0]
+        if self.sheets or len(self.contexts) < 2:
+            return height
+        return (height + self.space) * len(self.contexts) - self.space
+    
+    @property
+    def width(self):
+        return self.dictionary.extent()[1]
+    
+    # -------------------------------------------------------------------------
+    
+    def __init__(self, dictionary, contexts, space = 1, sheets = False, sheet_name = None, vectorize = False):
+        """Constructor method
+        
+        Args:
+            dictionary (Dictionary/dict): drawn Dictionary or a dict of its constructor arguments
+            contexts (pandas.DataFrame/list): contexts (one per row) or a list of context dicts
+            space (int): number of rows between stacked instances
+            sheets (bool): whether instances are drawn on separate worksheets
+            sheet_name (str): name template of worksheets; defaults to the page name template of the Drawer
+            vectorize (bool): whether expressions are evaluated column-wise first
+        """
+        self.dictionary = dictionary
+        self.contexts = contexts
+        self.space = space
+        self.sheets = sheets
+        self.sheet_name = sheet_name
+        self.vectorize = vectorize
+        self.drawer = None
+    
+    def bind(self, drawer):
+        """Keep the Drawer, which adds worksheets of instances
+        
+        Args:
+            drawer (pyxldrawer.drawer.Drawer): drawer the element is drawn with
+        """
+        self.drawer = drawer
+    
+    def _new_sheet(self, i):
+        """Continue on a new worksheet
+        """
+        name = None
+        if self.sheet_name is not None:
+            if hasattr(self.contexts, 'iloc'):
+                record = self.contexts.iloc[i].to_dict()
+            else:
+                record = dict(self.contexts[i])
+            name = self.sheet_name.format(n = i + 1, **dict([ (str(k), v) for k, v in record.items() ]))
+        self.drawer.new_page(name)
+        return self.drawer.ws, self.drawer.x
+    
+    def draw(self, x, y, ws, wb):
+        """Draw instances in a worksheet
+        
+        Args:
+            x (int): x-coordinate (rows)
+            y (int): y-coordinate (columns)
+            ws (xlsxwriter.worksheet.Worksheet): worksheet to draw in
+            wb (xlsxwriter.workbook.Workbook): workbook to draw in
+        """
+        new_sheet = None
+        if self.sheets:
+            if self.drawer is None:
+                raise ValueError('instances on separate worksheets have to be drawn with a Drawer.')
+            new_sheet = self._new_sheet
+        self.dictionary.draw_batch(x, y, ws, wb, self.contexts, self.space, new_sheet, self.vectorize)
+
+###############################################################################
+
+class Table(object):
+    """Native Excel table
+    
+    This class draws a block of data as an Excel table (see worksheet.add_table in xlsxwriter docs),
+    so banding, header styling, autofilter and totals row are provided by Excel itself
+    instead of being emulated with per-cell styles.
+    Data is written in bulk and only one format per column is registered.
+    Note that tables are not available in the constant_memory mode of xlsxwriter.
+    
+    Attributes:
+        data (list): list of lists with row values
+        header (list): list of column names
+        height (int): total height (header, data rows and totals row)
+        width (int): total width (number of columns)
+        table_style (str): name of Excel table style
+        banded_rows (bool): whether rows should be banded
+        banded_columns (bool): whether columns should be banded
+        autofilter (bool): whether autofilter should be turned on
+        header_row (bool): whether the header row should be drawn
+        totals (dict): totals row definition; mapping from column index or name to a total function name
+            (sum, average, count, count_nums, max, min, std_dev, var) or a custom total label
+        name (str): name of the table; defaults to None which lets Excel choose
+        col_style (dict/list): style dict for all data columns or a list of style dicts (one per column)
+        header_style (dict): style dict for header cells; defaults to {} which leaves it to the table style
+        col_width (float/str/None): column width; 'auto' adjusts to the longest value in a column
+        padding (float): padding added to both sides in auto-resizing
+    """
+    
+    # -------------------------------------------------------------------------
+    
+    @property
+    def data(self):
+        return self._data
+    @data.setter
+    def data(self, value):
+        if not isinstance(value, list) or not all([ isinstance(x, (list, tuple)) for x in value ]):
+            raise TypeError('data has to be a list of lists.')
+        if len(value) < 1:
+            raise ValueError('data has to have at least one row.')
+        self._data = value
+    
+    @property
+    def header(self):
+        return self._header
+    @header.setter
+    def header(self, value):
+        if not isinstance(value, (list, tuple)):
+            raise TypeError('header has to be a list.')
+        self._header = [ str(x) for x in value ]
+    
+    @property
+    def height(self):
+        return self._height
+    @height.setter
+    def height(self, value):
+        if not isinstance(value, int):
+            raise TypeError('height has to be an int.')
+        if value < 1:
+            raise ValueError('height has to be positive.')
+        self._height = value
+    
+    @property
+    def width(self):
+        return self._width
+    @width.setter
+    def width(self, value):
+        if not isinstance(value, int):
+            raise TypeError('width has to be an int.')
+        if value < 1:
+            raise ValueError('width has to be positive.')
+        self._width = value
+    
+    @property
+    def totals(self):
+        return self._totals
+    @totals.setter
+    def totals(self, value):
+        if value is None:
+            value = {}
+        if not isinstance(value, dict):
+            raise TypeError('totals has to be a dict or None.')
+        self._totals = value
+    
+    @property
+    def col_style(self):
+        return self._col_style
+    @col_style.setter
+    def col_style(self, value):
+        if isinstance(value, dict):
+            value = [ value for x in range(len(self.header)) ]
+        elif not isinstance(value, list) or not all([ isinstance(x, dict) for x in value ]):
+            raise TypeError('col_style has to be a dict or a list of dicts.')
+        elif len(value) != len(self.header):
+            raise ValueError('col_style has to have one style dict per column.')
+        self._col_style = value
+    
+    @property
+    def col_width(self):
+        return self._col_width
+    @col_width.setter
+    def col_width(self, value):
+        if isinstance(value, str):
+            if value != 'auto':
+                raise ValueError("col_width has to be float, None or 'auto'.")
+        elif value is None:
+            pass
+        else:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise TypeError("col_width has to be float, None or 'auto'.")
+        self._col_width = value
+    
+    # -------------------------------------------------------------------------
+    
+    TOTAL_FUNCTIONS = ('sum', 'average', 'count', 'count_nums', 'max', 'min', 'std_dev', 'var')
+    
+    def __init__(self, data, header = None, table_style = 'Table Style Medium 9',
+                 banded_rows = True, banded_columns = False, autofilter = True,
+                 header_row = True, totals = None, name = None,
+                 col_style = {}, header_style = {}, col_width = None, padding = 1.0):
+        """Constructor method
+        
+        Args:
+            data (list/pandas.DataFrame): list of lists with row values or a data frame
+            header (list): column names; defaults to data frame columns or to Column1, Column2, ...
+            table_style (str): name of Excel table style
+            banded_rows (bool): whether rows should be banded
+            banded_columns (bool): whether columns should be banded
+            autofilter (bool): whether autofilter should be turned on
+            header_row (bool): whether the header row should be drawn
+            totals (dict): totals row definition (column index or name => function name or label)
+            name (str): name of the table
+            col_style (dict/list): style dict or a list of style dicts (one per column)
+            header_style (dict): style dict for header cells
+            col_width (float/str/None): column width; defaults to None which makes no adjustment
+            padding (float): padding to add if col_width = 'auto'
+        """
+        if hasattr(data, 'columns') and hasattr(data, 'values'):
+            if header is None:
+                header = list(data.columns)
+            data = data.values.tolist()
+        self.data = data
+        if header is None:
+            header = [ 'Column' + str(i + 1) for i in range(len(data[0])) ]
+        self.header = header
+        if any([ len(row) != len(self.header) for row in self.data ]):
+            raise ValueError('all rows have to have the same length as the header.')
+        self.table_style = table_style
+        self.banded_rows = banded_rows
+        self.banded_columns = banded_columns
+        self.autofilter = autofilter
+        self.header_row = header_row
+        self.totals = totals
+        self.name = name
+        self.col_style = col_style
+        self.header_style = header_style
+        self.col_width = col_width
+        self.padding = float(padding)
+        self.height = len(self.data) + int(self.header_row) + int(len(self.totals) > 0)
+        self.width = len(self.header)
+    
+    def _total(self, j):
+        """Get totals row definition of a column
+        
+        Args:
+            j (int): column index
+        
+        Returns:
+            str: total function name or label; None if the column has no total
+        """
+        if j in self.totals:
+            return self.totals[j]
+        return self.totals.get(self.header[j])
+    
+    def _total_value(self, j, function):
+        """Compute the cached value of a total function
+        
+        Args:
+            j (int): column index
+            function (str): total function name
+        
+        Returns:
+            float: value of the total; 0 if it can not be computed
+        """
+        values = [ row[j] for row in self.data if not isnull(row[j]) ]
+        if function in ('count', 'count_nums'):
+            if function == 'count_nums':
+                values = [ x for x in values if isinstance(x, (int, float)) and not isinstance(x, bool) ]
+            return len(values)
+        values = [ x for x in values if isinstance(x, (int, float)) and not isinstance(x, bool) ]
+        if not values:
+            return 0
+        n = len(values)
+        if function == 'sum':
+            return sum(values)
+        elif function == 'average':
+            return sum(values) / n
+        elif function == 'max':
+            return max(values)
+        elif function == 'min':
+            return min(values)
+        elif n > 1:
+            mean = sum(values) / n
+            var = sum([ (x - mean)**2 for x in values ]) / (n - 1)
+            return var if function == 'var' else var**.5
+        return 0
+    
+    def make_columns(self, wb):
+        """Make column definitions for the worksheet.add_table method
+        
+        Args:
+            wb (xlsxwriter.workbook.Workbook): workbook to register column formats in
+        
+        Returns:
+            list: list of column definition dicts
+        """
+        header_format = register_format(wb, self.header_style) if self.header_style else None
+        columns = []
+        for j, name in enumerate(self.header):
+            column = { 'header': name }
+            if self.col_style[j]:
+                column['format'] = register_format(wb, self.col_style[j])
+            if header_format is not None:
+                column['header_format'] = header_format
+            total = self._total(j)
+            if total in self.TOTAL_FUNCTIONS:
+                column['total_function'] = total
+                column['total_value'] = self._total_value(j, total)
+            elif total is not None:
+                column['total_string'] = str(total)
+            columns.append(column)
+        return columns
+    
+    def make_data(self):
+        """Prepare data for writing
+        
+        Returns:
+            list: list of lists with row values with missing values replaced with None
+        """
+        return [ [ None if isnull(x) else x for x in row ] for row in self.data ]
+    
+    def _col_widths(self):
+        """Computes widths of the columns
+        
+        Returns:
+            list: list of column widths
+        """
+        if isinstance(self.col_width, float):
+            return [ self.col_width for x in self.header ]
+        widths = []
+        for j, name in enumerate(self.header):
+            n = max([ len(str(row[j])) for row in self.data if not isnull(row[j]) ] + [ len(name) ])
+            widths.append(float(n + self.padding * 2))
+        return widths
+    
+    def draw(self, x, y, ws, wb):
+        """Draw Table in a worksheet
+        
+        Args:
+            x (int): x-coordinate (rows)
+            y (int): y-coordinate (columns)
+            ws (xlsxwriter.worksheet.Worksheet): worksheet to draw in
+            wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
+        """
+        options = {
+            'data': self.make_data(),
+            'columns': self.make_columns(wb),
+            'style': self.table_style,
+            'banded_rows': self.banded_rows,
+            'banded_columns': self.banded_columns,
+            'autofilter': self.autofilter,
+            'header_row': self.header_row,
+            'total_row': len(self.totals) > 0
+        }
+        if self.name is not None:
+            options['name'] = self.name
+        ws.add_table(x, y, x + self.height - 1, y + self.width - 1, options)
+        if self.col_width is not None:
+            for j, col_width in enumerate(self._col_widths()):
+                set_column(ws, y + j, y + j, col_width)
+
+###############################################################################
@@ -0,0 +1,297 @@
+"""Streaming sheet XML backend for plain cell grids"""
+
+import math, tempfile
+from numbers import Real
+import xlsxwriter
+from xlsxwriter.worksheet import Worksheet
+from xlsxwriter.utility import xl_col_to_name
+
+###############################################################################
+
+# Range of xlsxwriter versions whose worksheet internals the fast path relies on
+FAST_VERSIONS = ((3, 0), (4, 0))
+
+def fast_path_supported(version = None):
+    """Check whether the installed xlsxwriter version is supported by the fast path
+    
+    Args:
+        version (str): version string; defaults to the installed version
+    
+    Returns:
+        bool: whether grids may be serialized by the fast path
+    """
+    if version is None:
+        version = xlsxwriter.__version__
+    try:
+        version = tuple([ int(x) for x in version.split('.')[:2] ])
+    except ValueError:
+        return False
+    return FAST_VERSIONS[0] <= version < FAST_VERSIONS[1]
+
+_FAST = fast_path_supported()
+
+###############################################################################
+
+class FastWorksheet(Worksheet):
+    """Worksheet with a fast path for plain cell grids
+    
+    This is an extension of the xlsxwriter worksheet that serializes grids of plain values
+    (numbers, strings, booleans and blanks) straight into pre-encoded sheet XML fragments.
+    Cell reference strings and style ids are cached, so there is no per-cell bookkeeping
+    of the standard worksheet. The fragments are written to the sheet part
+    when the workbook is closed and the part is handed to the zip container as usual.
+    
+    All other worksheet methods (merges, comments, formulas, formats etc.) are inherited,
+    so xlsxwriter stays the fallback for anything the fast path does not cover.
+    Cells written by the standard methods take precedence over grid cells at the same position.
+    The fast path is not used in the constant_memory mode and with xlsxwriter versions
+    outside of FAST_VERSIONS (it relies on worksheet internals), then grids are written cell by cell.
+    Instances are created with the add_fast_worksheet function.
+    
+    Grid rows may be spilled to a temporary file (see the spill method)
+    to bound memory used by large grids.
+    
+    Attributes:
+        grid_rows (dict): pre-encoded cells (row => column => XML fragment)
+        spilled (dict): spilled rows (row => offset and length in the spill file)
+    """
+    
+    def __init__(self):
+        """Constructor method
+        """
+        Worksheet.__init__(self)
+        self.grid_rows = {}
+        self.spilled = {}
+        self._spill_fh = None
+        self._col_names = {}
+        self._xf_attrs = {}
+    
+    def _col_name(self, col):
+        """Get cached column name
+        """
+        name = self._col_names.get(col)
+        if name is None:
+            name = xl_col_to_name(col)
+            self._col_names[col] = name
+        return name
+    
+    def _xf_attr(self, cell_format):
+        """Get cached style attribute of a format
+        """
+        if cell_format is None:
+            return ''
+        attr = self._xf_attrs.get(id(cell_format))
+        if attr is None:
+            index = cell_format._get_xf_index()
+            attr = ' s="%d"' % index if index else ''
+            self._xf_attrs[id(cell_format)] = attr
+        return attr
+    
+    def write_grid(self, row, col, data, cell_format = None):
+        """Write a grid of plain values
+        
+        Values that are not numbers, strings, booleans or blanks (None or '')
+        are written with the standard write method. NaN values are written as blanks.
+        
+        Args:
+            row (int): first row (zero indexed)
+            col (int): first column (zero indexed)
+            data (list): list of lists with row values
+            cell_format (xlsxwriter.format.Format/list): format of all cells or a list of lists of formats
+        
+        Returns:
+            int: 0 on success, -1 if the grid is out of worksheet bounds
+        """
+        if not data:
+            return 0
+        grid = isinstance(cell_format, list)
+        if self.constant_memory or not _FAST:
+            for i, values in enumerate(data):
+                for j, value in enumerate(values):
+                    if isinstance(value, Real) and math.isnan(value):
+                        value = None
+                    self.write(row + i, col + j, value, cell_format[i][j] if grid else cell_format)
+            return 0
+        ncol = max([ len(x) for x in data ])
+        if ncol == 0:
+            return 0
+        if self._check_dimensions(row, col) or \
+            self._check_dimensions(row + len(data) - 1, col + ncol - 1):
+            return -1
+        names = [ self._col_name(col + j) for j in range(ncol) ]
+        sst = self.str_table._get_shared_string_index
+        strmax = self.xls_strmax
+        for i, values in enumerate(data):
+            r = row + i
+            ref = str(r + 1)
+            cells = self.grid_rows.get(r)
+            if cells is None:
+                cells = self.grid_rows[r] = self._read_spilled(r) or {}
+            slow = self.table.get(r)
+            for j, value in enumerate(values):
+                fmt = cell_format[i][j] if grid else cell_format
+                s = self._xf_attr(fmt)
+                if value is None or (isinstance(value, str) and value == ''):
+                    if not s:
+                        cells.pop(col + j, None)
+                        if slow and col + j in slow:
+                            del slow[col + j]
+                        continue
+                    frag = '<c r="%s%s"%s/>' % (names[j], ref, s)
+                elif isinstance(value, bool):
+                    frag = '<c r="%s%s"%s t="b"><v>%d</v></c>' % (names[j], ref, s, value)
+                elif isinstance(value, Real):
+                    if math.isnan(value):
+                        frag = '<c r="%s%s"%s/>' % (names[j], ref, s) if s else None
+                    elif math.isinf(value):
+                        self.write(r, col + j, value, fmt)
+                        continue
+                    else:
+                        frag = '<c r="%s%s"%s><v>%.16G</v></c>' % (names[j], ref, s, value)
+                elif isinstance(value, str) and len(value) <= strmax:
+                    frag = '<c r="%s%s"%s t="s"><v>%d</v></c>' % (names[j], ref, s, sst(value))
+                else:
+                    self.write(r, col + j, value, fmt)
+                    continue
+                if frag is None:
+                    cells.pop(col + j, None)
+                    if slow and col + j in slow:
+                        del slow[col + j]
+                    continue
+                cells[col + j] = frag
+                if slow and col + j in slow:
+                    del slow[col + j]
+        return 0
+    
+    def spill(self, before = None):
+        """Move grid rows to a temporary file
+        
+        Spilled rows are read back row by row when the worksheet is written
+        (or when a grid is written over them again).
+        
+        Args:
+            before (int): rows before this one are spilled; None means all rows
+        
+        Returns:
+            int: number of spilled rows
+        """
+        rows = [ r for r in self.grid_rows if before is None or r < before ]
+        if not rows:
+            return 0
+        if self._spill_fh is None:
+            self._spill_fh = tempfile.TemporaryFile(dir = getattr(self, 'tmpdir', None))
+        fh = self._spill_fh
+        fh.seek(0, 2)
+        for r in sorted(rows):
+            cells = self.grid_rows.pop(r)
+            if not cells:
+                continue
+            data = '\n'.join([ '%d %s' % (c, cells[c]) for c in sorted(cells) ]).encode('utf-8')
+            self.spilled[r] = (fh.tell(), len(data))
+            fh.write(data)
+        return len(rows)
+    
+    def _read_spilled(self, row):
+        """Read spilled cells of a row
+        
+        Returns:
+            dict: cells of the row (column => XML fragment); None if the row is not spilled
+        """
+        entry = self.spilled.pop(row, None)
+        if entry is None:
+            return None
+        self._spill_fh.seek(entry[0])
+        data = self._spill_fh.read(entry[1]).decode('utf-8')
+        cells = {}
+        for line in data.split('\n'):
+            col, frag = line.split(' ', 1)
+            cells[int(col)] = frag
+        return cells
+    
+    def _write_rows(self):
+        """Write rows merging grid cells with cells written by the standard methods
+        """
+        if self.spilled:
+            # Spilled rows are merged back one by one, so only one of them is in memory at a time
+            spilled = set(self.spilled)
+            grid_rows = self.grid_rows
+            self.grid_rows = _SpilledRows(self, grid_rows)
+            try:
+                return self._write_grid_rows(spilled | set([ r for r, cells in grid_rows.items() if cells ]))
+            finally:
+                self.grid_rows = grid_rows
+                self._spill_fh.close()
+                self._spill_fh = None
+        if not self.grid_rows:
+            return Worksheet._write_rows(self)
+        return self._write_grid_rows(set([ r for r, cells in self.grid_rows.items() if cells ]))
+    
+    def _write_grid_rows(self, grid):
+        """Write rows with grid cells
+        
+        Args:
+            grid (set): rows with grid cells
+        """
+        self._calculate_spans()
+        rows = set(grid)
+        rows.update([ r for r, cells in self.table.items() if cells ])
+        rows.update(self.set_rows.keys())
+        rows.update(self.comments.keys())
+        write = self.fh.write
+        for row_num in sorted(rows):
+            fast = self.grid_rows.get(row_num)
+            slow = self.table.get(row_num)
+            properties = self.set_rows.get(row_num)
+            if not fast and not slow:
+                self._write_empty_row(row_num, self.row_spans.get(row_num // 16), properties)
+                continue
+            # Spans are only an optional hint, so they are skipped for rows with grid cells
+            self._write_row(row_num, None if fast else self.row_spans.get(row_num // 16), properties)
+            if not slow:
+                write(''.join([ fast[c] for c in sorted(fast) ]))
+            elif not fast:
+                for col_num in sorted(slow):
+                    self._write_cell(row_num, col_num, slow[col_num])
+            else:
+                for col_num in sorted(set(fast) | set(slow)):
+                    if col_num in slow:
+                        self._write_cell(row_num, col_num, slow[col_num])
+                    else:
+                        write(fast[col_num])
+            self._xml_end_tag('row')
+
+###############################################################################
+
+class _SpilledRows(object):
+    """Read-only view of grid rows reading spilled rows from the spill file
+    """
+    
+    def __init__(self, ws, grid_rows):
+        self.ws = ws
+        self.grid_rows = grid_rows
+    
+    def get(self, row, default = None):
+        cells = self.ws._read_spilled(row)
+        if cells is None:
+            return self.grid_rows.get(row, default)
+        cells.update(self.grid_rows.get(row, {}))
+        return cells
+
+###############################################################################
+
+def add_fast_worksheet(wb, name = None):
+    """Add a FastWorksheet to a workbook
+    
+    Args:
+        wb (xlsxwriter.workbook.Workbook): workbook to add a worksheet to
+        name (str): worksheet name; defaults to Sheet1, Sheet2 etc.
+    
+    Returns:
+        FastWorksheet: new worksheet
+    """
+    try:
+        return wb.add_worksheet(name, worksheet_class = FastWorksheet)
+    except TypeError:
+        raise TypeError('FastWorksheet requires a version of xlsxwriter supporting custom worksheet classes.')
+
+###############################################################################
@@ -0,0 +1,224 @@
+"""Adaptive memory governor of drawers"""
+
+import os, gc, pickle, tempfile, threading
+
+###############################################################################
+
+class SpilledBlock(object):
+    """Block of data pickled to a spill file
+    
+    Blocks may be spilled and loaded by different threads (see the Drawer.draw_async method),
+    so the file position is only moved under the lock shared by all blocks of the file.
+    
+    Attributes:
+        offset (int): offset in the spill file
+        length (int): length of the pickle
+    """
+    
+    def __init__(self, fh, obj, lock):
+        """Constructor method
+        
+        Args:
+            fh (file): spill file
+            obj (any): picklable object
+            lock (threading.Lock): lock of the spill file
+        """
+        data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+        self.fh = fh
+        self.lock = lock
+        self.length = len(data)
+        with lock:
+            fh.seek(0, 2)
+            self.offset = fh.tell()
+            fh.write(data)
+    
+    def load(self):
+        """Load the object back
+        """
+        with self.lock:
+            self.fh.seek(self.offset)
+            data = self.fh.read(self.length)
+        return pickle.loads(data)
+
+###############################################################################
+
+class MemoryGovernor(object):
+    """Memory governor switching drawing strategy under memory pressure
+    
+    The governor is checked by a Drawer after drawn elements (see the Drawer.set_governor method)
+    and measures memory use with tracemalloc or by RSS sampling against a budget.
+    When memory use crosses a threshold the strategy is downgraded (never upgraded back):
+        flush: finished rows (above the Drawer) of FastWorksheets are spilled to temporary files
+        release: cells of drawn matrices are dropped once drawn (only if they are drawn with release = True,
+            see the Drawer.draw method)
+        spill: all grid rows of FastWorksheets are spilled and blocks buffered by Drawer.draw_async
+            are kept in a temporary file
+    Every switch is reported through the callback.
+    
+    Attributes:
+        budget (int): memory budget in bytes
+        mode (str): measuring mode; 'rss' or 'tracemalloc'
+        thresholds (tuple): fractions of the budget at which flush, release and spill levels are entered
+        callback (callable): function called with the level name, memory use and budget on every switch
+        interval (int): number of drawn elements between checks
+        level (int): current level (index in LEVELS)
+        peak (int): peak measured memory use in bytes
+    """
+    
+    LEVELS = ('normal', 'flush', 'release', 'spill')
+    NORMAL, FLUSH, RELEASE, SPILL = range(4)
+    MODES = ('rss', 'tracemalloc')
+    
+    # -------------------------------------------------------------------------
+    
+    @property
+    def budget(self):
+        return self._budget
+    @budget.setter
+    def budget(self, value):
+        if not isinstance(value, int):
+            raise TypeError('budget has to be an int (number of bytes).')
+        elif value < 1:
+            raise ValueError('budget has to be positive.')
+        self._budget = value
+    
+    @property
+    def mode(self):
+        return self._mode
+    @mode.setter
+    def mode(self, value):
+        if value not in self.MODES:
+            raise ValueError('mode has to be one of: %s.' % ', '.join(self.MODES))
+        self._mode = value
+    
+    @property
+    def thresholds(self):
+        return self._thresholds
+    @thresholds.setter
+    def thresholds(self, value):
+        if not isinstance(value, (list, tuple)) or len(value) != 3:
+            raise TypeError('thresholds has to be a tuple of three fractions.')
+        elif list(value) != sorted(value) or value[0] <= 0:
+            raise ValueError('thresholds have to be positive and increasing.')
+        self._thresholds = tuple(value)
+    
+    # -------------------------------------------------------------------------
+    
+    def __init__(self, budget, mode = 'rss', thresholds = (.6, .8, .9), callback = None, interval = 1):
+        """Constructor method
+        
+        Args:
+            budget (int): memory budget in bytes
+            mode (str): measuring mode; 'rss' or 'tracemalloc'
+            thresholds (tuple): fractions of the budget at which flush, release and spill levels are entered
+            callback (callable): function called with the level name, memory use and budget on every switch
+            interval (int): number of drawn elements between checks
+        """
+        self.budget = budget
+        self.mode = mode
+        self.thresholds = thresholds
+        self.callback = callback
+        self.interval = interval
+        self.level = self.NORMAL
+        self.peak = 0
+        self._count = 0
+        self._spill_fh = None
+        self._spill_lock = threading.Lock()
+        if mode == 'tracemalloc':
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+    
+    def usage(self):
+        """Measure memory use
+        
+        Returns:
+            int: traced memory or resident set size in bytes
+        """
+        if self.mode == 'tracemalloc':
+            import tracemalloc
+            return tracemalloc.get_traced_memory()[0]
+        try:
+            with open('/proc/self/statm', 'r') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            import resource
+            # Peak RSS is the best estimate without /proc (kilobytes on Linux, bytes on macOS)
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return rss if rss > 1 << 32 else rss * 1024
+    
+    def check(self, drawer):
+        """Check memory use and apply the current strategy
+        
+        Args:
+            drawer (pyxldrawer.drawer.Drawer): drawer the governor is attached to
+        
+        Returns:
+            int: current level
+        """
+        self._count += 1
+        if self._count < self.interval:
+            return self.level
+        self._count = 0
+        usage = self.usage()
+        self.peak = max(self.peak, usage)
+        level = self.NORMAL
+        for k, threshold in enumerate(self.thresholds):
+            if usage >= threshold * self.budget:
+                level = k + 1
+        while self.level < level:
+            self.level += 1
+            if self.level == self.RELEASE:
+                gc.collect()
+            if self.callback is not None:
+                self.callback(self.LEVELS[self.level], usage, self.budget)
+        if self.level >= self.FLUSH:
+            self.flush(drawer)
+        return self.level
+    
+    def flush(self, drawer):
+        """Spill grid rows of FastWorksheets of a drawer
+        
+        Args:
+            drawer (pyxldrawer.drawer.Drawer): drawer the governor is attached to
+        """
+        for ws in drawer.pages:
+            if not hasattr(ws, 'spill'):
+                continue
+            if ws is drawer.ws and self.level < self.SPILL:
+                ws.spill(before = drawer.x)
+            else:
+                ws.spill()
+    
+    def release(self, elem):
+        """Drop cells of a drawn element if the strategy requires it
+        
+        Args:
+            elem (any): drawn element
+        """
+        if self.level >= self.RELEASE and hasattr(elem, 'release'):
+            elem.release()
+    
+    def spill(self, block):
+        """Keep a buffered block in the spill file if the strategy requires it
+        
+        Args:
+            block (any): block of data
+        
+        Returns:
+            any: the block or a SpilledBlock
+        """
+        if self.level < self.SPILL:
+            return block
+        if self._spill_fh is None:
+            self._spill_fh = tempfile.TemporaryFile()
+        return SpilledBlock(self._spill_fh, block, self._spill_lock)
+    
+    def close(self):
+        """Close the spill file
+        """
+        if self._spill_fh is not None:
+            self._spill_fh.close()
+            self._spill_fh = None
+
+###############################################################################
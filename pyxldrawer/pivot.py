@@ -0,0 +1,321 @@
+"""Pivot (cross-tab) element computed from long-format data"""
+
+import numpy as np
+import pandas as pd
+from pyxldrawer.elements import MultiHeader, register_format
+
+###############################################################################
+
+class Pivot(object):
+    """Cross-tab of long-format data with subtotals and grand totals
+    
+    Data is aggregated in a single grouped pass over all row and column keys.
+    Only the base statistics (sums, counts, minima, maxima) are computed there,
+    so subtotals and grand totals are rolled up from the (small) aggregated table
+    instead of the data, and averages are computed from rolled up sums and counts.
+    Headers are drawn as MultiHeaders (merged ranges) and the body is written in bulk.
+    Subtotals of inner levels are nested in the groups of outer levels, so their labels end
+    at different levels. Missing keys (None or NaN) are grouped together and labelled with blank_label.
+    
+    Attributes:
+        rows (list): names of row key columns (levels of the row header)
+        columns (list): names of column key columns (levels of the column header)
+        values (list): names of aggregated value columns
+        aggfunc (dict): aggregate function of value columns; sum, mean, count, min or max
+        subtotals (bool): whether subtotals of outer levels are added
+        totals (bool): whether grand totals are added
+        blank_label (str): label of missing keys
+        row_labels (list): list of tuples with labels of body rows
+        col_labels (list): list of tuples with labels of body columns
+        body (numpy.ndarray): object array of body values (None where there is no value)
+        row_totals (numpy.ndarray): boolean mask of subtotal and total rows
+        col_totals (numpy.ndarray): boolean mask of subtotal and total columns
+        height (int): total height
+        width (int): total width
+    """
+    
+    FUNCTIONS = ('sum', 'mean', 'count', 'min', 'max')
+    # Base statistics of aggregate functions and how they are rolled up
+    BASE = {
+        'sum': ('sum',),
+        'mean': ('sum', 'count'),
+        'count': ('count',),
+        'min': ('min',),
+        'max': ('max',)
+    }
+    ROLLUP = { 'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max' }
+    
+    # -------------------------------------------------------------------------
+    
+    @property
+    def rows(self):
+        return self._rows
+    @rows.setter
+    def rows(self, value):
+        value = self._names(value, 'rows')
+        if not value:
+            raise ValueError('rows has to name at least one column.')
+        self._rows = value
+    
+    @property
+    def columns(self):
+        return self._columns
+    @columns.setter
+    def columns(self, value):
+        self._columns = self._names(value, 'columns')
+    
+    @property
+    def values(self):
+        return self._values
+    @values.setter
+    def values(self, value):
+        value = self._names(value, 'values')
+        if not value:
+            raise ValueError('values has to name at least one column.')
+        self._values = value
+    
+    @property
+    def aggfunc(self):
+        return self._aggfunc
+    @aggfunc.setter
+    def aggfunc(self, value):
+        if isinstance(value, str):
+            value = dict([ (v, value) for v in self.values ])
+        elif not isinstance(value, dict):
+            raise TypeError('aggfunc has to be a str or a dict.')
+        funcs = {}
+        for v in self.values:
+            func = value.get(v, 'sum')
+            if func not in self.FUNCTIONS:
+                raise ValueError('aggfunc has to be one of: %s.' % ', '.join(self.FUNCTIONS))
+            funcs[v] = func
+        self._aggfunc = funcs
+    
+    @property
+    def height(self):
+        return self.header_height + len(self.row_labels)
+    
+    @property
+    def width(self):
+        return len(self.rows) + len(self.col_labels)
+    
+    @property
+    def header_height(self):
+        """Height of the column header
+        """
+        return max([ len(x) for x in self.col_labels ])
+    
+    # -------------------------------------------------------------------------
+    
+    def __init__(self, data, rows, columns = None, values = None, aggfunc = 'sum',
+                 subtotals = True, totals = True, total_label = 'Total', subtotal_label = '{} Total',
+                 style = {}, header_style = {}, total_style = {}, fill_value = None, col_width = None,
+                 blank_label = '(blank)'):
+        """Constructor method
+        
+        Args:
+            data (pandas.DataFrame/list): long-format data or a list of dicts (records)
+            rows (str/list): names of row key columns
+            columns (str/list): names of column key columns; defaults to no column keys
+            values (str/list): names of aggregated value columns
+            aggfunc (str/dict): aggregate function or a dict of functions of value columns (defaults to sum)
+            subtotals (bool): whether subtotals of outer levels are added
+            totals (bool): whether grand totals are added
+            total_label (str): label of grand totals
+            subtotal_label (str): label template of subtotals; {} is the label of the subtotaled group
+            style (dict): style dict of body cells
+            header_style (dict): style dict of header cells
+            total_style (dict): style dict merged into the style of subtotal and total cells
+            fill_value (any): value of body cells without data; defaults to None (blank)
+            col_width (float/str/None): column width passed to the headers; 'auto' adjusts widths to the labels
+            blank_label (str): label of missing keys (None or NaN), also in labels of their subtotals
+        """
+        if not isinstance(data, pd.DataFrame):
+            data = pd.DataFrame(data)
+        self.rows = rows
+        self.columns = columns
+        self.values = values
+        self.aggfunc = aggfunc
+        missing = [ x for x in self.rows + self.columns + self.values if x not in data.columns ]
+        if missing:
+            raise KeyError('columns not in data: %s.' % ', '.join([ str(x) for x in missing ]))
+        self.subtotals = subtotals
+        self.totals = totals
+        self.total_label = total_label
+        self.subtotal_label = subtotal_label
+        self.style = style
+        self.header_style = header_style
+        self.total_style = total_style
+        self.fill_value = fill_value
+        self.col_width = col_width
+        self.blank_label = blank_label
+        self.compute(data)
+    
+    def _names(self, value, name):
+        if value is None:
+            return []
+        if isinstance(value, str):
+            return [ value ]
+        if not isinstance(value, (list, tuple)):
+            raise TypeError('%s has to be a str or a list of str.' % name)
+        return list(value)
+    
+    def _levels(self, n):
+        """Get prefix lengths of keys aggregated at given number of levels
+        """
+        levels = [ n ]
+        if self.subtotals:
+            levels += list(range(n - 1, 0, -1))
+        if self.totals and n > 0:
+            levels.append(0)
+        return levels
+    
+    def compute(self, data):
+        """Aggregate data and lay out the body
+        
+        Args:
+            data (pandas.DataFrame): long-format data
+        """
+        keys = self.rows + self.columns
+        stats = []
+        for v in self.values:
+            for stat in self.BASE[self.aggfunc[v]]:
+                stats.append((v, stat))
+        names = [ '_%d' % k for k in range(len(stats)) ]
+        spec = dict([ (name, stat) for name, stat in zip(names, stats) ])
+        leaf = data.groupby(keys, sort = False, observed = True, dropna = False).agg(**spec).reset_index()
+        rollup = dict([ (name, self.ROLLUP[stat[1]]) for name, stat in zip(names, stats) ])
+        nr, nc = len(self.rows), len(self.columns)
+        parts = []
+        row_keys = []
+        col_keys = []
+        for p in self._levels(nr):
+            for q in self._levels(nc):
+                by = self.rows[:p] + self.columns[:q]
+                if p == nr and q == nc:
+                    part = leaf
+                elif by:
+                    part = leaf.groupby(by, sort = False, observed = True, dropna = False).agg(rollup).reset_index()
+                else:
+                    part = leaf.agg(rollup).to_frame().T
+                # Keys are taken before concatenation, which would upcast key columns missing in totals
+                row_keys += self._keys(part, self.rows, p)
+                col_keys += self._keys(part, self.columns, q)
+                parts.append(part)
+        table = pd.concat(parts, ignore_index = True, sort = False)
+        results = []
+        k = 0
+        for v in self.values:
+            func = self.aggfunc[v]
+            if func == 'mean':
+                count = table[names[k + 1]].astype(float).to_numpy()
+                result = table[names[k]].astype(float).to_numpy() / np.where(count > 0, count, np.nan)
+                k += 2
+            else:
+                result = table[names[k]].to_numpy()
+                k += 1
+            results.append(result)
+        # Labels are ordered per level with subtotals after the groups they total
+        row_order = self._order(row_keys)
+        col_order = self._order(col_keys)
+        self.row_labels = [ self._label(key, self.rows) for key in row_order ]
+        labels = [ self._label(key, self.columns) for key in col_order ]
+        nv = len(self.values)
+        if not self.columns:
+            self.col_labels = [ (v,) for v in self.values ]
+        elif nv > 1:
+            self.col_labels = [ label + (v,) for label in labels for v in self.values ]
+        else:
+            self.col_labels = labels
+        self.row_totals = np.array([ key[0] < nr for key in row_order ])
+        totals = np.array([ key[0] < nc for key in col_order ])
+        self.col_totals = np.repeat(totals, nv)
+        body = np.full((len(row_order), len(col_order) * nv), self.fill_value, dtype = object)
+        row_pos = dict([ (key, i) for i, key in enumerate(row_order) ])
+        col_pos = dict([ (key, j) for j, key in enumerate(col_order) ])
+        ii = np.array([ row_pos[key] for key in row_keys ], dtype = int)
+        jj = np.array([ col_pos[key] for key in col_keys ], dtype = int) * nv
+        for k, result in enumerate(results):
+            result = np.asarray(result, dtype = object)
+            ok = ~pd.isna(result)
+            body[ii[ok], jj[ok] + k] = [ x.item() if hasattr(x, 'item') else x for x in result[ok] ]
+        self.body = body
+    
+    def _keys(self, table, levels, p):
+        """Get keys of table rows on one axis
+        
+        Args:
+            table (pandas.DataFrame): aggregated table
+            levels (list): names of key columns of the axis
+            p (int): number of levels the table is aggregated by
+        
+        Returns:
+            list: list of tuples (prefix length, key values...)
+        """
+        columns = [ table[name].tolist() for name in levels[:p] ]
+        rest = (None,) * (len(levels) - p)
+        return [ (p,) + tuple(values) + rest for values in zip(*columns) ] if columns else [ (p,) + rest ] * len(table)
+    
+    def _order(self, keys):
+        """Order distinct keys of one axis
+        """
+        def sort_key(key):
+            p = key[0]
+            # Missing key values are ordered last, subtotals after all values of their level
+            return tuple([ (1, 0, '') if lvl >= p else ((0, 1, '') if pd.isna(x) else (0, 0, x))
+                           for lvl, x in enumerate(key[1:]) ])
+        return sorted(set(keys), key = sort_key)
+    
+    def _label(self, key, levels):
+        """Make header label of a key
+        """
+        p, values = key[0], key[1:]
+        n = len(levels)
+        if p == 0:
+            return (self.total_label,) + ('',) * (n - 1) if n else ()
+        values = [ self.blank_label if pd.isna(x) else x for x in values[:p] ]
+        if p == n:
+            return tuple(values)
+        label = self.subtotal_label.format(values[-1])
+        return tuple(values) + (label,) + ('',) * (n - p - 1)
+    
+    def draw(self, x, y, ws, wb):
+        """Draw Pivot in a worksheet
+        
+        Args:
+            x (int): x-coordinate (rows)
+            y (int): y-coordinate (columns)
+            ws (xlsxwriter.worksheet.Worksheet): worksheet to draw in
+            wb (xlsxwriter.workbook.Workbook): workbook the worksheet is in
+        """
+        nr = len(self.rows)
+        hh = self.header_height
+        header_format = register_format(wb, self.header_style) if self.header_style else None
+        for j, name in enumerate(self.rows):
+            if hh > 1:
+                ws.merge_range(x, y + j, x + hh - 1, y + j, str(name), header_format)
+            else:
+                ws.write_string(x, y + j, str(name), header_format)
+        MultiHeader(self.col_labels, style = self.header_style,
+                    col_width = self.col_width).draw(x, y + nr, ws, wb)
+        MultiHeader(self.row_labels, vertical = True, style = self.header_style,
+                    col_width = self.col_width).draw(x + hh, y, ws, wb)
+        style = dict(self.style)
+        style.update(self.total_style)
+        plain = register_format(wb, self.style) if self.style else None
+        total = register_format(wb, style) if style else None
+        fmts = np.where(self.row_totals[:, None] | self.col_totals[None, :], total, plain)
+        x += hh
+        y += nr
+        if hasattr(ws, 'write_grid'):
+            ws.write_grid(x, y, self.body.tolist(), fmts.tolist())
+            return
+        for (i, j), value in np.ndenumerate(self.body):
+            fmt = fmts[i, j]
+            if value is None:
+                if fmt is not None:
+                    ws.write_blank(x + i, y + j, None, fmt)
+            else:
+                ws.write(x + i, y + j, value, fmt)
+
+###############################################################################
@@ -0,0 +1,334 @@
+"""Asynchronous report rendering service
+
+Render jobs are dispatched to a pool of worker processes warmed up in advance:
+heavy imports (xlsxwriter, pandas, yaml) are done and render specs are compiled
+(see the spec module) once per worker, so a job pays only for the drawing itself.
+Chunks of the archive are passed back through a queue as they are written.
+"""
+
+import asyncio, json, os, queue
+from multiprocessing import Manager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pyxldrawer.spec import RenderSpec, RenderCancelled, load_spec
+
+###############################################################################
+
+_worker_specs = {}
+
+def _warm(specs):
+    """Initialize worker process
+    
+    Args:
+        specs (dict): render specs (name => spec dict)
+    """
+    import xlsxwriter, pyxldrawer.elements
+    for name, spec in specs.items():
+        _worker_specs[name] = RenderSpec(spec)
+
+def _ping():
+    """Trivial job used to start worker processes
+    """
+    return os.getpid()
+
+def _render(name, data, options, chunks, cancel):
+    """Render a report in a worker process
+    
+    Chunks of the archive are put in a queue followed by None (also when the render fails).
+    
+    Args:
+        name (str): name of a render spec
+        data (dict): render data
+        options (dict): session options
+        chunks (queue.Queue): queue of chunks (managed)
+        cancel (threading.Event): event set when the job is cancelled (managed)
+    
+    Returns:
+        int: number of bytes written
+    """
+    def sink(chunk):
+        if cancel.is_set():
+            raise RenderCancelled('render cancelled.')
+        chunks.put(chunk)
+    try:
+        return _worker_specs[name].render(data, sink, cancelled = cancel.is_set, **options)
+    finally:
+        chunks.put(None)
+
+async def _prepend(first, chunks):
+    """Iterate over a chunk (unless it is None) followed by an async iterator of chunks
+    """
+    try:
+        if first is not None:
+            yield first
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        await chunks.aclose()
+
+###############################################################################
+
+class ServiceBusy(Exception):
+    """Raised when a job is rejected by the admission control
+    """
+    pass
+
+###############################################################################
+
+class ReportService(object):
+    """Report rendering service
+    
+    Jobs are admitted only while the number of pending jobs (queued and running)
+    is below the queue depth limit; others are rejected right away with ServiceBusy,
+    so bursts do not build up unbounded queues and latency of admitted jobs stays stable.
+    Every job has a timeout (asyncio.TimeoutError is raised when it expires).
+    Expired and abandoned jobs are cancelled (they stop before the next element or chunk)
+    and stay pending until their workers really finish.
+    
+    Attributes:
+        specs (dict): render specs (name => validated spec dict)
+        workers (int): number of worker processes
+        max_queue (int): maximum number of pending jobs
+        timeout (float): job timeout in seconds; None means no timeout
+        options (dict): session options passed to the Drawer.open method
+        pending (int): number of pending jobs (including cancelled jobs still running)
+        pool (ProcessPoolExecutor): worker processes; None until the service is started
+        readers (ThreadPoolExecutor): threads reading chunks of pending jobs (max_queue of them)
+    """
+    
+    # -------------------------------------------------------------------------
+    
+    @property
+    def max_queue(self):
+        return self._max_queue
+    @max_queue.setter
+    def max_queue(self, value):
+        if not isinstance(value, int):
+            raise TypeError('max_queue has to be a positive int.')
+        elif value < 1:
+            raise ValueError('max_queue has to be a positive int.')
+        self._max_queue = value
+    
+    @property
+    def timeout(self):
+        return self._timeout
+    @timeout.setter
+    def timeout(self, value):
+        if value is not None and not isinstance(value, (int, float)):
+            raise TypeError('timeout has to be a number or None.')
+        elif value is not None and value <= 0:
+            raise ValueError('timeout has to be positive.')
+        self._timeout = value
+    
+    # -------------------------------------------------------------------------
+    
+    def __init__(self, specs, workers = None, max_queue = 64, timeout = 30.0, **options):
+        """Constructor method
+        
+        Args:
+            specs (dict): render specs (name => spec dict or a path to a spec file)
+            workers (int): number of worker processes; defaults to the number of CPUs
+            max_queue (int): maximum number of pending jobs
+            timeout (float): job timeout in seconds; None means no timeout
+            **options: session options (see the Session class)
+        """
+        if not isinstance(specs, dict):
+            raise TypeError('specs has to be a dict.')
+        self.specs = dict([ (name, load_spec(spec)) for name, spec in specs.items() ])
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.options = options
+        self.pending = 0
+        self.pool = None
+        self.manager = None
+        self.readers = None
+    
+    async def __aenter__(self):
+        await self.start()
+        return self
+    
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+    
+    async def start(self):
+        """Start and warm up worker processes
+        """
+        if self.pool is not None:
+            return
+        self.manager = Manager()
+        self.pool = ProcessPoolExecutor(self.workers, initializer = _warm, initargs = (self.specs,))
+        # Every pending job has its own reader of chunks, so readers never wait for a free thread
+        self.readers = ThreadPoolExecutor(self.max_queue)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[ loop.run_in_executor(self.pool, _ping) for _ in range(self.workers) ])
+    
+    def close(self):
+        """Shut down worker processes
+        """
+        if self.pool is not None:
+            self.pool.shutdown(wait = True, cancel_futures = True)
+            self.pool = None
+        if self.readers is not None:
+            self.readers.shutdown(wait = True)
+            self.readers = None
+        if self.manager is not None:
+            self.manager.shutdown()
+            self.manager = None
+    
+    async def submit(self, name, data):
+        """Render a report
+        
+        Args:
+            name (str): name of a render spec
+            data (dict): render data
+        
+        Returns:
+            list: chunks of the .xlsx archive
+        """
+        return [ chunk async for chunk in self.stream(name, data) ]
+    
+    async def stream(self, name, data):
+        """Render a report and iterate over chunks of the archive as they are written
+        
+        The job is cancelled when it expires or when the iteration is stopped early.
+        
+        Args:
+            name (str): name of a render spec
+            data (dict): render data
+        
+        Yields:
+            bytes: chunk of the .xlsx archive
+        """
+        if name not in self.specs:
+            raise KeyError(name)
+        if self.pending >= self.max_queue:
+            raise ServiceBusy('queue depth limit (%d) reached.' % self.max_queue)
+        # The slot is reserved before the first await, so concurrent requests can not all pass the check
+        self.pending += 1
+        try:
+            await self.start()
+            chunks = self.manager.Queue()
+            cancel = self.manager.Event()
+            job = asyncio.wrap_future(self.pool.submit(_render, name, data, self.options, chunks, cancel))
+        except BaseException:
+            self.pending -= 1
+            raise
+        job.add_done_callback(self._finished)
+        loop = asyncio.get_running_loop()
+        deadline = None if self.timeout is None else loop.time() + self.timeout
+        try:
+            while True:
+                timeout = None if deadline is None else deadline - loop.time()
+                if timeout is not None and timeout <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    chunk = await loop.run_in_executor(self.readers, chunks.get, True, timeout)
+                except queue.Empty:
+                    raise asyncio.TimeoutError()
+                if chunk is None:
+                    break
+                yield chunk
+            await job
+        finally:
+            if not job.done():
+                cancel.set()
+    
+    def _finished(self, job):
+        """Count a job out once its worker really finished
+        """
+        self.pending -= 1
+        if not job.cancelled():
+            # Exceptions of abandoned jobs are retrieved, so they are not reported as never retrieved
+            job.exception()
+    
+    # -------------------------------------------------------------------------
+    
+    async def serve(self, host = '127.0.0.1', port = 8080):
+        """Start local HTTP server
+        
+        It is a minimal stand-in for a real HTTP frontend meant for local testing.
+        Reports are requested with POST /render/<spec name> with render data as a JSON body
+        and returned with the chunked transfer encoding.
+        Rejected jobs get 503, expired jobs get 504 and unknown specs get 404.
+        
+        Args:
+            host (str): host to bind
+            port (int): port to bind; 0 picks a free port
+        
+        Returns:
+            asyncio.base_events.Server: started server
+        """
+        await self.start()
+        return await asyncio.start_server(self.handle, host, port)
+    
+    async def handle(self, reader, writer):
+        """Handle HTTP connection of the local server
+        
+        Failures after the response has started close the connection without the final chunk.
+        """
+        try:
+            status, chunks = await self.respond(reader)
+            if chunks is None:
+                writer.write(('HTTP/1.1 %s\r\nContent-Length: 0\r\nConnection: close\r\n\r\n' % status).encode('ascii'))
+            else:
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\n'
+                    b'Content-Type: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet\r\n'
+                    b'Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n'
+                )
+                try:
+                    async for chunk in chunks:
+                        writer.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                        await writer.drain()
+                except Exception:
+                    return
+                finally:
+                    await chunks.aclose()
+                writer.write(b'0\r\n\r\n')
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    async def respond(self, reader):
+        """Read HTTP request and run the job
+        
+        The response is started only after the first chunk of the archive,
+        so failures before it still get their own status.
+        
+        Returns:
+            tuple: response status and an async iterator over chunks of the archive (None if there is no body)
+        """
+        try:
+            method, path, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+            length = 0
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                key, _, value = line.partition(':')
+                if key.strip().lower() == 'content-length':
+                    length = int(value)
+            body = await reader.readexactly(length) if length else b'{}'
+            data = json.loads(body.decode('utf-8'))
+        except (ValueError, asyncio.IncompleteReadError):
+            return '400 Bad Request', None
+        name = path[len('/render/'):]
+        if method != 'POST' or not path.startswith('/render/') or name not in self.specs:
+            return '404 Not Found', None
+        chunks = self.stream(name, data)
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            return '200 OK', _prepend(None, chunks)
+        except ServiceBusy:
+            return '503 Service Unavailable', None
+        except asyncio.TimeoutError:
+            return '504 Gateway Timeout', None
+        except Exception:
+            return '500 Internal Server Error', None
+        return '200 OK', _prepend(first, chunks)
+
+###############################################################################
@@ -0,0 +1,248 @@
+"""Declarative render specs
+
+A render spec describes a report as a list of sheets with elements drawn one after another.
+It is a plain dict (or a .json/.yaml file), so it may be shipped to worker processes
+and compiled once per process.
+
+Example spec::
+    
+    {
+        'sheets': [
+            {
+                'name': 'Report',
+                'elements': [
+                    {'type': 'Dictionary', 'args': {'structure': 'meta.yaml'}, 'data': {'context': 'meta'}},
+                    {'type': 'Matrix', 'data': {'values': 'sales'}, 'args': {'style': {'border': 1}}, 'space': 1}
+                ]
+            }
+        ]
+    }
+
+Element entries have the following keys:
+    type (str): name of the element class (see ELEMENTS)
+    args (dict): keyword arguments passed to the element constructor
+    data (dict): constructor arguments taken from the render data (argument name => data name)
+    move (str): how the drawer moves after drawing; 'vertical' (default), 'horizontal' or 'none'
+    space (int): additional number of cells to move by
+    name (str): name under which the range of the element is registered (see the Drawer.ref method)
+"""
+
+import sys, copy, json, hashlib
+from collections import OrderedDict
+from pyxldrawer.drawer import Drawer
+
+###############################################################################
+
+ELEMENTS = {
+    'Element': 'pyxldrawer.elements',
+    'HeaderElement': 'pyxldrawer.elements',
+    'Matrix': 'pyxldrawer.elements',
+    'SparseMatrix': 'pyxldrawer.elements',
+    'MultiHeader': 'pyxldrawer.elements',
+    'Dictionary': 'pyxldrawer.elements',
+    'DictionaryBatch': 'pyxldrawer.elements',
+    'Table': 'pyxldrawer.elements',
+    'ChartElement': 'pyxldrawer.elements',
+    'ValidationColumn': 'pyxldrawer.elements',
+    'Pivot': 'pyxldrawer.pivot',
+    'MappedTable': 'pyxldrawer.columnar',
+    'BatchTable': 'pyxldrawer.columnar'
+}
+
+MOVES = ('vertical', 'horizontal', 'none')
+
+def element_class(name):
+    """Get element class by its name
+    
+    Args:
+        name (str): name of the element class (see ELEMENTS)
+    
+    Returns:
+        type: element class
+    """
+    module = ELEMENTS.get(name)
+    if module is None:
+        raise ValueError('unknown element type: %s.' % name)
+    module = __import__(module, fromlist = [ name ])
+    return getattr(module, name)
+
+def load_spec(source):
+    """Load and validate a render spec
+    
+    Args:
+        source (dict/str): spec dict or a path to a .json or .yaml file
+    
+    Returns:
+        dict: validated spec
+    """
+    if isinstance(source, str):
+        with open(source, 'r') as f:
+            if source.endswith('.json'):
+                source = json.load(f, object_pairs_hook = OrderedDict)
+            else:
+                import yaml
+                source = yaml.safe_load(f)
+    if not isinstance(source, dict):
+        raise TypeError('spec has to be a dict or a path to a .json/.yaml file.')
+    sheets = source.get('sheets')
+    if not isinstance(sheets, list) or len(sheets) < 1:
+        raise ValueError('spec has to define a non-empty list of sheets.')
+    for sheet in sheets:
+        if not isinstance(sheet, dict) or not isinstance(sheet.get('elements'), list):
+            raise ValueError('each sheet has to be a dict with a list of elements.')
+        for item in sheet['elements']:
+            if not isinstance(item, dict) or 'type' not in item:
+                raise ValueError('each element has to be a dict with a type.')
+            if item['type'] not in ELEMENTS:
+                raise ValueError('unknown element type: %s.' % item['type'])
+            if item.get('move', 'vertical') not in MOVES:
+                raise ValueError('move has to be one of: %s.' % ', '.join(MOVES))
+            if not isinstance(item.get('args', {}), dict) or not isinstance(item.get('data', {}), dict):
+                raise TypeError('args and data of an element have to be dicts.')
+            if not isinstance(item.get('space', 0), int):
+                raise TypeError('space has to be an int.')
+    return source
+
+def spec_key(spec):
+    """Get stable hash of a spec
+    
+    Args:
+        spec (dict): spec dict
+    
+    Returns:
+        str: hex digest of the canonical JSON form of the spec
+    """
+    dump = json.dumps(spec, sort_keys = True, default = str)
+    return hashlib.sha1(dump.encode('utf-8')).hexdigest()
+
+###############################################################################
+
+class RenderCancelled(Exception):
+    """Raised when a render is aborted
+    """
+    pass
+
+###############################################################################
+
+class RenderSpec(object):
+    """Compiled render spec
+    
+    Element classes are resolved and element entries normalized once.
+    Elements are constructed anew on every render, as drawn elements are bound to the workbook
+    they are drawn in (e.g. through registered formats or released cells).
+    Dictionary templates are compiled once (structure parsed and layout computed)
+    and copied on every render with only their context replaced.
+    
+    Attributes:
+        spec (dict): validated spec
+        key (str): hash of the spec
+        sheets (list): list of (name, list of compiled element entries) tuples
+    """
+    
+    def __init__(self, spec):
+        """Constructor method
+        
+        Args:
+            spec (dict/str): spec dict or a path to a .json or .yaml file
+        """
+        self.spec = load_spec(spec)
+        self.key = spec_key(self.spec)
+        self.sheets = []
+        for sheet in self.spec['sheets']:
+            entries = [ self.compile(item) for item in sheet['elements'] ]
+            self.sheets.append((sheet.get('name'), entries))
+    
+    def compile(self, item):
+        """Compile element entry
+        
+        Args:
+            item (dict): element entry of a spec
+        
+        Returns:
+            dict: compiled entry
+        """
+        cls = element_class(item['type'])
+        args = dict(item.get('args', {}))
+        data = dict(item.get('data', {}))
+        if item['type'] == 'Dictionary':
+            if isinstance(args.get('structure'), dict):
+                args['structure'] = OrderedDict(args['structure'])
+            args.setdefault('context', {})
+        entry = {
+            'cls': cls,
+            'args': args,
+            'data': data,
+            'move': item.get('move', 'vertical'),
+            'space': item.get('space', 0),
+            'name': item.get('name'),
+            'template': None
+        }
+        if item['type'] == 'Dictionary' and set(data) <= { 'context' }:
+            entry['template'] = cls(**args)
+            entry['template'].compile()
+        return entry
+    
+    def build(self, entry, data):
+        """Get element of a compiled entry for given render data
+        
+        Args:
+            entry (dict): compiled entry
+            data (dict): render data (data name => value)
+        
+        Returns:
+            element object
+        """
+        try:
+            values = dict([ (arg, data[name]) for arg, name in entry['data'].items() ])
+        except KeyError as exc:
+            raise ValueError('missing render data: %s.' % exc.args[0])
+        template = entry['template']
+        if template is None:
+            kwargs = dict(entry['args'])
+            kwargs.update(values)
+            return entry['cls'](**kwargs)
+        elem = copy.copy(template)
+        if 'context' in values:
+            elem.context = values['context']
+        return elem
+    
+    def draw(self, drawer, entries, data, cancelled = None):
+        """Draw compiled entries of a sheet with a drawer
+        
+        Args:
+            drawer (Drawer): drawer to draw with
+            entries (list): compiled element entries
+            data (dict): render data (data name => value)
+            cancelled (callable): function checked before every element; RenderCancelled is raised when it returns True
+        """
+        for entry in entries:
+            if cancelled is not None and cancelled():
+                raise RenderCancelled('render cancelled.')
+            drawer.draw(self.build(entry, data), name = entry['name'])
+            if entry['move'] == 'vertical':
+                drawer.move_vertical(drawer.height + entry['space'])
+            elif entry['move'] == 'horizontal':
+                drawer.move_horizontal(drawer.width + entry['space'])
+    
+    def render(self, data, sink, cancelled = None, **options):
+        """Render a report into a sink
+        
+        Args:
+            data (dict): render data (data name => value)
+            sink (file-like/callable/str): sink passed to the Drawer.open method
+            cancelled (callable): function checked before every element; RenderCancelled is raised when it returns True
+            **options: session options (see the Session class)
+        
+        Returns:
+            int: number of bytes written
+        """
+        session = Drawer.open(sink, **options)
+        try:
+            for name, entries in self.sheets:
+                self.draw(session.add_drawer(name), entries, data, cancelled)
+        except Exception:
+            session.__exit__(*sys.exc_info())
+            raise
+        return session.close()
+
+###############################################################################
@@ -62,5 +62,12 @@ setup(
     keywords = 'excel reporting automation',
 
     # You can just specify the packages manually here if your project is simple.
-    packages = find_packages(exclude = ['contrib', 'docs', 'tests'])
+    packages = find_packages(exclude = ['contrib', 'docs', 'tests']),
+
+    # Console command rendering reports from render specs
+    entry_points = {
+        'console_scripts': [
+            'pyxldrawer = pyxldrawer.cli:main'
+        ]
+    }
 )
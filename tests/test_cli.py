@@ -0,0 +1,55 @@
+import os
+import openpyxl
+from pyxldrawer.cli import main, _number
+
+SPEC = '''sheets:
+  - name: R
+    elements:
+      - type: Matrix
+        data:
+          values: rows
+data:
+  rows: rows.csv
+'''
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+def cells(path):
+    return [ [ c.value for c in row ] for row in openpyxl.load_workbook(path)['R'].iter_rows() ]
+
+def test_numbers():
+    assert [ _number(x) for x in ('12', '-3', '1.5', '.5', '1e3', '0.25', '0') ] == [12, -3, 1.5, 0.5, 1000.0, 0.25, 0]
+    assert [ _number(x) for x in ('007', '-01', 'nan', 'inf', '-Infinity', '1_000', '0x10', 'abc') ] == \
+        ['007', '-01', 'nan', 'inf', '-Infinity', '1_000', '0x10', 'abc']
+    assert _number('') is None
+
+def test_cached_outputs(tmp_path):
+    spec = str(tmp_path / 'report.yaml')
+    write(spec, SPEC)
+    write(str(tmp_path / 'rows.csv'), 'a,b\n1,007\nnan,2.5\n')
+    output = str(tmp_path / 'out.xlsx')
+    cache = str(tmp_path / 'cache')
+    assert main([ spec, '-o', output, '--cache-dir', cache ]) == 0
+    assert cells(output) == [[1, '007'], ['nan', 2.5]]
+    assert len(os.listdir(os.path.join(cache, 'outputs'))) == 1
+    os.remove(output)
+    assert main([ spec, '-o', output, '--cache-dir', cache ]) == 0
+    assert cells(output) == [[1, '007'], ['nan', 2.5]]
+    assert len(os.listdir(os.path.join(cache, 'outputs'))) == 1
+    # Changed data files give new entries
+    write(str(tmp_path / 'rows.csv'), 'a,b\n1,2\n3,4\n5,6\n')
+    assert main([ spec, '-o', output, '--cache-dir', cache ]) == 0
+    assert cells(output) == [[1, 2], [3, 4], [5, 6]]
+    assert len(os.listdir(os.path.join(cache, 'outputs'))) == 2
+
+def test_clashing_outputs(tmp_path, capsys):
+    for sub in ('a', 'b'):
+        write(str(tmp_path / sub / 'report.yaml'), SPEC)
+        write(str(tmp_path / sub / 'rows.csv'), 'a\n1\n')
+    specs = [ str(tmp_path / sub / 'report.yaml') for sub in ('a', 'b') ]
+    assert main(specs + [ '-o', str(tmp_path / 'out') ]) == 2
+    assert 'would both be rendered' in capsys.readouterr().err
+    assert not os.path.exists(str(tmp_path / 'out' / 'report.xlsx'))
@@ -0,0 +1,58 @@
+import io, math
+import openpyxl
+import pytest
+import pyxldrawer.fastsheet as fastsheet
+from pyxldrawer.drawer import Drawer
+
+GRID = [ [ 1, 2.5, 'a', True, None ], [ '', float('nan'), -3, False, 'b' * 10 ], [ 1e20, 'a', 0, None, 'c' ] ]
+
+def read(out):
+    ws = openpyxl.load_workbook(io.BytesIO(out.getvalue())).active
+    return [ [ c.value for c in row ] for row in ws.iter_rows() ]
+
+def expected(grid, row = 0):
+    rows = [ [ None if x == '' or (isinstance(x, float) and math.isnan(x)) else x for x in values ] for values in grid ]
+    return [ [ None ] * len(grid[0]) ] * row + rows
+
+@pytest.mark.parametrize('fast', [ True, False ])
+def test_write_grid(monkeypatch, fast):
+    monkeypatch.setattr(fastsheet, '_FAST', fast)
+    out = io.BytesIO()
+    with Drawer.open(out, fast = True) as d:
+        assert isinstance(d.ws, fastsheet.FastWorksheet)
+        fmt = d.wb.add_format({ 'bold': 1 })
+        assert d.ws.write_grid(1, 0, GRID, fmt) == 0
+    assert read(out) == expected(GRID, 1)
+    ws = openpyxl.load_workbook(io.BytesIO(out.getvalue())).active
+    assert ws['A2'].font.b and ws['E2'].font.b
+
+def test_standard_cells_and_grids_overwrite_each_other():
+    out = io.BytesIO()
+    with Drawer.open(out, fast = True) as d:
+        d.ws.write(0, 0, 'old')
+        d.ws.write(0, 1, 'keep')
+        d.ws.write_grid(0, 0, [[ None, 5 ]])
+        d.ws.write_grid(1, 0, [[ 1, 2 ]])
+        d.ws.write(1, 1, 'new')
+    assert read(out) == [[None, 5], [1, 'new']]
+
+def test_out_of_bounds():
+    out = io.BytesIO()
+    with Drawer.open(out, fast = True) as d:
+        assert d.ws.write_grid(d.ws.xls_rowmax - 1, 0, [[1], [2]]) == -1
+
+def test_spill():
+    rows = [ [ i, 'row %d' % i, i / 2 ] for i in range(100) ]
+    out = io.BytesIO()
+    with Drawer.open(out, fast = True) as d:
+        d.ws.write_grid(0, 0, rows[:60])
+        assert d.ws.spill(before = 40) == 40
+        assert len(d.ws.spilled) == 40 and len(d.ws.grid_rows) == 20
+        d.ws.write_grid(60, 0, rows[60:])
+        assert d.ws.spill() == 60
+        # Grids written over spilled rows are merged with them
+        d.ws.write_grid(10, 1, [[ 'x' ]])
+        d.ws.write(20, 2, 'y')
+    rows[10][1] = 'x'
+    rows[20][2] = 'y'
+    assert read(out) == rows
@@ -0,0 +1,84 @@
+import asyncio, io, threading
+import openpyxl
+from pyxldrawer.drawer import Drawer
+from pyxldrawer.governor import MemoryGovernor, SpilledBlock
+
+def blocks(n, rows, cols):
+    for k in range(n):
+        yield [ [ k * rows + i ] + [ j for j in range(1, cols) ] for i in range(rows) ]
+
+async def source(n, rows, cols):
+    for block in blocks(n, rows, cols):
+        yield block
+        await asyncio.sleep(0)
+
+def test_spilled_blocks_round_trip():
+    governor = MemoryGovernor(1 << 40)
+    governor.level = governor.SPILL
+    data = list(blocks(20, 5, 3))
+    spilled = [ governor.spill(block) for block in data ]
+    assert all([ isinstance(x, SpilledBlock) for x in spilled ])
+    assert [ x.load() for x in reversed(spilled) ] == list(reversed(data))
+    governor.close()
+
+def test_concurrent_spill_and_load():
+    governor = MemoryGovernor(1 << 40)
+    governor.level = governor.SPILL
+    data = list(blocks(400, 20, 10))
+    spilled = [ governor.spill(data[0]) ]
+    errors = []
+    
+    def load():
+        try:
+            for k in range(2000):
+                i = k % len(spilled)
+                assert spilled[i].load() == data[i]
+        except Exception as exc:
+            errors.append(exc)
+    
+    thread = threading.Thread(target = load)
+    thread.start()
+    for block in data[1:]:
+        spilled.append(governor.spill(block))
+    thread.join()
+    governor.close()
+    assert errors == []
+
+def test_draw_async_at_spill_level():
+    n, rows, cols = 200, 50, 20
+    governor = MemoryGovernor(1 << 40)
+    governor.level = governor.SPILL
+    out = io.BytesIO()
+    with Drawer.open(out, fast = True) as d:
+        d.set_governor(governor)
+        assert asyncio.run(d.draw_async(source(n, rows, cols), buffer = 4)) == n
+    governor.close()
+    ws = openpyxl.load_workbook(io.BytesIO(out.getvalue()), read_only = True).active
+    first = [ row[0] for row in ws.iter_rows(values_only = True) ]
+    assert first == list(range(n * rows))
+
+def test_levels_only_go_up():
+    switches = []
+    governor = MemoryGovernor(100, thresholds = (.5, .6, .7), callback = lambda level, usage, budget: switches.append(level))
+    with Drawer.open(io.BytesIO()) as d:
+        governor.usage = lambda: 65
+        assert governor.check(d) == governor.RELEASE
+        governor.usage = lambda: 10
+        assert governor.check(d) == governor.RELEASE
+    assert switches == [ 'flush', 'release' ]
+
+def test_release_is_opt_in():
+    from pyxldrawer.elements import Matrix, Summary
+    governor = MemoryGovernor(1 << 40)
+    governor.level = governor.RELEASE
+    with Drawer.open(io.BytesIO()) as d:
+        d.set_governor(governor)
+        kept = Matrix([ [1, 2], [3, 4] ])
+        d.draw(kept)
+        d.move_vertical()
+        d.draw(Summary(kept))
+        d.move_vertical()
+        dropped = Matrix([ [1, 2] ])
+        d.draw(dropped, release = True)
+    assert not kept.released
+    assert dropped.released
@@ -0,0 +1,62 @@
+import io
+import openpyxl
+import pytest
+from pyxldrawer.drawer import Drawer
+from pyxldrawer.elements import Matrix, Element
+
+def sheets(out):
+    wb = openpyxl.load_workbook(io.BytesIO(out.getvalue()))
+    return [ (ws.title, [ [ c.value for c in row ] for row in ws.iter_rows() ]) for ws in wb.worksheets ]
+
+@pytest.mark.parametrize('fast', [ False, True ])
+def test_matrices_are_split_between_pages(fast):
+    out = io.BytesIO()
+    with Drawer.open(out, name = 'S', fast = fast) as d:
+        d.set_paging(4, header = [ Element('head') ])
+        m = Matrix([ [ i, i * 2 ] for i in range(7) ])
+        d.draw(m)
+        d.move_vertical()
+        d.draw(Matrix([ ['x'], ['y'] ]))
+    assert (m.paged, m.origin) == (True, None)
+    assert sheets(out) == [
+        ('S', [[0, 0], [1, 2], [2, 4], [3, 6]]),
+        ('S (2)', [['head', None], [4, 8], [5, 10], [6, 12]]),
+        ('S (3)', [['head'], ['x'], ['y']])
+    ]
+
+def test_views_and_other_elements():
+    out = io.BytesIO()
+    with Drawer.open(out, name = 'S') as d:
+        d.set_paging(3, name = 'page {n}')
+        d.draw(Matrix([ [ i ] for i in range(8) ])[2:7, :])
+        d.move_vertical()
+        d.draw(Element('tall', height = 2))
+    assert sheets(out) == [
+        ('S', [[2], [3], [4]]),
+        ('page 2', [[5], [6]]),
+        ('page 3', [['tall'], [None]])
+    ]
+
+def test_static_rules_span_pages():
+    out = io.BytesIO()
+    with Drawer.open(out, name = 'S') as d:
+        d.set_paging(3)
+        rules = [ { 'type': 'cell', 'criteria': '>', 'value': 3, 'format': { 'bold': 1 } } ]
+        d.draw(Matrix([ [ i ] for i in range(6) ], rules = rules, static_rules = True))
+    wb = openpyxl.load_workbook(io.BytesIO(out.getvalue()))
+    bold = [ [ c.font.b for c in ws['A'] ] for ws in wb.worksheets ]
+    assert bold == [[False, False, False], [False, True, True]]
+
+def test_paging_errors():
+    out = io.BytesIO()
+    with Drawer.open(out) as d:
+        with pytest.raises(ValueError):
+            d.set_paging(0)
+        with pytest.raises(ValueError):
+            d.set_paging(2, header = [ Element('a', height = 2) ])
+        d.set_paging(2)
+        # Ranges of split matrices can not be registered and other elements are moved as a whole
+        with pytest.raises(ValueError):
+            d.draw(Matrix([ [ i ] for i in range(3) ]), name = 'm')
+        with pytest.raises(ValueError):
+            d.draw(Element('a', height = 3))
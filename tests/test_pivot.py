@@ -0,0 +1,60 @@
+import io
+import numpy as np
+import pandas as pd
+import openpyxl
+import pytest
+from pyxldrawer.drawer import Drawer
+from pyxldrawer.pivot import Pivot
+
+def data():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({ 'region': rng.choice(['E', 'W'], 200), 'shop': rng.choice(['a', 'b', 'c'], 200),
+                          'year': rng.choice([2020, 2021], 200), 'v': rng.integers(1, 100, 200) })
+
+@pytest.mark.parametrize('func', Pivot.FUNCTIONS)
+def test_rollups(func):
+    df = data()
+    p = Pivot(df, ['region', 'shop'], 'year', 'v', func)
+    rows = dict([ (label, i) for i, label in enumerate(p.row_labels) ])
+    cols = dict([ (label, j) for j, label in enumerate(p.col_labels) ])
+    def check(row, col, mask):
+        assert p.body[rows[row], cols[col]] == pytest.approx(getattr(df[mask]['v'], func)())
+    for (region, shop, year), group in df.groupby(['region', 'shop', 'year']):
+        check((region, shop), (year,), (df.region == region) & (df.shop == shop) & (df.year == year))
+    for region in ('E', 'W'):
+        check((region, region + ' Total'), ('Total',), df.region == region)
+        for year in (2020, 2021):
+            check((region, region + ' Total'), (year,), (df.region == region) & (df.year == year))
+    check(('Total', ''), ('Total',), df.v > 0)
+    assert list(p.row_totals) == [ any([ x.endswith('Total') for x in label ]) for label in p.row_labels ]
+    assert list(p.col_totals) == [False, False, True]
+
+def test_missing_keys():
+    df = pd.DataFrame({ 'a': ['x', 'x', 'x', 'y', 'y'], 'b': ['p', 'p', None, 'q', 'q'], 'c': ['m', 'n', 'm', 'm', np.nan],
+                        'k': ['K', 'L', 'K', 'L', 'K'], 'v': [1, 2, 3, 4, 5] })
+    p = Pivot(df, rows = ['a', 'b', 'c'], columns = 'k', values = 'v')
+    out = io.BytesIO()
+    with Drawer.open(out) as d:
+        d.draw(p)
+    ws = openpyxl.load_workbook(io.BytesIO(out.getvalue())).active
+    assert [ r for r in ws.iter_rows(values_only = True) ] == [
+        ('a', 'b', 'c', 'K', 'L', 'Total'),
+        ('x', 'p', 'm', 1, None, 1),
+        (None, None, 'n', None, 2, 2),
+        (None, None, 'p Total', 1, 2, 3),
+        (None, '(blank)', 'm', 3, None, 3),
+        (None, None, '(blank) Total', 3, None, 3),
+        (None, 'x Total', None, 4, 2, 6),
+        ('y', 'q', 'm', None, 4, 4),
+        (None, None, '(blank)', 5, None, 5),
+        (None, None, 'q Total', 5, 4, 9),
+        (None, 'y Total', None, 5, 4, 9),
+        ('Total', None, None, 9, 6, 15)
+    ]
+    assert 'B7:C7' in [ str(m) for m in ws.merged_cells.ranges ]
+
+def test_records_without_totals():
+    records = data().to_dict('records')
+    p = Pivot(records, ['region', 'shop'], values = 'v', subtotals = False, totals = False)
+    assert p.row_labels == [ (r, s) for r in ('E', 'W') for s in ('a', 'b', 'c') ]
+    assert not p.row_totals.any()
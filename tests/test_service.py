@@ -0,0 +1,36 @@
+import asyncio, io
+import openpyxl
+import pytest
+from pyxldrawer.service import ReportService, ServiceBusy
+
+SPEC = { 'sheets': [{ 'name': 'R', 'elements': [
+    { 'type': 'Matrix', 'data': { 'values': 'rows' } },
+    { 'type': 'Element', 'args': { 'value': 'end' }, 'space': 1 } ] }] }
+DATA = { 'rows': [[1, 2], [3, 4]] }
+
+def test_admission_before_start():
+    async def run():
+        svc = ReportService({ 'r': SPEC }, workers = 1, max_queue = 3, timeout = 30)
+        try:
+            # The service is not started, so every request waits for the warm-up
+            return await asyncio.gather(*[ svc.submit('r', DATA) for _ in range(6) ], return_exceptions = True)
+        finally:
+            svc.close()
+    res = asyncio.run(run())
+    assert sum([ isinstance(x, ServiceBusy) for x in res ]) == 3
+    for chunks in [ x for x in res if not isinstance(x, Exception) ]:
+        ws = openpyxl.load_workbook(io.BytesIO(b''.join(chunks)))['R']
+        assert [ [ c.value for c in row ] for row in ws.iter_rows() ] == [[1, 2], [3, 4], ['end', None]]
+
+def test_failed_start_releases_slot():
+    async def run():
+        svc = ReportService({ 'r': SPEC }, workers = 1, max_queue = 1)
+        async def start():
+            await asyncio.sleep(0)
+            raise OSError('no workers')
+        svc.start = start
+        for _ in range(2):
+            with pytest.raises(OSError):
+                await svc.submit('r', DATA)
+        return svc.pending
+    assert asyncio.run(run()) == 0
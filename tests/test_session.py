@@ -0,0 +1,29 @@
+import io, zipfile
+import xlsxwriter
+from pyxldrawer.drawer import Drawer
+
+def render(**options):
+    out = io.BytesIO()
+    with Drawer.open(out, **options) as d:
+        for i in range(2000):
+            d.ws.write(i, 0, 'value %d' % i)
+    archive = zipfile.ZipFile(io.BytesIO(out.getvalue()))
+    assert archive.testzip() is None
+    return len(out.getvalue())
+
+def test_compression_level():
+    for storage in ('memory', 'disk'):
+        assert render(storage = storage, compresslevel = 0) > 2 * render(storage = storage, compresslevel = 9)
+
+def test_plain_workbooks_keep_default_compression():
+    sizes = []
+    for level in (None, 0):
+        if level is not None:
+            render(compresslevel = level)
+        out = io.BytesIO()
+        with xlsxwriter.Workbook(out, { 'in_memory': True }) as wb:
+            ws = wb.add_worksheet()
+            for i in range(2000):
+                ws.write(i, 0, 'value %d' % i)
+        sizes.append(len(out.getvalue()))
+    assert sizes[0] == sizes[1]
@@ -0,0 +1,41 @@
+import gc
+import pytest
+from pyxldrawer.elements import Matrix, HeaderElement
+
+def values(n, m):
+    return dict([ ((i, j), i * m + j) for i in range(n) for j in range(m) ])
+
+def build(vals, trusted, **kwargs):
+    matrix = Matrix(vals)
+    matrix.make_element_matrix(vals, trusted = trusted, **kwargs)
+    return matrix
+
+def test_trusted_matches_checked():
+    heights = dict([ ((i, j), 1 + i % 2) for i in range(3) for j in range(2) ])
+    a = build(values(3, 2), True, height = heights, width = 2)
+    b = build(values(3, 2), False, height = heights, width = 2)
+    for key in a.matrix:
+        x, y = a.matrix[key], b.matrix[key]
+        assert isinstance(x, HeaderElement)
+        assert (x.value, x.height, x.width, x.style) == (y.value, y.height, y.width, y.style)
+
+def test_bools_are_rejected():
+    heights = dict([ (k, 1) for k in values(2, 2) ])
+    heights[(1, 0)] = True
+    with pytest.raises(TypeError, match = r'row 1, column 0'):
+        build(values(2, 2), True, height = heights)
+    with pytest.raises(TypeError):
+        Matrix(values(2, 2), width = True, trusted = True)
+
+def test_big_ints():
+    widths = dict([ (k, 1) for k in values(2, 2) ])
+    widths[(0, 1)] = 1 << 70
+    build(values(2, 2), True, width = widths)
+    widths[(1, 1)] = -(1 << 70)
+    with pytest.raises(ValueError, match = r'row 1, column 1'):
+        build(values(2, 2), True, width = widths)
+
+def test_garbage_collection_stays_enabled():
+    assert gc.isenabled()
+    Matrix(values(50, 20), trusted = True)
+    assert gc.isenabled()
@@ -0,0 +1,29 @@
+from pyxldrawer.elements import Matrix, Element, vstack, hstack
+
+def matrix():
+    m = Matrix([ [ Element(i * 3 + j) for j in range(3) ] for i in range(4) ])
+    m.set(1, 1, Element('x', height = 2, width = 3))
+    return m
+
+def test_view_sizes():
+    v = matrix()[1:3, :]
+    assert (v.height, v.width, v.row_heights(), v.col_widths()) == (3, 5, [2, 1], [1, 3, 1])
+    assert (v.T.height, v.T.width, v.T.row_heights(), v.T.col_widths()) == (4, 4, [1, 2, 1], [1, 1])
+    s = vstack([ v, matrix()[0:1, :] ])
+    assert (s.height, s.width, s.row_heights()) == (4, 5, [2, 1, 1])
+
+def test_sizes_are_measured_once():
+    v = matrix()[1:3, :]
+    calls = []
+    size = v._size
+    v._size = lambda x, y: calls.append((x, y)) or size(x, y)
+    for _ in range(3):
+        assert (v.height, v.width, v.row_heights(), v.col_widths()) == (3, 5, [2, 1], [1, 3, 1])
+    assert len(calls) == v.nrow * v.ncol
+
+def test_setting_through_view_resets_sizes():
+    v = matrix()[1:3, :]
+    assert (v.height, v.width) == (3, 5)
+    v.set(0, 1, Element('y'))
+    assert (v.height, v.width) == (2, 3)
+    assert hstack([ v, v ]).col_widths() == [1] * 6